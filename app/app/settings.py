@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 
 from django.conf.global_settings import AUTH_USER_MODEL
 
@@ -50,15 +51,21 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.HealthCheckMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.CsrfViewMiddleware',
+    'core.middleware.AuthenticationMiddleware',
+    'core.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Routes that authenticate with tokens only. The session, CSRF,
+# authentication and message middleware are skipped for them.
+TOKEN_AUTH_PATHS = ['/api/']
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -79,6 +86,33 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# Threads running the database work of the async read endpoints.
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', '8'))
+
+# Threads running the reads of a batch request, and the batch size limit.
+BATCH_THREADS = int(os.getenv('BATCH_THREADS', '4'))
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', '10'))
+
+# Background jobs: attempts before a job fails, retry backoff bounds, how
+# long a running job's lease lasts before it is handed out again and how
+# often workers renew the leases of the jobs they run.
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+JOB_RETRY_BACKOFF = float(os.getenv('JOB_RETRY_BACKOFF', '10'))
+JOB_RETRY_BACKOFF_MAX = float(os.getenv('JOB_RETRY_BACKOFF_MAX', '3600'))
+JOB_LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', '600'))
+JOB_HEARTBEAT_INTERVAL = float(os.getenv('JOB_HEARTBEAT_INTERVAL', '60'))
+
+# Webhook delivery of outbox events: events per request, request timeout,
+# retry backoff bounds and how long delivered events are kept.
+WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', '100'))
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', '5'))
+WEBHOOK_RETRY_BACKOFF = float(os.getenv('WEBHOOK_RETRY_BACKOFF', '5'))
+WEBHOOK_RETRY_BACKOFF_MAX = float(os.getenv('WEBHOOK_RETRY_BACKOFF_MAX', '600'))
+WEBHOOK_RETENTION_DAYS = int(os.getenv('WEBHOOK_RETENTION_DAYS', '7'))
+
+# Responses smaller than this many bytes are not compressed.
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -91,10 +125,89 @@ DATABASES = {
         "PASSWORD": os.getenv("DB_PASSWORD", "app_password"),
         "HOST": os.getenv("DB_HOST", "localhost"),
         "PORT": os.getenv("DB_PORT", "5432"),
-
+        # Keep connections open between requests instead of reconnecting.
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
     }
 }
 
+# Seconds between liveness checks of persistent connections.
+DB_HEALTH_CHECK_INTERVAL = int(os.getenv("DB_HEALTH_CHECK_INTERVAL", "30"))
+
+# An in-process pool for threaded/ASGI deployments. Connections go back to
+# the pool at the end of each request, so CONN_MAX_AGE is not needed. The
+# pool pings connections idle for DB_HEALTH_CHECK_INTERVAL seconds before
+# handing them out and replaces those older than DB_POOL_MAX_AGE.
+if int(os.getenv("DB_POOL_SIZE", "0")):
+    DATABASES['default'].update({
+        "ENGINE": 'core.backends.postgresql',
+        "CONN_MAX_AGE": 0,
+        "POOL_SIZE": int(os.getenv("DB_POOL_SIZE")),
+        "POOL_TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", "5")),
+        "POOL_CHECK_INTERVAL": DB_HEALTH_CHECK_INTERVAL,
+        "POOL_MAX_AGE": int(os.getenv("DB_POOL_MAX_AGE", "1800")),
+    })
+
+# Shards, given as a comma separated list of hosts in DB_SHARD_HOSTS. Each
+# user's recipes, tags and ingredients live on one shard, recorded on the
+# user in the default database, and core.routers.ShardRouter sends the
+# queries of a request there. New users are placed on the shards listed
+# in DB_SHARD_PLACEMENT, all of them by default. Shards are only ever
+# appended: ids are interleaved by their position in the list.
+DATABASE_SHARDS = ['default']
+for index, host in enumerate(
+        filter(None, os.getenv("DB_SHARD_HOSTS", "").split(",")), 1):
+    alias = f"shard_{index}"
+    DATABASES[alias] = {**DATABASES['default'], "HOST": host.strip()}
+    DATABASE_SHARDS.append(alias)
+SHARD_PLACEMENT = list(filter(
+    None, os.getenv("DB_SHARD_PLACEMENT", "").split(","))) or DATABASE_SHARDS
+
+# Caches shared by every worker, so what one stores, such as the replica
+# pins and idempotency keys, the others see. The default is a table in the
+# default database, created with python manage.py createcachetable; set
+# CACHE_BACKEND and CACHE_LOCATION to use memcached instead.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'core_cache'),
+    },
+}
+
+# Seconds the shard of a user is cached for, in the SHARD_CACHE cache.
+SHARD_CACHE = os.getenv("SHARD_CACHE", "default")
+SHARD_CACHE_SECONDS = int(os.getenv("SHARD_CACHE_SECONDS", "30"))
+
+# Read replicas, given as a comma separated list of hosts in DB_REPLICA_HOSTS.
+# Safe reads are routed to them by core.routers.ReplicaRouter.
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+        filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")), 1):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = [
+    'core.routers.ShardRouter',
+    'core.routers.ReplicaRouter',
+]
+
+# Responses to writes sent with an Idempotency-Key header are replayed to
+# repeats for this many seconds. IDEMPOTENCY_CACHE must be shared between
+# workers for repeats reaching another worker to be caught, see
+# core.checks.
+IDEMPOTENCY_CACHE = os.getenv("IDEMPOTENCY_CACHE", "default")
+IDEMPOTENCY_KEY_SECONDS = int(os.getenv("IDEMPOTENCY_KEY_SECONDS", "86400"))
+
+# After a write, the user's reads stay on the primary for this many seconds.
+# REPLICA_PIN_CACHE must be shared between workers, see core.checks.
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "5"))
+REPLICA_PIN_CACHE = os.getenv("REPLICA_PIN_CACHE", "default")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -114,6 +227,38 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+AUTHENTICATION_BACKENDS = ['core.auth.PasswordPoolBackend']
+
+# Lifetime of signed auth tokens, and how often each process reloads the
+# revoked tokens from the database.
+TOKEN_LIFETIME = int(os.getenv('TOKEN_LIFETIME', str(7 * 24 * 3600)))
+TOKEN_REVOCATION_SYNC_SECONDS = int(
+    os.getenv('TOKEN_REVOCATION_SYNC_SECONDS', '30'))
+
+# Hashers with tunable cost; PASSWORD_HASHER picks the one used for new
+# hashes and the others still verify, and upgrade, existing ones.
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHERS = [
+    'core.hashers.PBKDF2PasswordHasher',
+    'core.hashers.Argon2PasswordHasher',
+]
+if PASSWORD_HASHER == 'argon2':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop(1))
+PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', '260000'))
+ARGON2_TIME_COST = int(os.getenv('ARGON2_TIME_COST', '2'))
+ARGON2_MEMORY_COST = int(os.getenv('ARGON2_MEMORY_COST', '102400'))
+# One lane, so each Argon2 hash keeps to one core like PBKDF2 does.
+ARGON2_PARALLELISM = int(os.getenv('ARGON2_PARALLELISM', '1'))
+
+# Passwords hashed at the same time by all the server processes on the
+# host, half the cores by default; 0 for no limit. The slots are lock
+# files in PASSWORD_HASH_LOCK_DIR, which every process must share.
+PASSWORD_HASH_CONCURRENCY = int(os.getenv(
+    'PASSWORD_HASH_CONCURRENCY', str(max(1, (os.cpu_count() or 1) // 2))))
+PASSWORD_HASH_LOCK_DIR = os.getenv(
+    'PASSWORD_HASH_LOCK_DIR',
+    os.path.join(tempfile.gettempdir(), 'password-hash-slots'))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -134,6 +279,54 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Uploaded files. Names are content hashes, so they are served with
+# far-future cache headers.
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', '/vol/web/media')
+
+# Largest accepted recipe image, and the sizes of its thumbnails.
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_SIZE', str(20 * 1024 * 1024)))
+RECIPE_THUMBNAIL_SIZES = [160, 480, 960]
+
+# Deleted recipes are archived; archive_recipes moves those archived more
+# than RECIPE_ARCHIVE_AFTER_DAYS ago to the archive table, in transactions
+# of RECIPE_ARCHIVE_BATCH_SIZE recipes.
+RECIPE_ARCHIVE_AFTER_DAYS = int(os.getenv('RECIPE_ARCHIVE_AFTER_DAYS', '90'))
+RECIPE_ARCHIVE_BATCH_SIZE = int(os.getenv('RECIPE_ARCHIVE_BATCH_SIZE', '500'))
+
+# Number of hash partitions by user of the recipe tables, once converted
+# with the partition_recipes command.
+RECIPE_PARTITIONS = int(os.getenv('RECIPE_PARTITIONS', '16'))
+
+# Deleted accounts are purged by the purge_user task in transactions of
+# USER_PURGE_BATCH_SIZE rows, pausing USER_PURGE_PAUSE seconds between
+# them. Each job runs USER_PURGE_BATCHES_PER_JOB batches at most.
+USER_PURGE_BATCH_SIZE = int(os.getenv('USER_PURGE_BATCH_SIZE', '500'))
+USER_PURGE_BATCHES_PER_JOB = int(
+    os.getenv('USER_PURGE_BATCHES_PER_JOB', '20'))
+USER_PURGE_PAUSE = float(os.getenv('USER_PURGE_PAUSE', '0.05'))
+
+# Admin changelists count rows exactly below this many estimated rows and
+# show the planner's estimate above it.
+ADMIN_EXACT_COUNT_LIMIT = int(os.getenv('ADMIN_EXACT_COUNT_LIMIT', '10000'))
+
+# Production server run by the serve command. Workers are forked from a
+# warmed-up master and replaced after SERVER_MAX_REQUESTS requests, plus
+# up to SERVER_MAX_REQUESTS_JITTER more.
+SERVER_BIND = os.getenv('SERVER_BIND', '0.0.0.0:8000')
+SERVER_WORKERS = int(
+    os.getenv('SERVER_WORKERS', str(2 * (os.cpu_count() or 1) + 1)))
+SERVER_THREADS = int(os.getenv('SERVER_THREADS', '1'))
+SERVER_MAX_REQUESTS = int(os.getenv('SERVER_MAX_REQUESTS', '1000'))
+SERVER_MAX_REQUESTS_JITTER = int(
+    os.getenv('SERVER_MAX_REQUESTS_JITTER', '100'))
+SERVER_TIMEOUT = int(os.getenv('SERVER_TIMEOUT', '30'))
+
+# Directory of the OpenAPI schema written by the build_schema command.
+# The schema is generated on first use when it is missing.
+OPENAPI_SCHEMA_DIR = os.getenv('OPENAPI_SCHEMA_DIR', BASE_DIR / 'openapi')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -143,4 +336,24 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-}
\ No newline at end of file
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.getenv('THROTTLE_LOGIN_RATE', '30/minute'),
+        'signup': os.getenv('THROTTLE_SIGNUP_RATE', '30/minute'),
+        'user': os.getenv('THROTTLE_USER_RATE', '600/minute'),
+        'recipe': os.getenv('THROTTLE_RECIPE_RATE', '600/minute'),
+    },
+}
+
+# Name of a cache in CACHES to share throttle counters between workers,
+# one with an atomic incr such as memcached. Counters are kept per
+# process when unset.
+THROTTLE_CACHE = os.getenv('THROTTLE_CACHE')
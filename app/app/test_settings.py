@@ -0,0 +1,38 @@
+"""
+Settings for a fast test run.
+
+    python manage.py test --settings=app.test_settings
+
+Passwords are hashed with a cheap hasher, and the tests run in parallel
+with their own copy of the test databases per process.
+
+Besides the default database it defines shard_1 and replica_1, so the
+sharding, replica, archive and partitioning tests exercise real routing
+between PostgreSQL databases rather than a mocked router. Django only
+creates and migrates them when a selected test lists them in its
+databases attribute, which adds a second or two to a full run; the tests
+of a single app that only use the default database skip them.
+"""
+from app.settings import *  # noqa: F401,F403
+from app.settings import DATABASES
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+TEST_RUNNER = 'core.testing.ParallelTestRunner'
+
+# A second shard, so the tests cover routing between databases. New users
+# stay on the default database unless a test places them.
+DATABASES['shard_1'] = {
+    **DATABASES['default'],
+    'NAME': f"{DATABASES['default']['NAME']}_shard_1",
+}
+DATABASE_SHARDS = ['default', 'shard_1']
+SHARD_PLACEMENT = ['default']
+
+# A database standing in for a read replica. It is only a replica in the
+# tests that set DATABASE_REPLICAS, so it is migrated like the others;
+# they copy the rows a replica would have to it.
+DATABASES['replica_1'] = {
+    **DATABASES['default'],
+    'NAME': f"{DATABASES['default']['NAME']}_replica_1",
+}
@@ -13,19 +13,35 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-)
+from drf_spectacular.views import SpectacularSwaggerView
 from django.contrib import admin
-from django.urls import path,include
+from django.conf import settings
+from django.urls import path, include, re_path
+
+from core import views as core_views
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
+    path('api/schema/', core_views.SchemaView.as_view(), name='api-schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'),
 
     path('api/user/',include('user.urls')),
     path('api/recipe/',include('recipe.urls')),
+    path('api/batch/', core_views.BatchView.as_view(), name='batch'),
+    path(
+        'api/metrics/db-pool/',
+        core_views.DatabasePoolView.as_view(),
+        name='db-pool-metrics',
+    ),
+    path(
+        'api/metrics/jobs/',
+        core_views.JobQueueView.as_view(),
+        name='job-metrics',
+    ),
+    re_path(
+        r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'),
+        core_views.serve_media,
+        name='media',
+    ),
 ]
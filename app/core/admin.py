@@ -1,13 +1,102 @@
+import json
+
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
 from  django.contrib.auth.admin import  UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 from django.utils.translation import gettext as _
-from core import models
+from core import deletion, models
+
+
+def estimate_count(queryset):
+    """Return the planner's estimate of the rows in queryset.
+
+    Returns None on databases without one; only PostgreSQL is supported.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts the planner's row estimate for large results.
+
+    Rows are only counted exactly when fewer than ADMIN_EXACT_COUNT_LIMIT
+    are estimated, so large tables never run a full COUNT(*).
+    """
+    estimated = False
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < settings.ADMIN_EXACT_COUNT_LIMIT:
+            return self.object_list.count()
+        self.estimated = True
+        return estimate
+
+
+class KeysetChangeList(ChangeList):
+    """Changelist paged by primary key instead of by offset.
+
+    Rows are listed newest first and the next page holds the rows below
+    the last key shown (?pk__lt=), which an index finds directly, where
+    OFFSET reads and discards every earlier row. Sorting by a column
+    falls back to numbered pages.
+    """
+    cursor_var = 'pk__lt'
+    keyset = False
+    next_url = first_url = None
+
+    def get_results(self, request):
+        if ORDER_VAR in self.params:
+            return super().get_results(request)
+
+        paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page)
+        self.result_list = self.queryset[:self.list_per_page]
+        rows = list(self.result_list)
+        if len(rows) == self.list_per_page and self.queryset.filter(
+                pk__lt=rows[-1].pk).exists():
+            self.next_url = self.get_query_string(
+                {self.cursor_var: rows[-1].pk}, [PAGE_VAR])
+        if self.cursor_var in self.params:
+            self.first_url = self.get_query_string(
+                remove=[self.cursor_var, PAGE_VAR])
+
+        self.keyset = True
+        self.result_count = paginator.count
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = bool(self.next_url or self.first_url)
+        self.paginator = paginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Admin pages for tables too large to count or page by offset."""
+    ordering = ['-pk']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
 
 
 class UserAdmin(BaseUserAdmin):
     """Define the admin pages for users"""
     ordering = ['id']
-    list_display = ['email','name']
+    list_display = ['email', 'name', 'is_active']
     fieldsets = (
         (None, {'fields': ('email','password')}),
         (
@@ -28,6 +117,7 @@ class UserAdmin(BaseUserAdmin):
          ),
     )
     readonly_fields = ['last_login']
+    search_fields = ['email__startswith']
     add_fieldsets = (
         (None, {
             'classes': ('wide',),
@@ -42,8 +132,101 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+    def get_deleted_objects(self, objs, request):
+        # Listing every row a heavy user owns is slow in itself; their
+        # data is deleted in the background.
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_model(self, request, obj):
+        """Deactivate the user and purge their data in the background"""
+        deletion.schedule(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            deletion.schedule(user)
+
 
 admin.site.register(models.User,UserAdmin)
-admin.site.register(models.Recipe)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
+
+
+class RecipeTagInline(admin.TabularInline):
+    """Define the tags of a recipe on its admin page"""
+    model = models.RecipeTag
+    fields = ['tag']
+    autocomplete_fields = ['tag']
+    extra = 1
+
+
+class RecipeIngredientInline(admin.TabularInline):
+    """Define the ingredients of a recipe on its admin page"""
+    model = models.RecipeIngredient
+    fields = ['ingredient']
+    autocomplete_fields = ['ingredient']
+    extra = 1
+
+
+@admin.register(models.Recipe)
+class RecipeAdmin(LargeTableAdmin):
+    """Define the admin pages for recipes"""
+    list_display = ['title', 'user', 'time_minutes', 'price', 'status']
+    list_filter = ['status']
+    list_select_related = ['user']
+    # Prefix matches on indexed columns instead of LIKE '%term%' scans,
+    # and exact ones on the unique email.
+    search_fields = ['title__startswith', '=user__email']
+    autocomplete_fields = ['user']
+    readonly_fields = ['archived_at']
+    inlines = [RecipeTagInline, RecipeIngredientInline]
+
+    def get_queryset(self, request):
+        # Archived recipes can still be found and restored here.
+        queryset = models.Recipe.all_objects.get_queryset()
+        return queryset.order_by(*self.get_ordering(request))
+
+
+@admin.register(models.ArchivedRecipe)
+class ArchivedRecipeAdmin(LargeTableAdmin):
+    """Define the admin pages for recipes moved to the archive"""
+    list_display = ['title', 'user', 'archived_at', 'moved_at']
+    list_select_related = ['user']
+    search_fields = ['title__startswith', '=user__email']
+    readonly_fields = ['recipe_id', 'user', 'title', 'data', 'archived_at',
+                       'moved_at']
+
+
+@admin.register(models.Tag)
+class TagAdmin(LargeTableAdmin):
+    """Define the admin pages for tags"""
+    list_display = ['name', 'user']
+    list_select_related = ['user']
+    search_fields = ['name__startswith']
+    autocomplete_fields = ['user']
+
+
+@admin.register(models.Ingredient)
+class IngredientAdmin(LargeTableAdmin):
+    """Define the admin pages for ingredients"""
+    list_display = ['name', 'user']
+    list_select_related = ['user']
+    search_fields = ['name__startswith']
+    autocomplete_fields = ['user']
+
+
+@admin.register(models.Job)
+class JobAdmin(admin.ModelAdmin):
+    """Define the admin pages for background jobs"""
+    list_display = ['id', 'task', 'status', 'attempts', 'run_at',
+                    'finished_at']
+    list_filter = ['status']
+    search_fields = ['task']
+    readonly_fields = ['created_at', 'locked_at', 'locked_by', 'last_error']
+
+
+@admin.register(models.WebhookEndpoint)
+class WebhookEndpointAdmin(admin.ModelAdmin):
+    """Define the admin pages for webhook endpoints"""
+    list_display = ['url', 'is_active', 'last_event_id', 'failures',
+                    'next_attempt_at']
+    list_filter = ['is_active']
+    readonly_fields = ['failures', 'next_attempt_at', 'leased_until',
+                       'last_error']
@@ -1,6 +1,30 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core import checks, sharding, tokens  # noqa: F401
+        from core.db import check_connections
+        request_started.connect(
+            check_connections, dispatch_uid='core.check_connections')
+        User = self.get_model('User')
+        pre_save.connect(
+            sharding.place_user, sender=User,
+            dispatch_uid='core.place_user')
+        post_save.connect(
+            sharding.copy_user, sender=User, dispatch_uid='core.copy_user')
+        post_save.connect(
+            tokens.revoke_on_change, sender=User,
+            dispatch_uid='core.revoke_on_change')
+        post_delete.connect(
+            tokens.revoke_on_delete, sender=User,
+            dispatch_uid='core.revoke_on_delete')
+        post_migrate.connect(
+            sharding.configure_sequences, sender=self,
+            dispatch_uid='core.configure_sequences')
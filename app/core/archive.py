@@ -0,0 +1,76 @@
+"""
+Archival of deleted recipes.
+
+Deleting a recipe through the API only archives it: the row stays in the
+recipe table with status 'archived', so it can still be restored, but
+Recipe.objects and the partial indexes leave it out. The archive_recipes
+command later moves recipes archived more than RECIPE_ARCHIVE_AFTER_DAYS
+ago to the ArchivedRecipe table, in batches of their own transaction,
+so the recipe table only holds what the API reads.
+"""
+from django.db import router, transaction
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+
+from core import sharding
+from core.models import ArchivedRecipe, Recipe
+
+
+def archive(recipe):
+    """Archive recipe, hiding it from Recipe.objects."""
+    recipe.status = Recipe.ARCHIVED
+    recipe.archived_at = timezone.now()
+    Recipe.all_objects.filter(user_id=recipe.user_id, pk=recipe.pk).update(
+        status=recipe.status, archived_at=recipe.archived_at)
+
+
+def restore(recipe):
+    """Make an archived recipe active again."""
+    recipe.status = Recipe.ACTIVE
+    recipe.archived_at = None
+    Recipe.all_objects.filter(user_id=recipe.user_id, pk=recipe.pk).update(
+        status=recipe.status, archived_at=None)
+
+
+def to_archive(recipe):
+    """Return the ArchivedRecipe holding a copy of recipe."""
+    return ArchivedRecipe(
+        recipe_id=recipe.pk,
+        user_id=recipe.user_id,
+        title=recipe.title,
+        archived_at=recipe.archived_at,
+        data={
+            'time_minutes': recipe.time_minutes,
+            'price': recipe.price,
+            'description': recipe.description,
+            'link': recipe.link,
+            'image': recipe.image.name,
+            'thumbnails': recipe.thumbnails,
+            'tags': [tag.name for tag in recipe.tags.all()],
+            'ingredients': [
+                ingredient.name for ingredient in recipe.ingredients.all()],
+        },
+    )
+
+
+def move_batch(cutoff, size):
+    """Move up to size recipes archived before cutoff to the archive.
+
+    Returns the number of recipes moved. Runs on the current shard, and
+    leaves out the recipes of users being moved to another one.
+    """
+    moving = sharding.moving_users()
+    with transaction.atomic(using=router.db_for_write(Recipe)):
+        recipes = list(
+            Recipe.all_objects
+            .filter(status=Recipe.ARCHIVED, archived_at__lt=cutoff)
+            .exclude(user_id__in=moving)
+            .select_for_update(skip_locked=True)
+            .order_by('pk')[:size]
+        )
+        prefetch_related_objects(recipes, 'tags', 'ingredients')
+        ArchivedRecipe.objects.bulk_create(
+            [to_archive(recipe) for recipe in recipes])
+        Recipe.all_objects.filter(
+            pk__in=[recipe.pk for recipe in recipes]).delete()
+    return len(recipes)
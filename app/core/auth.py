@@ -0,0 +1,39 @@
+"""
+Authentication backends.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password
+
+from core import hashers
+
+
+class PasswordPoolBackend(ModelBackend):
+    """ModelBackend that limits how many passwords are hashed at once.
+
+    A burst of logins uses at most PASSWORD_HASH_CONCURRENCY cores of the
+    host and cannot starve the processes serving other requests.
+    Outdated hashes are upgraded on login.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so unknown users take as long as known ones.
+            hashers.run(make_password, password)
+            return None
+
+        is_correct, must_update = hashers.run(
+            hashers.verify_password, password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            user.password = hashers.run(make_password, password)
+            user.save(update_fields=['password'])
+        return user
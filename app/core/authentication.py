@@ -0,0 +1,27 @@
+"""
+Authentication classes for the API.
+"""
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from core import tokens
+
+
+class SignedTokenAuthentication(TokenAuthentication):
+    """Authenticate with a signed token, without a database lookup.
+
+    The user is returned with all fields deferred; they are loaded the
+    first time a view reads one. Deactivated and deleted users are
+    refused because both revoke their tokens. Unsigned keys are looked up
+    as DRF tokens so clients holding one keep working.
+    """
+
+    def authenticate_credentials(self, key):
+        if not tokens.is_signed(key):
+            return super().authenticate_credentials(key)
+        try:
+            token = tokens.verify(key)
+        except tokens.InvalidToken as exc:
+            raise exceptions.AuthenticationFailed(_(str(exc)))
+        return tokens.deferred_user(token.user_id), key
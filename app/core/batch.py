@@ -0,0 +1,169 @@
+"""
+Run several API requests as part of one batch request.
+
+Each sub-request is dispatched straight to its view with the batch's
+already authenticated user, so the token is checked once. Batches made
+only of safe requests are independent reads and run concurrently on a
+bounded thread pool; batches with writes run one at a time, in order.
+Middleware does not run for sub-requests. A sub-request that raises gets
+the error response REST framework's exception handler gives it, or a 500
+it logs, and the rest of the batch still runs.
+"""
+import asyncio
+import contextvars
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.urls import Resolver404, resolve
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+
+from core import idempotency
+from core.renderers import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Headers of the batch request not passed on to its sub-requests: its
+# idempotency key, which would make the sub-requests replay each other,
+# hop-by-hop headers and those describing the batch's own body.
+DROPPED_HEADERS = {
+    'HTTP_' + idempotency.HEADER.upper().replace('-', '_'),
+    'HTTP_CONNECTION', 'HTTP_KEEP_ALIVE', 'HTTP_PROXY_CONNECTION',
+    'HTTP_TE', 'HTTP_TRAILER', 'HTTP_TRANSFER_ENCODING', 'HTTP_UPGRADE',
+    'HTTP_CONTENT_ENCODING', 'HTTP_CONTENT_MD5', 'HTTP_EXPECT',
+}
+
+_executor = None
+
+
+def get_executor():
+    """Return the thread pool used for concurrent sub-requests."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BATCH_THREADS,
+            thread_name_prefix='batch',
+        )
+    return _executor
+
+
+def shutdown_executor():
+    """Stop the sub-request thread pool."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def build_request(request, spec):
+    """Return the HttpRequest for a sub-request of request."""
+    url = urlsplit(spec['path'])
+    body = b'' if spec.get('body') is None else dumps(spec['body'])
+    environ = {
+        key: value for key, value in request.META.items()
+        if (key.startswith('HTTP_') and key not in DROPPED_HEADERS)
+        or key in ('REMOTE_ADDR', 'SERVER_NAME', 'SERVER_PORT')
+    }
+    environ.update({
+        'REQUEST_METHOD': spec['method'],
+        'PATH_INFO': url.path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.url_scheme': request.scheme,
+    })
+    sub_request = WSGIRequest(environ)
+    # Picked up by DRF's Request so the views skip authentication.
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def _body(response):
+    """Return the decoded body of a sub-response."""
+    if hasattr(response, 'data'):
+        return response.data
+    if not response.content:
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return loads(response.content)
+    return response.content.decode(response.charset)
+
+
+def _error(status, detail):
+    return {'status': status, 'headers': {}, 'body': {'detail': detail}}
+
+
+def run(request, spec):
+    """Dispatch one sub-request and return its result."""
+    try:
+        match = resolve(urlsplit(spec['path']).path)
+    except Resolver404:
+        return _error(404, 'Not found.')
+    view_class = getattr(match.func, 'view_class', None)
+    if not getattr(view_class, 'batchable', True):
+        return _error(400, 'This endpoint cannot be batched.')
+
+    view = match.func
+    if asyncio.iscoroutinefunction(view):
+        view = async_to_sync(view)
+    sub_request = build_request(request, spec)
+    try:
+        # In a context of its own, so the shard or replica a view sets is
+        # not left behind if it raises.
+        response = contextvars.copy_context().run(
+            view, sub_request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return _result(response)
+    except Exception as exc:
+        response = api_settings.EXCEPTION_HANDLER(exc, {
+            'view': None, 'args': match.args, 'kwargs': match.kwargs,
+            'request': sub_request,
+        })
+        if response is None:
+            logger.exception(
+                'Batch sub-request %s %s failed',
+                spec['method'], spec['path'])
+            return _error(500, 'A server error occurred.')
+        # Not rendered: no content negotiation ran for it.
+        return _result(response)
+
+
+def _result(response):
+    """Return the batch entry of a sub-response."""
+    return {
+        'status': response.status_code,
+        'headers': {
+            name: value for name, value in response.items()
+            if name not in ('Content-Type', 'Content-Length', 'Vary',
+                            'Allow')
+        },
+        'body': _body(response),
+    }
+
+
+def _run_in_thread(request, spec):
+    """Run a sub-request on a pool thread with its own connection."""
+    close_old_connections()
+    try:
+        return run(request, spec)
+    finally:
+        close_old_connections()
+
+
+def run_batch(request, specs):
+    """Return the results of every sub-request, in request order."""
+    if len(specs) > 1 and all(
+            spec['method'] in SAFE_METHODS for spec in specs):
+        return list(get_executor().map(
+            lambda spec: _run_in_thread(request, spec), specs))
+    return [run(request, spec) for spec in specs]
@@ -0,0 +1,56 @@
+"""
+System checks for the core app.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+# Cache backends kept in each process, which other workers cannot see.
+LOCAL_CACHES = {
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+}
+
+# Cache backends whose incr reads and writes the value separately.
+NON_ATOMIC_INCR_CACHES = {
+    'django.core.cache.backends.db.DatabaseCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+}
+
+
+def is_shared(alias):
+    """Return True if the cache alias is shared between processes."""
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    return backend is not None and backend not in LOCAL_CACHES
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    """Refuse caches kept per process where workers must share them."""
+    errors = []
+    if settings.DATABASE_REPLICAS and not is_shared(
+            settings.REPLICA_PIN_CACHE):
+        errors.append(Error(
+            'REPLICA_PIN_CACHE is not shared between workers.',
+            hint='A user writing through one worker would read from a '
+                 'replica through another. Point it at a database or '
+                 'memcached cache.',
+            id='core.E001',
+        ))
+    if not is_shared(settings.IDEMPOTENCY_CACHE):
+        errors.append(Error(
+            'IDEMPOTENCY_CACHE is not shared between workers.',
+            hint='A repeat reaching another worker than the first request '
+                 'would run again. Point it at a database or memcached '
+                 'cache.',
+            id='core.E002',
+        ))
+    throttle_cache = settings.THROTTLE_CACHE
+    if throttle_cache and settings.CACHES.get(throttle_cache, {}).get(
+            'BACKEND') in NON_ATOMIC_INCR_CACHES:
+        errors.append(Warning(
+            'THROTTLE_CACHE does not increment counters atomically.',
+            hint='Concurrent requests can be counted once and pass the '
+                 'limit. Use a memcached cache.',
+            id='core.W001',
+        ))
+    return errors
@@ -0,0 +1,41 @@
+"""
+Database health checks.
+"""
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+def check_connections(**kwargs):
+    """Close persistent connections that stopped working.
+
+    Runs at the start of each request, at most once per
+    DB_HEALTH_CHECK_INTERVAL seconds per connection, so a connection the
+    server dropped is replaced before the view uses it. Pooled connections
+    are only opened once a request queries, so the pool checks them when
+    handing them out instead.
+    """
+    interval = getattr(settings, 'DB_HEALTH_CHECK_INTERVAL', 30)
+    now = time.monotonic()
+    for conn in connections.all():
+        if conn.connection is None or conn.in_atomic_block:
+            continue
+        if now - getattr(conn, 'health_checked_at', 0) < interval:
+            continue
+        conn.health_checked_at = now
+        if not conn.is_usable():
+            conn.close()
+
+
+def ping(alias='default'):
+    """Run a trivial query, raising the database error if it fails."""
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def pending_migrations(alias='default'):
+    """Return the migrations not yet applied to the database."""
+    executor = MigrationExecutor(connections[alias])
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
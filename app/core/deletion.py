@@ -0,0 +1,81 @@
+"""
+Background deletion of user accounts.
+
+Deleting a user in one go cascades through every recipe, tag, ingredient
+and M2M row they own in a single transaction, holding locks for as long
+as that takes. Instead, the account is deactivated and its tokens
+revoked at once, and the purge_user task deletes the rows in batches of
+USER_PURGE_BATCH_SIZE, each in its own short transaction. A job runs at
+most USER_PURGE_BATCHES_PER_JOB batches and then queues the next one
+with the counts deleted so far in its payload, so no job runs long
+enough to look stale and other jobs get their turn.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from rest_framework.authtoken.models import Token
+
+from core import jobs, sharding, tokens
+from core.models import (ArchivedRecipe, Ingredient, Recipe,
+                         RecipeIngredient, RecipeTag, Tag)
+
+
+def schedule(user):
+    """Deactivate user now and queue the deletion of their data."""
+    from core.tasks import purge_user
+
+    with transaction.atomic():
+        get_user_model().objects.filter(pk=user.pk).update(is_active=False)
+        Token.objects.filter(user_id=user.pk).delete()
+        tokens.revoke_user(user)
+        return jobs.enqueue(purge_user, {'user_id': user.pk})
+
+
+def purge_steps(user_id):
+    """Return the querysets to empty, in order, before deleting the user."""
+    return [
+        ('recipe_tags', RecipeTag.objects.filter(user_id=user_id)),
+        ('recipe_ingredients', RecipeIngredient.objects.filter(
+            user_id=user_id)),
+        ('recipes', Recipe.all_objects.filter(user_id=user_id)),
+        ('archived_recipes', ArchivedRecipe.objects.filter(user_id=user_id)),
+        ('tags', Tag.objects.filter(user_id=user_id)),
+        ('ingredients', Ingredient.objects.filter(user_id=user_id)),
+    ]
+
+
+def delete_batch(queryset, size):
+    """Delete up to size rows of queryset in a transaction of their own."""
+    using = router.db_for_write(queryset.model)
+    with transaction.atomic(using=using):
+        ids = list(
+            queryset.using(using).values_list('pk', flat=True)[:size])
+        if ids:
+            queryset.model._base_manager.using(using).filter(
+                pk__in=ids).delete()
+    return len(ids)
+
+
+def purge(user_id, deleted, batches):
+    """Delete up to batches batches of the user's rows.
+
+    Updates deleted, the rows deleted so far per step, and returns True
+    once the user and all their rows are gone. Runs on the shard of the
+    user, see sharding.use_shard().
+    """
+    for name, queryset in purge_steps(user_id):
+        while batches:
+            count = delete_batch(queryset, settings.USER_PURGE_BATCH_SIZE)
+            if not count:
+                break
+            deleted[name] = deleted.get(name, 0) + count
+            batches -= 1
+            # Let replicas and other transactions catch up.
+            time.sleep(settings.USER_PURGE_PAUSE)
+        else:
+            return False
+    sharding.delete_user(user_id)
+    get_user_model().objects.filter(pk=user_id).delete()
+    return True
@@ -0,0 +1,106 @@
+"""
+Password hashers with tunable cost, and a limit on concurrent hashing.
+
+The cost parameters are read from settings each time they are used, so
+raising them makes Django rehash a user's password on their next
+successful login. Hashes run on the request thread, which hashlib and
+argon2 let other threads run alongside, at most
+PASSWORD_HASH_CONCURRENCY at a time on the host.
+"""
+import fcntl
+import os
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2 with PASSWORD_HASH_ITERATIONS iterations."""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2 with the ARGON2_* cost settings."""
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+def verify_password(password, encoded):
+    """Return (is_correct, must_update) for a password and stored hash.
+
+    Mirrors django.contrib.auth.hashers.check_password, but returns the
+    rehash decision instead of saving so it can run through run().
+    """
+    if password is None or not hashers.is_password_usable(encoded):
+        return False, False
+    preferred = hashers.get_hasher('default')
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False, False
+
+    hasher_changed = hasher.algorithm != preferred.algorithm
+    must_update = hasher_changed or preferred.must_update(encoded)
+    is_correct = hasher.verify(password, encoded)
+    if not is_correct and not hasher_changed and must_update:
+        hasher.harden_runtime(password, encoded)
+    return is_correct, is_correct and must_update
+
+
+@contextmanager
+def hashing_slot():
+    """Hold one of the host's PASSWORD_HASH_CONCURRENCY hashing slots.
+
+    Each slot is a file lock in PASSWORD_HASH_LOCK_DIR, so the limit holds
+    across every server process and thread on the host. A caller finding
+    every slot taken waits on one of them.
+    """
+    size = settings.PASSWORD_HASH_CONCURRENCY
+    if not size:
+        yield
+        return
+    directory = settings.PASSWORD_HASH_LOCK_DIR
+    os.makedirs(directory, exist_ok=True)
+    paths = [
+        os.path.join(directory, f'password-hash-{slot}.lock')
+        for slot in range(size)
+    ]
+    # Spread waiters over the slots.
+    random.shuffle(paths)
+    for path in paths:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        flags = fcntl.LOCK_EX
+        if path != paths[-1]:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(fd, flags)
+        except BlockingIOError:
+            os.close(fd)
+            continue
+        try:
+            yield
+        finally:
+            # Closing the file releases the lock.
+            os.close(fd)
+        return
+
+
+def run(func, *args):
+    """Run a hashing function once a hashing slot is free."""
+    with hashing_slot():
+        return func(*args)
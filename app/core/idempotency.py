@@ -0,0 +1,162 @@
+"""
+Idempotency keys for API writes.
+
+A client sends an Idempotency-Key header with a write it may retry. The
+first response to the key is stored in the IDEMPOTENCY_CACHE cache for
+IDEMPOTENCY_KEY_SECONDS, as its status and compressed JSON body, and
+repeats of the request get it back without running the view again.
+While the first request runs, repeats get a 409, and a key reused for a
+different request gets a 422. Keys are scoped to the user.
+"""
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import UploadedFile
+from django.utils.datastructures import MultiValueDict
+from rest_framework import exceptions, status
+from rest_framework.response import Response
+
+from core.renderers import dumps, loads
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+class RequestInProgress(exceptions.APIException):
+    """An earlier request with the same key has not finished."""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is in progress.'
+    default_code = 'idempotency_in_progress'
+
+
+class KeyReused(exceptions.APIException):
+    """The key was first used for a different request."""
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was used for another request.'
+    default_code = 'idempotency_key_reused'
+
+
+def _cache():
+    return caches[settings.IDEMPOTENCY_CACHE]
+
+
+def cache_key(user_id, key):
+    """Return the cache key of a user's idempotency key."""
+    return f'idempotency:{user_id}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def file_digest(uploaded):
+    """Return the SHA-256 of an uploaded file's content."""
+    digest = getattr(uploaded, 'sha256', None)
+    if digest is None:
+        sha256 = hashlib.sha256()
+        for chunk in uploaded.chunks():
+            sha256.update(chunk)
+        uploaded.seek(0)
+        digest = sha256.hexdigest()
+    return digest
+
+
+def _identity(data):
+    """Return data as JSON, with uploaded files as name, size and digest."""
+    if isinstance(data, UploadedFile):
+        return {
+            'name': data.name, 'size': data.size,
+            'sha256': file_digest(data),
+        }
+    if isinstance(data, MultiValueDict):
+        return {
+            key: [_identity(value) for value in values]
+            for key, values in data.lists()
+        }
+    return data
+
+
+def fingerprint(request):
+    """Return a digest of what the request asks for."""
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.path}\n'.encode())
+    digest.update(dumps(_identity(request.data)))
+    return digest.hexdigest()
+
+
+def pack(fingerprint, response):
+    """Return the stored form of a response."""
+    return fingerprint, response.status_code, zlib.compress(
+        dumps(response.data))
+
+
+def unpack(stored):
+    """Return the response a stored entry replays."""
+    _, status_code, body = stored
+    response = Response(loads(zlib.decompress(body)), status=status_code)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+class IdempotencyMixin:
+    """Replay the stored response of creates and updates with a key.
+
+    Other writes opt in by calling _idempotent() with their handler.
+    Requests rejected with an exception, such as invalid ones, are not
+    stored, so a corrected retry runs. Place it before mixins that open
+    transactions, so responses are only stored once committed.
+    """
+
+    def get_idempotency_key(self, request):
+        """Return the request's key, or None if it has none."""
+        key = request.headers.get(HEADER)
+        if key is None:
+            return None
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise exceptions.ValidationError({
+                HEADER: f'Must be 1 to {MAX_KEY_LENGTH} characters.'})
+        return key
+
+    def _idempotent(self, handler, request, *args, **kwargs):
+        key = self.get_idempotency_key(request)
+        if key is None:
+            return handler(request, *args, **kwargs)
+
+        cache = _cache()
+        stored_key = cache_key(request.user.pk, key)
+        lock_key = f'{stored_key}:lock'
+        request_fingerprint = fingerprint(request)
+
+        def replay():
+            stored = cache.get(stored_key)
+            if stored is None:
+                return None
+            if stored[0] != request_fingerprint:
+                raise KeyReused()
+            return unpack(stored)
+
+        response = replay()
+        if response is not None:
+            return response
+        # No request outlives the lock; workers are killed after it.
+        if not cache.add(lock_key, True, settings.SERVER_TIMEOUT):
+            raise RequestInProgress()
+        try:
+            # The first request may have finished since replay().
+            response = replay()
+            if response is not None:
+                return response
+            response = handler(request, *args, **kwargs)
+            # Server errors may be transient, so retries run again.
+            if response.status_code < 500:
+                cache.set(
+                    stored_key, pack(request_fingerprint, response),
+                    settings.IDEMPOTENCY_KEY_SECONDS)
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    def create(self, request, *args, **kwargs):
+        return self._idempotent(super().create, request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        return self._idempotent(super().update, request, *args, **kwargs)
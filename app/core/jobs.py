@@ -0,0 +1,194 @@
+"""
+Background job queue stored in the database.
+
+Jobs are rows of core.Job. Workers claim them with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers can poll the
+same table without handing a job out twice or blocking each other.
+Functions decorated with @task in an app's tasks module can be queued.
+
+A claim is a lease: the worker renews it with heartbeat() while the job
+runs, and requeue_stale() hands out jobs whose lease expired. A worker
+that lost its lease cannot record the job's outcome any more.
+"""
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from core.models import Job
+
+_tasks = {}
+
+
+class UnknownTask(Exception):
+    """No task is registered under the job's name."""
+
+
+class LeaseLost(Exception):
+    """The job was handed to another worker before it finished."""
+
+
+class Retry(Exception):
+    """Raised by a task to be run again after delay seconds.
+
+    Unlike a failure, it does not use up one of the job's attempts.
+    """
+
+    def __init__(self, delay):
+        super().__init__(delay)
+        self.delay = delay
+
+
+def task(func):
+    """Register func so it can be queued with enqueue()."""
+    func.task_name = f'{func.__module__}.{func.__qualname__}'
+    _tasks[func.task_name] = func
+    return func
+
+
+def get_task(name):
+    """Return the registered task called name."""
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise UnknownTask(name)
+
+
+def enqueue(func, payload=None, *, priority=0, delay=0, max_attempts=None):
+    """Queue a run of a registered task and return the Job."""
+    get_task(getattr(func, 'task_name', None))
+    return Job.objects.create(
+        task=func.task_name,
+        payload=payload or {},
+        priority=priority,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def worker_name():
+    """Return a name identifying this worker process."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker, limit=1):
+    """Lock and return up to limit jobs that are due, for worker."""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_at__lte=now)
+            .order_by('-priority', 'run_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        Job.objects.filter(id__in=ids).update(
+            status=Job.RUNNING,
+            locked_at=now,
+            locked_by=worker,
+            attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(id__in=ids).order_by('-priority', 'run_at'))
+
+
+def heartbeat(worker, job_ids):
+    """Renew worker's lease on the running jobs; return how many it holds."""
+    return Job.objects.filter(
+        id__in=job_ids, status=Job.RUNNING, locked_by=worker,
+    ).update(locked_at=timezone.now())
+
+
+def backoff(attempts):
+    """Return the seconds to wait before retrying after attempts runs."""
+    delay = settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return min(delay, settings.JOB_RETRY_BACKOFF_MAX) * random.uniform(0.5, 1)
+
+
+def run(job):
+    """Run a claimed job and record the outcome; return True on success.
+
+    Raises LeaseLost, without recording anything, if the job was handed
+    out again while it ran.
+    """
+    # Each claim counts an attempt, so the count tells claims apart.
+    lease = {'locked_by': job.locked_by, 'attempts': job.attempts}
+    try:
+        get_task(job.task)(**job.payload)
+    except Retry as exc:
+        job.status = Job.QUEUED
+        job.run_at = timezone.now() + timedelta(seconds=exc.delay)
+        job.attempts -= 1
+        success = False
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(
+                seconds=backoff(job.attempts))
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+        success = False
+    else:
+        job.status = Job.DONE
+        job.finished_at = timezone.now()
+        job.last_error = ''
+        success = True
+    job.locked_at = None
+    job.locked_by = ''
+    saved = Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, **lease,
+    ).update(
+        status=job.status, run_at=job.run_at, attempts=job.attempts,
+        finished_at=job.finished_at, last_error=job.last_error,
+        locked_at=None, locked_by='',
+    )
+    if not saved:
+        raise LeaseLost(job.pk)
+    return success
+
+
+def requeue_stale():
+    """Requeue running jobs whose worker stopped renewing its lease.
+
+    The lost run counts as one of the job's attempts, so jobs that have
+    used them all fail instead. Returns the number of jobs requeued.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT),
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=now, locked_at=None, locked_by='',
+        last_error='The worker running the job went away.',
+    )
+    return stale.update(status=Job.QUEUED, locked_at=None, locked_by='')
+
+
+def stats():
+    """Return the queue metrics."""
+    now = timezone.now()
+    counts = dict(
+        Job.objects.values_list('status').annotate(count=Count('id'))
+        .order_by()
+    )
+    oldest = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=now,
+    ).aggregate(oldest=Min('run_at'))['oldest']
+    last_hour = Job.objects.filter(finished_at__gte=now - timedelta(hours=1))
+    return {
+        'counts': {
+            status: counts.get(status, 0)
+            for status, _ in Job.STATUS_CHOICES
+        },
+        'oldest_due_seconds': (
+            (now - oldest).total_seconds() if oldest else 0),
+        'done_last_hour': last_hour.filter(status=Job.DONE).count(),
+        'failed_last_hour': last_hour.filter(status=Job.FAILED).count(),
+    }
@@ -0,0 +1,48 @@
+"""
+Django command to move long-archived recipes to the archive table.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import archive, sharding
+
+
+class Command(BaseCommand):
+    """Django command to move archived recipes out of the recipe table."""
+    help = 'Move recipes archived more than RECIPE_ARCHIVE_AFTER_DAYS ' \
+           'ago to the archive table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.RECIPE_ARCHIVE_AFTER_DAYS,
+            help='Move recipes archived more than this many days ago.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.RECIPE_ARCHIVE_BATCH_SIZE,
+            help='Recipes moved per transaction.',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.05,
+            help='Seconds to wait between batches.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        size = options['batch_size']
+        total = 0
+        for alias in settings.DATABASE_SHARDS:
+            with sharding.use_database(alias):
+                while True:
+                    moved = archive.move_batch(cutoff, size)
+                    total += moved
+                    if moved < size:
+                        break
+                    time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {total} recipes to the archive.'))
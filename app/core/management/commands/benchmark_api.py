@@ -0,0 +1,174 @@
+"""
+Django command to benchmark the hot paths of the API.
+
+Sample data is created inside a transaction that is rolled back at the end,
+so the command can be run against a development database.
+"""
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from core.pool import ConnectionPool
+from core.routers import DIRECTORY
+from core.renderers import FastJSONRenderer
+from recipe.readers import get_reader
+from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the API."""
+    help = 'Benchmark serialization and rendering of the recipe endpoints.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=500,
+            help='Number of recipes to create for the benchmark user.',
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=20,
+            help='Number of timed runs per case.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        self.iterations = options['iterations']
+        setup_test_environment()
+        try:
+            with transaction.atomic():
+                user = self.seed(options['recipes'])
+                self.run_cases(user)
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+    def seed(self, count):
+        """Create a user with recipes, tags and ingredients."""
+        # Kept on the default database, so the rollback covers its data.
+        user = get_user_model().objects.create_user(
+            email='benchmark@example.com',
+            password='benchmark-pass',
+            shard=DIRECTORY,
+        )
+        Tag.objects.bulk_create(
+            Tag(user=user, name=f'Tag {i}') for i in range(10))
+        Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f'Ingredient {i}') for i in range(20))
+        Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=i % 90 + 5,
+                price=Decimal('4.25') + i % 50,
+                description='Sample description ' * 20,
+                link=f'https://example.com/recipes/{i}.pdf',
+            )
+            for i in range(count)
+        )
+        # Not every backend sets primary keys on bulk_create().
+        tags = list(Tag.objects.filter(user=user).order_by('id'))
+        ingredients = list(
+            Ingredient.objects.filter(user=user).order_by('id'))
+        recipes = list(Recipe.objects.filter(user=user).order_by('id'))
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(
+                recipe=recipe, tag=tags[(i + j) % 10], user=user)
+            for i, recipe in enumerate(recipes) for j in range(3)
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            Recipe.ingredients.through(
+                recipe=recipe, ingredient=ingredients[(i + j) % 20],
+                user=user)
+            for i, recipe in enumerate(recipes) for j in range(5)
+        )
+        self.stdout.write(f'Seeded {count} recipes.')
+        return user
+
+    def measure(self, func):
+        """Return the median wall and CPU seconds for func."""
+        func()
+        wall, cpu = [], []
+        for _ in range(self.iterations):
+            start_wall, start_cpu = time.perf_counter(), time.process_time()
+            func()
+            wall.append(time.perf_counter() - start_wall)
+            cpu.append(time.process_time() - start_cpu)
+        return statistics.median(wall), statistics.median(cpu)
+
+    def report(self, name, timing, extra=''):
+        """Write a single result line."""
+        wall, cpu = timing
+        self.stdout.write(
+            f'{name:<36} {wall * 1000:9.2f} ms {cpu * 1000:9.2f} ms cpu'
+            f'{extra}'
+        )
+
+    def compare(self, name, baseline, candidate):
+        """Measure two implementations of the same operation."""
+        base = self.measure(baseline)
+        fast = self.measure(candidate)
+        self.report(f'{name} (baseline)', base)
+        self.report(f'{name} (optimized)', fast, f'  x{base[0] / fast[0]:.1f}')
+
+    def run_cases(self, user):
+        """Run every benchmark case."""
+        queryset = Recipe.objects.filter(user=user).order_by('-id')
+        data = RecipeSerializer(queryset, many=True).data
+
+        self.compare(
+            'render recipe list',
+            lambda: JSONRenderer().render(data),
+            lambda: FastJSONRenderer().render(data),
+        )
+        self.compare(
+            'serialize recipe list',
+            lambda: RecipeSerializer(queryset, many=True).data,
+            lambda: get_reader(RecipeSerializer).read(queryset),
+        )
+        recipe = queryset.first()
+        self.compare(
+            'serialize recipe detail',
+            lambda: RecipeDetailSerializer(
+                Recipe.objects.get(pk=recipe.pk)).data,
+            lambda: get_reader(RecipeDetailSerializer).read(
+                queryset.filter(pk=recipe.pk)),
+        )
+
+        client = APIClient()
+        client.force_authenticate(user)
+        url = reverse('recipe:recipe-list')
+        for encoding in ('identity', 'gzip', 'br', 'zstd'):
+            res = client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+            self.report(
+                f'recipe list response ({res.get("Content-Encoding", "-")})',
+                self.measure(
+                    lambda: client.get(url, HTTP_ACCEPT_ENCODING=encoding)),
+                f'  {len(res.content)} bytes',
+            )
+
+        self.compare_connect()
+
+    def compare_connect(self):
+        """Compare opening a connection with taking one from a pool."""
+        wrapper = connections.create_connection('default')
+        params = wrapper.get_connection_params()
+
+        def connect():
+            return wrapper.get_new_connection(params)
+
+        pool = ConnectionPool(connect, max_size=1)
+        self.compare(
+            'database connect',
+            lambda: connect().close(),
+            lambda: pool.release(pool.acquire()),
+        )
+        pool.close()
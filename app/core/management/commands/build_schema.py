@@ -0,0 +1,27 @@
+"""
+Django command to precompute the OpenAPI schema.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from drf_spectacular.drainage import GENERATOR_STATS
+
+from core import schema
+
+
+class Command(BaseCommand):
+    """Django command to write the schema served at /api/schema/."""
+    help = 'Generate the OpenAPI schema into OPENAPI_SCHEMA_DIR.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail-on-warn', action='store_true',
+            help='Fail if parts of the API could not be described.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        document = schema.generate()
+        GENERATOR_STATS.emit_summary()
+        if options['fail_on_warn'] and GENERATOR_STATS:
+            raise CommandError('The schema was generated with warnings.')
+        for target in schema.write(document):
+            self.stdout.write(self.style.SUCCESS(f'Wrote {target}'))
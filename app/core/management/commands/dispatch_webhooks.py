@@ -0,0 +1,95 @@
+"""
+Django command to deliver outbox events to webhook endpoints.
+"""
+import math
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import webhooks
+
+
+class Command(BaseCommand):
+    """Django command to run the webhook dispatcher."""
+    help = 'Deliver recorded change events to the webhook endpoints.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Number of endpoints delivered to at the same time.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to wait when there is nothing to deliver.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once every endpoint is up to date or backing off.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        self.stopping = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *args: self.stopping.set())
+
+        self.total = 0
+        with ThreadPoolExecutor(
+                max_workers=options['concurrency'],
+                thread_name_prefix='webhooks') as executor:
+            self.loop(executor, options)
+        self.stdout.write(self.style.SUCCESS(
+            f'Delivered {self.total} events.'))
+
+    def loop(self, executor, options):
+        """Keep one batch in flight for every endpoint with events."""
+        interval = options['poll_interval']
+        running = {}
+        # Endpoints that were up to date are left alone for a poll interval,
+        # or for good with --once.
+        idle_until = {}
+        while not self.stopping.is_set():
+            now = time.monotonic()
+            for endpoint_id in webhooks.due_endpoints():
+                if (endpoint_id not in running
+                        and idle_until.get(endpoint_id, 0) <= now
+                        and webhooks.lease(endpoint_id)):
+                    running[endpoint_id] = executor.submit(
+                        self.deliver, endpoint_id)
+            close_old_connections()
+
+            if not running:
+                if options['once']:
+                    break
+                webhooks.purge_events()
+                self.stopping.wait(interval)
+                continue
+            wait(running.values(), interval, FIRST_COMPLETED)
+            for endpoint_id, future in list(running.items()):
+                if not future.done():
+                    continue
+                del running[endpoint_id]
+                sent = future.result()
+                self.total += sent
+                if not sent:
+                    idle_until[endpoint_id] = (
+                        math.inf if options['once']
+                        else time.monotonic() + interval)
+        wait(running.values())
+
+    def deliver(self, endpoint_id):
+        """Deliver one batch on a pool thread."""
+        close_old_connections()
+        try:
+            return webhooks.deliver(endpoint_id)
+        except Exception as exc:
+            # The lease expires and the batch is tried again.
+            self.stderr.write(f'Endpoint {endpoint_id}: {exc!r}')
+            return 0
+        finally:
+            close_old_connections()
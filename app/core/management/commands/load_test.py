@@ -0,0 +1,158 @@
+"""
+Django command to load test a running API server at high concurrency.
+
+Run it against the same endpoint served by a WSGI worker and by an ASGI
+worker (e.g. /api/recipe/recipes/ and /api/recipe/async/recipes/) to
+compare how many concurrent, slow clients one worker can keep up with.
+"""
+import asyncio
+import socket
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """Django command to load test an endpoint."""
+    help = 'Send concurrent GET requests to a running server.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Full URL of the endpoint.')
+        parser.add_argument(
+            '--token', help='Auth token sent in the Authorization header.')
+        parser.add_argument(
+            '--concurrency', type=int, default=200,
+            help='Number of simultaneous connections.',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=2000,
+            help='Total number of requests.',
+        )
+        parser.add_argument(
+            '--read-delay', type=float, default=0.0,
+            help='Seconds each client waits before reading each chunk of '
+                 'the response, to simulate slow clients.',
+        )
+        parser.add_argument(
+            '--read-size', type=int, default=4096,
+            help='Bytes slow clients read at a time; also caps their '
+                 'socket receive buffer.',
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=30.0,
+            help='Seconds before a request counts as failed.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('Only plain http:// URLs are supported.')
+        self.options = options
+        self.host, self.port = url.hostname, url.port or 80
+        path = url.path or '/'
+        if url.query:
+            path = f'{path}?{url.query}'
+        self.request = self.build_request(path, options['token'])
+
+        started = time.perf_counter()
+        latencies, errors = asyncio.run(self.run())
+        elapsed = time.perf_counter() - started
+        self.write_report(latencies, errors, elapsed)
+
+    def build_request(self, path, token):
+        """Return the raw HTTP request bytes."""
+        lines = [
+            f'GET {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Connection: close',
+        ]
+        if token:
+            lines.append(f'Authorization: Token {token}')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode()
+
+    async def run(self):
+        """Send every request and collect the latencies."""
+        remaining = iter(range(self.options['requests']))
+        latencies, errors = [], []
+
+        async def client():
+            for _ in remaining:
+                try:
+                    latencies.append(await asyncio.wait_for(
+                        self.fetch(), self.options['timeout']))
+                except (OSError, asyncio.TimeoutError, ValueError) as exc:
+                    errors.append(exc)
+
+        await asyncio.gather(
+            *(client() for _ in range(self.options['concurrency'])))
+        return latencies, errors
+
+    async def connect(self):
+        """Open a connection, with a small receive buffer if reads are slow.
+
+        Without the cap the kernel would take in the whole response at
+        once and the server would never wait on the client.
+        """
+        if not self.options['read_delay']:
+            return await asyncio.open_connection(self.host, self.port)
+        loop = asyncio.get_running_loop()
+        (family, type_, proto, _, address), *_ = await loop.getaddrinfo(
+            self.host, self.port, type=socket.SOCK_STREAM)
+        sock = socket.socket(family, type_, proto)
+        try:
+            sock.setblocking(False)
+            sock.setsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF,
+                self.options['read_size'])
+            await loop.sock_connect(sock, address)
+        except BaseException:
+            sock.close()
+            raise
+        return await asyncio.open_connection(
+            sock=sock, limit=self.options['read_size'])
+
+    async def read_body(self, reader):
+        """Read the rest of the response, slowly if asked to."""
+        delay = self.options['read_delay']
+        if not delay:
+            await reader.read()
+            return
+        while True:
+            await asyncio.sleep(delay)
+            if not await reader.read(self.options['read_size']):
+                return
+
+    async def fetch(self):
+        """Make one request and return its latency in seconds."""
+        start = time.perf_counter()
+        reader, writer = await self.connect()
+        try:
+            writer.write(self.request)
+            await writer.drain()
+            status_line = await reader.readline()
+            await self.read_body(reader)
+        finally:
+            writer.close()
+        parts = status_line.split()
+        if len(parts) < 2 or not parts[1].startswith(b'2'):
+            raise ValueError(status_line.decode(errors='replace').strip())
+        return time.perf_counter() - start
+
+    def write_report(self, latencies, errors, elapsed):
+        """Write the throughput and latency summary."""
+        self.stdout.write(
+            f'{len(latencies)} ok, {len(errors)} failed in {elapsed:.2f} s '
+            f'({len(latencies) / elapsed:.1f} req/s)'
+        )
+        if len(latencies) > 1:
+            cuts = statistics.quantiles(latencies, n=100)
+            self.stdout.write(
+                f'latency p50 {cuts[49] * 1000:.1f} ms  '
+                f'p99 {cuts[98] * 1000:.1f} ms  '
+                f'max {max(latencies) * 1000:.1f} ms'
+            )
+        for error in errors[:5]:
+            self.stdout.write(self.style.ERROR(f'  {error!r}'))
@@ -0,0 +1,157 @@
+"""
+Django command to convert the recipe tables to hash partitions by user.
+
+Run the steps in order, each once the previous one has finished:
+prepare, backfill, verify, constrain, swap. check verifies afterwards that the
+recipe views only read one partition. See core.partitioning. Each
+shard is converted on its own, named with --database.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from core import partitioning, sharding
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    """Django command to partition the recipe tables online."""
+    help = 'Convert the recipe tables to PostgreSQL hash partitions on ' \
+           'user_id while they stay in use.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'step',
+            choices=['prepare', 'backfill', 'verify', 'constrain', 'swap',
+                     'check'],
+            help='Step of the conversion to run.',
+        )
+        parser.add_argument(
+            '--partitions', type=int, default=settings.RECIPE_PARTITIONS,
+            help='Number of partitions of each table.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Rows copied per transaction by backfill.',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.05,
+            help='Seconds to wait between backfill batches.',
+        )
+        parser.add_argument(
+            '--email',
+            help='User whose requests check makes; the first user with a '
+                 'recipe on the database by default.',
+        )
+        parser.add_argument(
+            '--database', default='default',
+            choices=settings.DATABASE_SHARDS,
+            help='Shard to convert.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        self.using = options['database']
+        self.connection = connections[self.using]
+        if self.connection.vendor != 'postgresql':
+            raise CommandError('Partitioning requires PostgreSQL.')
+        getattr(self, f'step_{options["step"]}')(options)
+
+    def step_prepare(self, options):
+        with transaction.atomic(using=self.using), \
+                self.connection.cursor() as cursor:
+            partitioning.prepare(cursor, options['partitions'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Created the partitioned tables with {options["partitions"]} '
+            f'partitions each; run backfill next.'))
+
+    def step_backfill(self, options):
+        if sharding.moving_users():
+            raise CommandError(
+                'Users are being moved between shards; run backfill once '
+                'rebalance_shards is done.')
+        for model in partitioning.MODELS:
+            table = model._meta.db_table
+            total = 0
+            last = 0
+            while True:
+                with transaction.atomic(using=self.using), \
+                        self.connection.cursor() as cursor:
+                    copied, last = partitioning.backfill_batch(
+                        cursor, model, last, options['batch_size'])
+                total += copied
+                if copied < options['batch_size']:
+                    break
+                time.sleep(options['pause'])
+            self.stdout.write(f'  {table}: {total} rows copied')
+        self.stdout.write(self.style.SUCCESS(
+            'Backfilled; run verify next.'))
+
+    def step_verify(self, options):
+        missing = {}
+        with self.connection.cursor() as cursor:
+            for model in partitioning.MODELS:
+                table = model._meta.db_table
+                missing[table] = partitioning.missing_rows(cursor, model)
+                self.stdout.write(f'  {table}: {missing[table]} rows missing')
+        if any(missing.values()):
+            raise CommandError('Rows are missing; run backfill again.')
+        self.stdout.write(self.style.SUCCESS(
+            'Every row was copied.'))
+
+    def step_constrain(self, options):
+        with transaction.atomic(using=self.using), \
+                self.connection.cursor() as cursor:
+            for model in partitioning.MODELS:
+                partitioning.add_foreign_keys(cursor, model)
+        with self.connection.cursor() as cursor:
+            for model in partitioning.MODELS:
+                state = partitioning.foreign_key_state(cursor, model)
+                for (table, name), validated in state.items():
+                    if validated:
+                        continue
+                    with transaction.atomic(using=self.using):
+                        partitioning.validate_foreign_key(
+                            cursor, table, name)
+                    self.stdout.write(f'  {name}: validated')
+        self.stdout.write(self.style.SUCCESS(
+            'The foreign keys are in place; run swap next.'))
+
+    def step_swap(self, options):
+        self.step_verify(options)
+        try:
+            with transaction.atomic(using=self.using), \
+                    self.connection.cursor() as cursor:
+                partitioning.swap(cursor)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            'The partitioned tables are in place. The old ones are kept '
+            'with an _unpartitioned suffix.'))
+
+    def step_check(self, options):
+        users = get_user_model().objects.filter(shard=self.using)
+        if options['email']:
+            user = users.filter(email=options['email']).first()
+        else:
+            recipe = Recipe.all_objects.using(self.using).order_by(
+                'pk').values('user_id').first()
+            user = recipe and users.filter(pk=recipe['user_id']).first()
+        if user is None:
+            raise CommandError('No user to make the requests as.')
+
+        failures = partitioning.check_pruning(user)
+        for sql, scanned in failures:
+            self.stderr.write(sql)
+            for table, partitions in scanned.items():
+                if len(partitions) > 1:
+                    self.stderr.write(
+                        f'  reads {len(partitions)} partitions of {table}')
+        if failures:
+            raise CommandError(
+                f'{len(failures)} statements read more than one partition.')
+        self.stdout.write(self.style.SUCCESS(
+            'Every statement of the recipe views reads one partition.'))
@@ -0,0 +1,126 @@
+"""
+Django command to report what dominates the startup time of a worker.
+
+A fresh interpreter is started with -X importtime and does what a worker
+does before its first request: set up Django, load the WSGI handler and
+its middleware, and import the URLconf with every view. The import times
+are then added up per installed app, per package and per module.
+"""
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+STARTUP_SCRIPT = '''
+import django
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+'''
+
+IMPORT_TIME_RE = re.compile(
+    r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_import_times(output):
+    """Return (module, self_us, cumulative_us, depth) for each import."""
+    imports = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_RE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            imports.append(
+                (module, int(own), int(cumulative), len(indent) // 2))
+    return imports
+
+
+def owner(module, prefixes):
+    """Return the longest of prefixes that module belongs to."""
+    for prefix in prefixes:
+        if module == prefix or module.startswith(prefix + '.'):
+            return prefix
+    return None
+
+
+def charge_to_apps(imports, app_names):
+    """Return the import time charged to each installed app.
+
+    A module outside the apps is charged to the nearest app that imported
+    it, so an app pays for its dependencies. What no app imported is
+    charged to Django's own startup.
+    """
+    totals = Counter()
+    # Time not charged yet, for imports whose importer comes later.
+    pending = []
+    for module, own, _, depth in imports:
+        # -X importtime lists every module after the modules it imported.
+        while pending and pending[-1][0] > depth:
+            own += pending.pop()[1]
+        app = owner(module, app_names)
+        if app is None:
+            pending.append((depth, own))
+        else:
+            totals[app] += own
+    totals['(django startup)'] += sum(own for _, own in pending)
+    return totals
+
+
+class Command(BaseCommand):
+    """Django command to profile worker startup."""
+    help = 'Report the import time of the installed apps and modules.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=15,
+            help='Number of packages and modules to list.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            env=os.environ.copy(),
+        )
+        elapsed = time.perf_counter() - started
+        imports = parse_import_times(result.stderr)
+        if result.returncode or not imports:
+            raise CommandError(
+                f'The worker failed to start:\n{result.stderr[-2000:]}')
+
+        app_names = sorted(
+            (config.name for config in apps.get_app_configs()),
+            key=len, reverse=True)
+        by_app = charge_to_apps(imports, app_names)
+        by_package = Counter()
+        for module, own, _, _ in imports:
+            by_package[module.partition('.')[0]] += own
+        total = sum(own for _, own, _, _ in imports)
+
+        self.stdout.write(
+            f'Worker started in {elapsed:.2f}s, {len(imports)} modules '
+            f'imported in {total / 1e6:.2f}s.')
+        self.report(
+            'Installed apps, with the imports they made',
+            by_app.most_common(), total)
+        self.report(
+            'Packages', by_package.most_common(options['limit']), total)
+        slowest = Counter({
+            module: cumulative for module, _, cumulative, _ in imports})
+        self.report(
+            'Modules (with their imports)',
+            slowest.most_common(options['limit']), total)
+
+    def report(self, title, rows, total):
+        """Write a table of import times."""
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n{title}'))
+        for name, micros in rows:
+            self.stdout.write(
+                f'  {micros / 1000:9.1f} ms  {micros / total:6.1%}  {name}')
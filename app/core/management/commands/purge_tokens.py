@@ -0,0 +1,27 @@
+"""
+Django command to delete expired token revocations and stale DRF tokens.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core.models import RevokedToken
+
+
+class Command(BaseCommand):
+    """Django command to purge expired tokens."""
+    help = 'Delete expired revocations and DRF tokens older than ' \
+           'TOKEN_LIFETIME.'
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        now = timezone.now()
+        revoked, _ = RevokedToken.objects.filter(expires_at__lte=now).delete()
+        legacy, _ = Token.objects.filter(
+            created__lte=now - timedelta(seconds=settings.TOKEN_LIFETIME),
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {revoked} revocations and {legacy} DRF tokens.'))
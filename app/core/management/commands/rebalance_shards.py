@@ -0,0 +1,77 @@
+"""
+Django command to move users' data between shards.
+
+Without --to it prints how many users each shard holds. With it, the
+users named with --email, or --count users of the --from shard, are
+moved to the --to shard in batches. See core.sharding.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from core import sharding
+
+
+class Command(BaseCommand):
+    """Django command to rebalance users across shards."""
+    help = 'Move users and their data to another shard.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--to', choices=settings.DATABASE_SHARDS,
+            help='Shard to move the users to.',
+        )
+        parser.add_argument(
+            '--from', dest='source', choices=settings.DATABASE_SHARDS,
+            help='Shard to take --count users from.',
+        )
+        parser.add_argument(
+            '--email', action='append', default=[],
+            help='User to move; may be given several times.',
+        )
+        parser.add_argument(
+            '--count', type=int, default=0,
+            help='Number of users of --from to move.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Users marked as moving at a time.',
+        )
+        parser.add_argument(
+            '--wait', type=float,
+            help='Seconds between marking users and copying their data; '
+                 'long enough for every server to see the mark by '
+                 'default.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        users = get_user_model().objects.all()
+        if not options['to']:
+            counts = dict(
+                users.values_list('shard').annotate(Count('pk')))
+            for alias in settings.DATABASE_SHARDS:
+                self.stdout.write(f'  {alias}: {counts.get(alias, 0)} users')
+            return
+
+        if options['email']:
+            users = users.filter(email__in=options['email'])
+            count = None
+        elif options['source'] and options['count']:
+            users = users.filter(shard=options['source'])
+            count = options['count']
+        else:
+            raise CommandError('Give --email, or --from and --count.')
+        ids = list(
+            users.exclude(shard=options['to']).order_by('pk')
+            .values_list('pk', flat=True)[:count])
+
+        moved = 0
+        size = options['batch_size']
+        for start in range(0, len(ids), size):
+            moved += len(sharding.move_users(
+                ids[start:start + size], options['to'], options['wait']))
+            self.stdout.write(f'  {moved} of {len(ids)} users moved')
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved} users to {options["to"]}.'))
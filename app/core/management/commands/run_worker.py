@@ -0,0 +1,122 @@
+"""
+Django command to run background jobs from the database queue.
+"""
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils.module_loading import autodiscover_modules
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    """Django command to process queued jobs."""
+    help = 'Claim and run queued background jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Number of jobs to run at the same time.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to wait when the queue is empty.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once no job is due instead of polling.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        autodiscover_modules('tasks')
+        self.stopping = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *args: self.stopping.set())
+
+        self.worker = jobs.worker_name()
+        self.processed = self.failed = 0
+        self.lock = threading.Lock()
+        concurrency = options['concurrency']
+        self.stdout.write(
+            f'Worker {self.worker} started with {concurrency} slots.')
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            self.loop(executor, concurrency, options)
+        self.stdout.write(self.style.SUCCESS(
+            f'Worker stopped: {self.processed} done, {self.failed} failed.'))
+
+    def loop(self, executor, concurrency, options):
+        """Claim jobs while there are free slots."""
+        running = {}
+        last_requeue = last_heartbeat = time.monotonic()
+        jobs.requeue_stale()
+        while not self.stopping.is_set():
+            if time.monotonic() - last_heartbeat > (
+                    settings.JOB_HEARTBEAT_INTERVAL):
+                self.heartbeat(running)
+                last_heartbeat = time.monotonic()
+            if time.monotonic() - last_requeue > options['poll_interval']:
+                jobs.requeue_stale()
+                last_requeue = time.monotonic()
+
+            free = concurrency - len(running)
+            claimed = jobs.claim(self.worker, free) if free else []
+            running.update(
+                (executor.submit(self.run, job), job) for job in claimed)
+            close_old_connections()
+
+            if not running:
+                if options['once']:
+                    break
+                self.stopping.wait(options['poll_interval'])
+                continue
+            done, _ = wait(running, options['poll_interval'], FIRST_COMPLETED)
+            for future in done:
+                del running[future]
+        while running:
+            done, _ = wait(running, settings.JOB_HEARTBEAT_INTERVAL)
+            for future in done:
+                del running[future]
+            if running:
+                self.heartbeat(running)
+
+    def heartbeat(self, running):
+        """Renew the leases of the running jobs."""
+        job_ids = [job.pk for job in running.values()]
+        if job_ids:
+            jobs.heartbeat(self.worker, job_ids)
+            close_old_connections()
+
+    def run(self, job):
+        """Run one job on a pool thread."""
+        started = time.monotonic()
+        close_old_connections()
+        try:
+            success = jobs.run(job)
+        except jobs.LeaseLost:
+            self.stderr.write(
+                f'{job} outlived its lease; its outcome was discarded.')
+            success = False
+        except Exception as exc:
+            # The job is requeued once its lock times out.
+            self.stderr.write(f'{job} could not be saved: {exc!r}')
+            success = False
+        finally:
+            close_old_connections()
+        elapsed = time.monotonic() - started
+        with self.lock:
+            if success:
+                self.processed += 1
+            else:
+                self.failed += 1
+        if success:
+            self.stdout.write(f'{job} done in {elapsed:.2f} s')
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'{job} failed (attempt {job.attempts}/{job.max_attempts})'))
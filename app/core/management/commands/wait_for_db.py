@@ -1,28 +1,68 @@
 """
 Django command to wait for the database to be available before proceeding.
 """
+import random
 import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 from django.db.utils import OperationalError
 from psycopg2 import OperationalError as Psycopg2Error
 
+from core import db
+
 
 class Command(BaseCommand):
     """Django command to wait for the database to be available."""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default='default',
+            help='Alias of the database to wait for.',
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Seconds to wait before giving up.',
+        )
+        parser.add_argument(
+            '--max-delay', type=float, default=5,
+            help='Longest wait between two attempts, in seconds.',
+        )
+        parser.add_argument(
+            '--migrations', action='store_true',
+            help='Also wait until every migration has been applied.',
+        )
+
+    def probe(self, alias, migrations):
+        """Return True if the database is ready."""
+        try:
+            db.ping(alias)
+            return not (migrations and db.pending_migrations(alias))
+        finally:
+            connections[alias].close()
+
     def handle(self, *args, **options):
         """Entrypoint for command."""
         self.stdout.write('Waiting for database...')
-        db_up = False
+        deadline = time.monotonic() + options['timeout']
+        attempt = 0
 
-        while not db_up:
+        while True:
             try:
-                # Try to get a cursor to check if the database is available
-                self.check(databases=['default'])
-                db_up = True
+                if self.probe(options['database'], options['migrations']):
+                    break
+                reason = 'Migrations pending'
             except (Psycopg2Error, OperationalError):
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                reason = 'Database unavailable'
+
+            # Exponential backoff with full jitter.
+            delay = random.uniform(
+                0, min(options['max_delay'], 0.1 * 2 ** attempt))
+            attempt += 1
+            if time.monotonic() + delay > deadline:
+                raise CommandError(
+                    f'{reason} after {options["timeout"]:g} seconds.')
+            self.stdout.write(f'{reason}, waiting {delay:.2f} seconds...')
+            time.sleep(delay)
 
         self.stdout.write(self.style.SUCCESS('Database available!'))
@@ -0,0 +1,279 @@
+"""
+Middleware for the application.
+"""
+import asyncio
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.messages import middleware as message_middleware
+from django.contrib.sessions import middleware as session_middleware
+from django.db import Error as DatabaseError
+from django.middleware import csrf
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+from core import db
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+
+ACCEPT_ENCODING_RE = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q=([0-9.]+))?')
+
+
+class GzipEncoder:
+    """gzip content encoding."""
+    name = 'gzip'
+
+    def compress(self, content):
+        return compress_string(content)
+
+    def compress_stream(self, chunks):
+        return compress_sequence(chunks)
+
+
+class BrotliEncoder:
+    """Brotli content encoding."""
+    name = 'br'
+
+    def __init__(self, quality=5):
+        self.quality = quality
+
+    def compress(self, content):
+        return brotli.compress(content, quality=self.quality)
+
+    def compress_stream(self, chunks):
+        compressor = brotli.Compressor(quality=self.quality)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class ZstdEncoder:
+    """Zstandard content encoding."""
+    name = 'zstd'
+
+    def __init__(self, level=3):
+        self.level = level
+
+    def compress(self, content):
+        return zstandard.ZstdCompressor(level=self.level).compress(content)
+
+    def compress_stream(self, chunks):
+        compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(
+                zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+def available_encoders():
+    """Return the encoders usable in this environment, best first."""
+    encoders = []
+    if brotli is not None:
+        encoders.append(BrotliEncoder())
+    if zstandard is not None:
+        encoders.append(ZstdEncoder())
+    encoders.append(GzipEncoder())
+    return encoders
+
+
+def parse_accept_encoding(header):
+    """Return the encodings accepted by the client."""
+    accepted = set()
+    for match in ACCEPT_ENCODING_RE.finditer(header):
+        name, quality = match.groups()
+        try:
+            if quality is not None and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(name.lower())
+    return accepted
+
+
+def select_encoder(request, encoders):
+    """Return the first of encoders accepted by the client."""
+    accepted = parse_accept_encoding(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for encoder in encoders:
+        if encoder.name in accepted or '*' in accepted:
+            return encoder
+    return None
+
+
+def is_compressible(content_type):
+    """Return False for media types that are compressed already."""
+    media_type = content_type.split(';')[0].strip().lower()
+    if media_type == 'image/svg+xml':
+        return True
+    return not media_type.startswith(('image/', 'video/', 'audio/')) \
+        and media_type not in ('application/zip', 'application/gzip')
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress responses with the best encoding the client accepts.
+
+    Responses smaller than COMPRESSION_MIN_SIZE bytes are sent as they are.
+    Streaming responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        self.encoders = available_encoders()
+
+    def select_encoder(self, request):
+        """Return the preferred encoder accepted by the client."""
+        return select_encoder(request, self.encoders)
+
+    def process_response(self, request, response):
+        """Compress the response if it is worthwhile."""
+        if (response.has_header('Content-Encoding')
+                or not is_compressible(response.get('Content-Type', ''))):
+            return response
+        min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        if not response.streaming and len(response.content) < min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoder = self.select_encoder(request)
+        if encoder is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = encoder.compress_stream(
+                response.streaming_content)
+            del response['Content-Length']
+        else:
+            compressed = encoder.compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoder.name
+        return response
+
+
+class HealthCheckMiddleware:
+    """Answer the /healthz and /readyz probes before any other middleware.
+
+    /healthz reports that the process is serving requests. /readyz also
+    checks that the database answers and that every migration has been
+    applied. Neither touches sessions, authentication or ALLOWED_HOSTS.
+    Like Django's own middleware it runs natively under ASGI, so other
+    requests are not funnelled through one thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.migrated = False
+        if asyncio.iscoroutinefunction(get_response):
+            # Tells the handler to await this middleware.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def get_probe(self, request):
+        """Return the probe answering request, or None."""
+        path = request.path_info.rstrip('/')
+        if path == '/healthz':
+            return self.liveness
+        if path == '/readyz':
+            return self.readiness
+        return None
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        probe = self.get_probe(request)
+        if probe is not None:
+            return probe()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        probe = self.get_probe(request)
+        if probe is not None:
+            return await sync_to_async(probe, thread_sensitive=True)()
+        return await self.get_response(request)
+
+    def liveness(self):
+        """Return the liveness probe response."""
+        return JsonResponse({'status': 'ok'})
+
+    def readiness(self):
+        """Return the readiness probe response."""
+        checks = {'database': 'ok', 'migrations': 'ok'}
+        try:
+            db.ping()
+            # Once applied, migrations stay applied for this process.
+            if not self.migrated:
+                self.migrated = not db.pending_migrations()
+            if not self.migrated:
+                checks['migrations'] = 'pending'
+        except DatabaseError:
+            checks['database'] = checks['migrations'] = 'unavailable'
+        ready = all(value == 'ok' for value in checks.values())
+        return JsonResponse(checks, status=200 if ready else 503)
+
+
+def is_token_authenticated(request):
+    """Return True for the routes that only authenticate with tokens."""
+    return request.path_info.startswith(tuple(settings.TOKEN_AUTH_PATHS))
+
+
+class BrowserOnlyMixin:
+    """Skip a middleware on the routes in TOKEN_AUTH_PATHS.
+
+    Sessions, CSRF protection and messages only serve the admin and other
+    browser routes; the API authenticates every request with a token.
+    """
+
+    def __call__(self, request):
+        if is_token_authenticated(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(BrowserOnlyMixin,
+                        session_middleware.SessionMiddleware):
+    """Sessions for the browser routes."""
+
+
+class CsrfViewMiddleware(BrowserOnlyMixin, csrf.CsrfViewMiddleware):
+    """CSRF protection for the browser routes."""
+
+    def process_view(self, request, callback, callback_args,
+                     callback_kwargs):
+        if is_token_authenticated(request):
+            return None
+        return super().process_view(
+            request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(BrowserOnlyMixin,
+                               auth_middleware.AuthenticationMiddleware):
+    """Session authentication for the browser routes."""
+
+
+class MessageMiddleware(BrowserOnlyMixin,
+                        message_middleware.MessageMiddleware):
+    """Messages for the browser routes."""
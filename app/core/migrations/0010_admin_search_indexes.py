@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:12
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+# Model, field and the hash Django puts in the field's index names.
+FIELDS = [
+    ('ingredient', 'name', '5686f353'),
+    ('recipe', 'title', '66e194d3'),
+    ('tag', 'name', '5f34f44c'),
+]
+
+
+def add_index(model_name, name, suffix):
+    """Index a field like db_index=True would, without blocking writes."""
+    index_name = f'core_{model_name}_{name}_{suffix}'
+    return migrations.SeparateDatabaseAndState(
+        state_operations=[
+            migrations.AlterField(
+                model_name=model_name,
+                name=name,
+                field=models.CharField(db_index=True, max_length=255),
+            ),
+        ],
+        database_operations=[
+            AddIndexConcurrently(
+                model_name=model_name,
+                index=models.Index(fields=[name], name=index_name),
+            ),
+            # The index prefix searches (LIKE 'term%') use.
+            AddIndexConcurrently(
+                model_name=model_name,
+                index=models.Index(
+                    fields=[name], name=f'{index_name}_like',
+                    opclasses=['varchar_pattern_ops']),
+            ),
+        ],
+    )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0009_recipe_image'),
+    ]
+
+    operations = [add_index(*field) for field in FIELDS]
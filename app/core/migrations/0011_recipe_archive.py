@@ -0,0 +1,53 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:16
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # The partial indexes are built without blocking writes to recipes.
+    atomic = False
+
+    dependencies = [
+        ('core', '0010_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.BigIntegerField(unique=True)),
+                ('title', models.CharField(max_length=255)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('archived_at', models.DateTimeField()),
+                ('moved_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='status',
+            field=models.CharField(choices=[('active', 'Active'), ('archived', 'Archived')], default='active', max_length=10),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['user', '-id'], name='core_recipe_active_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('status', 'archived')), fields=['archived_at'], name='core_recipe_archived_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedrecipe',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
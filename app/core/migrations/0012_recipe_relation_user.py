@@ -0,0 +1,163 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:19
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+BATCH_SIZE = 10000
+# Table and the hash Django puts in its constraint and index names.
+TABLES = {
+    'recipetag': ('core_recipe_tags', '4d529541'),
+    'recipeingredient': ('core_recipe_ingredients', 'c8bd1e86'),
+}
+
+
+def add_user(model_name):
+    """Add the column without locking the table for long.
+
+    It is added empty, with its constraints NOT VALID, so new rows must
+    have a user at once while the existing ones are filled in.
+    """
+    table, suffix = TABLES[model_name]
+    fk = f'{table}_user_id_{suffix}_fk_core_user_id'
+    return migrations.SeparateDatabaseAndState(
+        state_operations=[
+            migrations.AddField(
+                model_name=model_name,
+                name='user',
+                field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+            ),
+        ],
+        database_operations=[
+            migrations.AddField(
+                model_name=model_name,
+                name='user',
+                field=models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+            ),
+            migrations.RunSQL(
+                f'ALTER TABLE {table} ADD CONSTRAINT {table}_user_id_check '
+                f'CHECK (user_id IS NOT NULL) NOT VALID',
+                f'ALTER TABLE {table} DROP CONSTRAINT {table}_user_id_check',
+            ),
+            migrations.RunSQL(
+                f'ALTER TABLE {table} ADD CONSTRAINT {fk} FOREIGN KEY (user_id) '
+                f'REFERENCES core_user (id) DEFERRABLE INITIALLY DEFERRED NOT VALID',
+                f'ALTER TABLE {table} DROP CONSTRAINT {fk}',
+            ),
+            AddIndexConcurrently(
+                model_name=model_name,
+                index=models.Index(fields=['user'], name=f'{table}_user_id_{suffix}'),
+            ),
+        ],
+    )
+
+
+def require_user(model_name):
+    """Validate the filled column's constraints and make it NOT NULL.
+
+    Validating takes a lock that lets writes through, and SET NOT NULL
+    skips its scan of the table given the validated check.
+    """
+    table, suffix = TABLES[model_name]
+    fk = f'{table}_user_id_{suffix}_fk_core_user_id'
+    return migrations.SeparateDatabaseAndState(
+        state_operations=[
+            migrations.AlterField(
+                model_name=model_name,
+                name='user',
+                field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+            ),
+        ],
+        database_operations=[
+            migrations.RunSQL(
+                [f'ALTER TABLE {table} VALIDATE CONSTRAINT {fk}',
+                 f'ALTER TABLE {table} VALIDATE CONSTRAINT {table}_user_id_check'],
+                migrations.RunSQL.noop,
+            ),
+            migrations.RunSQL(
+                [f'ALTER TABLE {table} ALTER COLUMN user_id SET NOT NULL',
+                 f'ALTER TABLE {table} DROP CONSTRAINT {table}_user_id_check'],
+                [f'ALTER TABLE {table} ADD CONSTRAINT {table}_user_id_check '
+                 f'CHECK (user_id IS NOT NULL) NOT VALID',
+                 f'ALTER TABLE {table} ALTER COLUMN user_id DROP NOT NULL'],
+            ),
+        ],
+    )
+
+
+def fill_users(apps, schema_editor):
+    """Copy each recipe's user onto its tag and ingredient rows."""
+    db = schema_editor.connection.alias
+    Recipe = apps.get_model('core', 'Recipe')
+    owner = Recipe._base_manager.using(db).filter(
+        pk=OuterRef('recipe_id')).values('user_id')[:1]
+    for name in ('RecipeTag', 'RecipeIngredient'):
+        model = apps.get_model('core', name)
+        last = 0
+        while True:
+            # Short transactions, so the tables stay writable meanwhile.
+            with transaction.atomic(using=db):
+                ids = list(
+                    model._base_manager.using(db)
+                    .filter(pk__gt=last, user__isnull=True)
+                    .order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE])
+                if not ids:
+                    break
+                model._base_manager.using(db).filter(pk__in=ids).update(
+                    user_id=Subquery(owner))
+            last = ids[-1]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0011_recipe_archive'),
+    ]
+
+    operations = [
+        # The join tables Django created for the m2m fields are kept.
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.CreateModel(
+                name='RecipeTag',
+                fields=[
+                    ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                    ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.recipe')),
+                    ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.tag')),
+                ],
+                options={
+                    'db_table': 'core_recipe_tags',
+                    'unique_together': {('recipe', 'tag')},
+                },
+            ),
+            migrations.CreateModel(
+                name='RecipeIngredient',
+                fields=[
+                    ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                    ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.ingredient')),
+                    ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.recipe')),
+                ],
+                options={
+                    'db_table': 'core_recipe_ingredients',
+                    'unique_together': {('recipe', 'ingredient')},
+                },
+            ),
+            migrations.AlterField(
+                model_name='recipe',
+                name='ingredients',
+                field=models.ManyToManyField(through='core.RecipeIngredient', to='core.Ingredient'),
+            ),
+            migrations.AlterField(
+                model_name='recipe',
+                name='tags',
+                field=models.ManyToManyField(through='core.RecipeTag', to='core.Tag'),
+            ),
+        ]),
+        add_user('recipetag'),
+        add_user('recipeingredient'),
+        migrations.RunPython(fill_users, migrations.RunPython.noop),
+        require_user('recipetag'),
+        require_user('recipeingredient'),
+    ]
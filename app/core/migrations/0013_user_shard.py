@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_relation_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='shard',
+            field=models.CharField(blank=True, default='default', max_length=50),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='shard_moving',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-19 11:03
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_user_shard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='revokedtoken',
+            name='revoked_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
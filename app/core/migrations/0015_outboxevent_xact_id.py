@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-19 14:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+# Stamps each event with the id of the transaction writing it. Events
+# recorded before have 0, so they are delivered first, in id order.
+CREATE_TRIGGER = [
+    '''
+    CREATE FUNCTION core_outboxevent_set_xact_id() RETURNS trigger AS $$
+    BEGIN
+        NEW.xact_id := pg_current_xact_id()::text::bigint;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE TRIGGER core_outboxevent_xact_id
+        BEFORE INSERT ON core_outboxevent
+        FOR EACH ROW EXECUTE FUNCTION core_outboxevent_set_xact_id()
+    ''',
+]
+
+DROP_TRIGGER = [
+    'DROP TRIGGER core_outboxevent_xact_id ON core_outboxevent',
+    'DROP FUNCTION core_outboxevent_set_xact_id()',
+]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('core', '0014_revokedtoken_revoked_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='xact_id',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='webhookendpoint',
+            name='last_xact_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+        AddIndexConcurrently(
+            model_name='outboxevent',
+            index=models.Index(
+                fields=['xact_id', 'id'], name='core_outbox_xact_id_idx'),
+        ),
+    ]
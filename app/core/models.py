@@ -3,7 +3,9 @@ Database Model
 """
 
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import (
 AbstractBaseUser,
 BaseUserManager,
@@ -39,34 +41,108 @@ class User(AbstractBaseUser,PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Database holding the user's recipes, tags and ingredients.
+    shard = models.CharField(max_length=50, blank=True)
+    # Set while the user's data is copied to another shard.
+    shard_moving = models.BooleanField(default=False)
 
     objects = UserManger()
 
     USERNAME_FIELD = 'email'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Deactivating the user revokes their tokens, see core.tokens.
+        instance._saved_is_active = instance.__dict__.get('is_active')
+        return instance
 
 
 
+
+class ActiveRecipeManager(models.Manager):
+    """Manager for the recipes that are not archived"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(status=Recipe.ACTIVE)
+
+
 class Recipe(models.Model):
     """Recipe object"""
+    ACTIVE = 'active'
+    ARCHIVED = 'archived'
+    STATUS_CHOICES = (
+        (ACTIVE, 'Active'),
+        (ARCHIVED, 'Archived'),
+    )
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
-    title = models.CharField(max_length=255)
+    title = models.CharField(max_length=255, db_index=True)
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     description = models.TextField(blank=True)
     link = models.CharField(max_length=255, blank=True)
-    tags = models.ManyToManyField('Tag')
-    ingredients = models.ManyToManyField('Ingredient')
+    image = models.ImageField(blank=True, max_length=255)
+    thumbnails = models.JSONField(default=dict, blank=True)
+    tags = models.ManyToManyField('Tag', through='RecipeTag')
+    ingredients = models.ManyToManyField(
+        'Ingredient', through='RecipeIngredient')
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=ACTIVE)
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    # Archived recipes are left out everywhere but in all_objects.
+    objects = ActiveRecipeManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # The API only ever lists a user's active recipes, newest first.
+            models.Index(
+                fields=['user', '-id'],
+                condition=models.Q(status='active'),
+                name='core_recipe_active_idx',
+            ),
+            models.Index(
+                fields=['archived_at'],
+                condition=models.Q(status='archived'),
+                name='core_recipe_archived_idx',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_user_id = instance.__dict__.get('user_id')
+        return instance
+
+    def _do_update(self, base_qs, *args, **kwargs):
+        # Look the row up in the partition of the user it was saved with.
+        saved_user_id = getattr(self, '_saved_user_id', None)
+        if saved_user_id is not None:
+            base_qs = base_qs.filter(user_id=saved_user_id)
+        return super()._do_update(base_qs, *args, **kwargs)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        saved_user_id = getattr(self, '_saved_user_id', None)
+        if saved_user_id not in (None, self.user_id):
+            # The join rows follow the recipe to its new user.
+            for through in (RecipeTag, RecipeIngredient):
+                through.objects.filter(
+                    user_id=saved_user_id, recipe=self,
+                ).update(user_id=self.user_id)
+        self._saved_user_id = self.user_id
 
     def __str__(self):
         return self.title
 
 class Tag(models.Model):
     """Tags for filtering Recipes."""
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, db_index=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -77,7 +153,7 @@ class Tag(models.Model):
 
 class Ingredient(models.Model):
     """Ingredient for recipeies"""
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, db_index=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -87,8 +163,177 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeRelationQuerySet(models.QuerySet):
+    """Queryset for the rows joining recipes to their tags or ingredients"""
 
+    def bulk_create(self, objs, *args, **kwargs):
+        # Related managers add rows without the recipe's user, which the
+        # join tables are partitioned by.
+        objs = list(objs)
+        missing = {obj.recipe_id for obj in objs if obj.user_id is None}
+        if missing:
+            owners = dict(
+                Recipe._base_manager.using(self.db)
+                .filter(pk__in=missing).values_list('pk', 'user_id'))
+            for obj in objs:
+                if obj.user_id is None:
+                    obj.user_id = owners[obj.recipe_id]
+        return super().bulk_create(objs, *args, **kwargs)
 
 
+class RecipeRelation(models.Model):
+    """Row joining a recipe to a tag or ingredient of the same user"""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    # The recipe's user, copied so the rows can be partitioned like it.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+
+    objects = RecipeRelationQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self.user_id is None:
+            self.user_id = self.recipe.user_id
+        super().save(*args, **kwargs)
+
 
+class RecipeTag(RecipeRelation):
+    """Tag of a recipe"""
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
 
+    class Meta:
+        db_table = 'core_recipe_tags'
+        unique_together = [('recipe', 'tag')]
+
+
+class RecipeIngredient(RecipeRelation):
+    """Ingredient of a recipe"""
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = 'core_recipe_ingredients'
+        unique_together = [('recipe', 'ingredient')]
+
+
+class ArchivedRecipe(models.Model):
+    """Recipe moved out of the recipe table long after it was archived"""
+    recipe_id = models.BigIntegerField(unique=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    title = models.CharField(max_length=255)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    archived_at = models.DateTimeField()
+    moved_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.title
+
+
+class RevokedToken(models.Model):
+    """Signed auth token, or all tokens of a user, revoked before expiry"""
+    key = models.CharField(max_length=40, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    # Tokens of a user issued before this are revoked.
+    revoked_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.key
+
+
+class Job(models.Model):
+    """Background job run by the run_worker command"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    task = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    priority = models.SmallIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=255, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers only ever scan the queued jobs.
+            models.Index(
+                fields=['-priority', 'run_at'],
+                condition=models.Q(status='queued'),
+                name='core_job_queued_idx',
+            ),
+            models.Index(
+                fields=['locked_at'],
+                condition=models.Q(status='running'),
+                name='core_job_running_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.task} #{self.pk}'
+
+
+class OutboxEvent(models.Model):
+    """Change event written in the same transaction as the change"""
+    event = models.CharField(max_length=50)
+    user_id = models.BigIntegerField()
+    object_id = models.BigIntegerField()
+    data = models.JSONField(encoder=DjangoJSONEncoder, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Id of the transaction that wrote the event, set by a trigger on
+    # insert; core.webhooks delivers events in (xact_id, id) order.
+    xact_id = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['xact_id', 'id'], name='core_outbox_xact_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.event} #{self.object_id}'
+
+
+class WebhookEndpoint(models.Model):
+    """Partner URL the outbox events are delivered to"""
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=255)
+    is_active = models.BooleanField(default=True)
+    # Cursor: the transaction and id of the last event acknowledged.
+    last_xact_id = models.BigIntegerField(default=0)
+    last_event_id = models.BigIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    leased_until = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    def save(self, *args, **kwargs):
+        # New endpoints start with the events recorded after they exist.
+        if self._state.adding and not self.last_event_id:
+            latest = OutboxEvent.objects.order_by('-xact_id', '-id').first()
+            if latest is not None:
+                self.last_xact_id = latest.xact_id
+                self.last_event_id = latest.id
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.url
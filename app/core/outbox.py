@@ -0,0 +1,57 @@
+"""
+Transactional outbox of change events.
+
+Events are written in the same transaction as the change they describe,
+so an event exists exactly when its change was committed. The
+dispatch_webhooks command delivers them to partners afterwards. Events
+stay in the default database; the change is committed on its shard just
+before them, see sharding.atomic().
+"""
+from core import sharding
+from core.models import OutboxEvent
+
+
+def record(event, user_id, object_id, data=None):
+    """Write an event to the outbox in the current transaction."""
+    return OutboxEvent.objects.create(
+        event=event, user_id=user_id, object_id=object_id, data=data)
+
+
+class OutboxMixin:
+    """Record an outbox event for every change a viewset makes.
+
+    Events are named '<outbox_name>.created', '.updated' and '.deleted'.
+    """
+    outbox_name = None
+
+    def _record(self, action, response, object_id):
+        if response.status_code < 400:
+            record(
+                f'{self.outbox_name}.{action}',
+                self.request.user.pk,
+                object_id,
+                response.data,
+            )
+
+    def create(self, request, *args, **kwargs):
+        with sharding.atomic(self.queryset.model):
+            response = super().create(request, *args, **kwargs)
+            self._record('created', response, response.data['id'])
+        return response
+
+    def update(self, request, *args, **kwargs):
+        with sharding.atomic(self.queryset.model):
+            response = super().update(request, *args, **kwargs)
+            self._record('updated', response, self.get_object_id())
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        with sharding.atomic(self.queryset.model):
+            response = super().destroy(request, *args, **kwargs)
+            self._record('deleted', response, self.get_object_id())
+        return response
+
+    def get_object_id(self):
+        """Return the id of the object the request changed."""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return int(self.kwargs[lookup_url_kwarg])
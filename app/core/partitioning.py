@@ -0,0 +1,445 @@
+"""
+Hash partitioning of the recipe tables by user.
+
+core_recipe and its join tables are converted to PostgreSQL declarative
+partitions, hashed on user_id, while the application keeps writing to
+them:
+
+1. prepare creates an empty partitioned copy of each table, suffixed
+   '_partitioned', with its partitions and indexes. A trigger on the
+   original table repeats every insert, update and delete on the copy.
+2. backfill copies the existing rows in batches of their own short
+   transaction. The rows of a batch are locked while they are copied,
+   so a concurrent change waits and its trigger then sees the copy.
+3. verify counts the rows missing from the copies.
+4. constrain adds the foreign keys of the copies. Until the backfill is
+   done a copied join row may point to a recipe that is not copied yet,
+   so they are only added now, NOT VALID so that adding them does not
+   scan the tables, and then validated without blocking writes.
+5. swap drops the triggers and renames the copies into place in one
+   transaction, which only holds its locks for the renames. The original
+   tables are kept, suffixed '_unpartitioned', until they are dropped by
+   hand.
+
+The primary key of a partitioned table has to include the partition
+key, so it becomes (user_id, id); a separate index on id serves lookups
+without a user. Every query the recipe views make filters on user_id, so
+the planner reads a single partition; check_pruning() verifies it.
+"""
+import json
+import re
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core import sharding
+from core.models import Recipe, RecipeIngredient, RecipeTag
+
+KEY = 'user_id'
+MODELS = (Recipe, RecipeTag, RecipeIngredient)
+
+INDEX_RE = re.compile(
+    r'^CREATE (?P<unique>UNIQUE )?INDEX (?P<name>\S+) ON (?P<table>\S+) '
+    r'USING (?P<method>\w+) \((?P<columns>[^)]*)\)(?P<rest>.*)$')
+
+
+def shadow(table):
+    """Return the name of the partitioned copy of table."""
+    return f'{table}_partitioned'
+
+
+def partition(table, remainder):
+    """Return the name of a partition of table."""
+    return f'{table}_p{remainder}'
+
+
+def columns(model):
+    """Return the columns of model's table."""
+    return [field.column for field in model._meta.concrete_fields]
+
+
+def quote(names):
+    """Return names quoted and separated by commas."""
+    return ', '.join(f'"{name}"' for name in names)
+
+
+def rewrite_index(definition, table):
+    """Return the name and the definition of an index for table's copy.
+
+    Unique indexes get the partition key added, as PostgreSQL requires;
+    the rows they keep apart still differ in the columns after it.
+    """
+    match = INDEX_RE.match(definition)
+    if match is None:
+        raise ValueError(f'Unexpected index definition: {definition}')
+    name = f'{match["name"]}_new'
+    index_columns = match['columns']
+    if match['unique'] and KEY not in index_columns:
+        index_columns = f'{KEY}, {index_columns}'
+    return name, (
+        f'CREATE {match["unique"] or ""}INDEX {name} ON {shadow(table)} '
+        f'USING {match["method"]} ({index_columns}){match["rest"]}')
+
+
+def foreign_keys(model):
+    """Return the foreign key clauses of model's partitioned copy by column.
+
+    Rows that point to a recipe do so with its user as well, since only
+    (user_id, id) is unique in the partitioned recipe table.
+    """
+    clauses = {}
+    for field in model._meta.concrete_fields:
+        if not field.is_relation:
+            continue
+        target = field.related_model._meta.db_table
+        if field.related_model is Recipe:
+            clauses[field.column] = (
+                f'FOREIGN KEY ({KEY}, {field.column}) REFERENCES '
+                f'{shadow(target)} ({KEY}, id) ON UPDATE CASCADE '
+                f'DEFERRABLE INITIALLY DEFERRED')
+        else:
+            clauses[field.column] = (
+                f'FOREIGN KEY ({field.column}) REFERENCES {target} '
+                f'({field.target_field.column}) '
+                f'DEFERRABLE INITIALLY DEFERRED')
+    return clauses
+
+
+def foreign_key_sql(model, partitions):
+    """Return the foreign keys of model's copy as (partition, name, SQL).
+
+    The SQL adds the key NOT VALID. PostgreSQL only allows that on the
+    partitions, not on the partitioned table, so each partition gets its
+    own keys.
+    """
+    table = model._meta.db_table
+    keys = []
+    for remainder in range(partitions):
+        name = partition(table, remainder)
+        for column, clause in foreign_keys(model).items():
+            constraint = f'{name}_{column}_fk'
+            keys.append((name, constraint, (
+                f'ALTER TABLE {name} ADD CONSTRAINT {constraint} {clause} '
+                f'NOT VALID')))
+    return keys
+
+
+def create_sql(model, partitions, pkey, indexes):
+    """Return the statements creating the partitioned copy of model.
+
+    pkey is the name of the original table's primary key and indexes
+    maps the names of its other indexes to their definitions. The copy's
+    indexes are named after them, suffixed '_new' until the swap.
+    """
+    table = model._meta.db_table
+    copy = shadow(table)
+    statements = [
+        f'CREATE TABLE {copy} (LIKE {table} INCLUDING DEFAULTS '
+        f'INCLUDING STORAGE) PARTITION BY HASH ({KEY})',
+        f'ALTER TABLE {copy} ADD CONSTRAINT {pkey}_new '
+        f'PRIMARY KEY ({KEY}, id)',
+        f'CREATE INDEX {table}_id_new ON {copy} (id)',
+    ]
+    statements += [
+        f'CREATE TABLE {partition(table, remainder)} PARTITION OF {copy} '
+        f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+        for remainder in range(partitions)
+    ]
+    statements += [
+        rewrite_index(definition, table)[1]
+        for definition in indexes.values()
+    ]
+    return statements
+
+
+def trigger_sql(model):
+    """Return the statements copying every change of model to its copy."""
+    table = model._meta.db_table
+    copy = shadow(table)
+    names = columns(model)
+    updates = ', '.join(
+        f'"{name}" = EXCLUDED."{name}"'
+        for name in names if name not in (KEY, 'id'))
+    return [
+        f'''CREATE FUNCTION {copy}_sync() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        DELETE FROM {copy} WHERE {KEY} = OLD.{KEY} AND id = OLD.id;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        INSERT INTO {copy} ({quote(names)})
+        VALUES ({', '.join(f'NEW."{name}"' for name in names)})
+        ON CONFLICT ({KEY}, id) DO UPDATE SET {updates};
+    END IF;
+    RETURN NULL;
+END $$''',
+        f'CREATE TRIGGER {copy}_sync AFTER INSERT OR UPDATE OR DELETE '
+        f'ON {table} FOR EACH ROW EXECUTE FUNCTION {copy}_sync()',
+    ]
+
+
+def swap_sql(model, indexes, sequence):
+    """Return the statements putting model's partitioned copy in place.
+
+    indexes are the names of the original table's indexes, including its
+    primary key, and sequence the one its ids are drawn from.
+    """
+    table = model._meta.db_table
+    copy = shadow(table)
+    statements = [
+        f'DROP TRIGGER {copy}_sync ON {table}',
+        f'DROP FUNCTION {copy}_sync()',
+        f'ALTER TABLE {table} RENAME TO {table}_unpartitioned',
+        f'ALTER TABLE {copy} RENAME TO {table}',
+        f'ALTER SEQUENCE {sequence} OWNED BY {table}.id',
+    ]
+    for name in [*indexes, f'{table}_id']:
+        if name in indexes:
+            statements.append(f'ALTER INDEX {name} RENAME TO {name}_old')
+        statements.append(f'ALTER INDEX {name}_new RENAME TO {name}')
+    return statements
+
+
+def table_indexes(cursor, table):
+    """Return the definitions of table's indexes by name."""
+    cursor.execute(
+        'SELECT indexname, indexdef FROM pg_indexes '
+        'WHERE schemaname = current_schema() AND tablename = %s',
+        [table])
+    return dict(cursor.fetchall())
+
+
+def primary_key(cursor, table):
+    """Return the name of the index of table's primary key."""
+    cursor.execute(
+        "SELECT conindid::regclass::text FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'p'", [table])
+    return cursor.fetchone()[0]
+
+
+def prepare(cursor, partitions=None):
+    """Create the partitioned copies and start copying changes to them."""
+    partitions = partitions or settings.RECIPE_PARTITIONS
+    for model in MODELS:
+        table = model._meta.db_table
+        indexes = table_indexes(cursor, table)
+        pkey = primary_key(cursor, table)
+        indexes.pop(pkey)
+        for statement in create_sql(model, partitions, pkey, indexes):
+            cursor.execute(statement)
+        for statement in trigger_sql(model):
+            cursor.execute(statement)
+
+
+def partition_count(cursor, model):
+    """Return the number of partitions of model's copy."""
+    cursor.execute(
+        'SELECT count(*) FROM pg_inherits WHERE inhparent = %s::regclass',
+        [shadow(model._meta.db_table)])
+    return cursor.fetchone()[0]
+
+
+def foreign_key_state(cursor, model):
+    """Return the foreign keys of model's copy as (partition, name) with
+    whether each is validated, or None if it has not been added.
+    """
+    keys = foreign_key_sql(model, partition_count(cursor, model))
+    cursor.execute(
+        "SELECT conname, convalidated FROM pg_constraint "
+        "WHERE contype = 'f' AND conname = ANY(%s)",
+        [[name for _, name, _ in keys]])
+    found = dict(cursor.fetchall())
+    return {(table, name): found.get(name) for table, name, _ in keys}
+
+
+def add_foreign_keys(cursor, model):
+    """Add the missing foreign keys of model's copy, NOT VALID."""
+    state = foreign_key_state(cursor, model)
+    for table, name, sql in foreign_key_sql(
+            model, partition_count(cursor, model)):
+        if state[table, name] is None:
+            cursor.execute(sql)
+
+
+def validate_foreign_key(cursor, table, name):
+    """Check the existing rows against a NOT VALID foreign key.
+
+    This only takes a SHARE UPDATE EXCLUSIVE lock, so writes go on.
+    """
+    cursor.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {name}')
+
+
+def backfill_batch(cursor, model, after, size):
+    """Copy up to size rows with ids above after to model's copy.
+
+    Returns the number of rows read and the last id copied.
+    """
+    table = model._meta.db_table
+    cursor.execute(
+        f'SELECT id FROM {table} WHERE id > %s ORDER BY id LIMIT %s '
+        f'FOR SHARE', [after, size])
+    ids = [row[0] for row in cursor.fetchall()]
+    if not ids:
+        return 0, after
+    names = quote(columns(model))
+    cursor.execute(
+        f'INSERT INTO {shadow(table)} ({names}) SELECT {names} FROM {table} '
+        f'WHERE id > %s AND id <= %s ON CONFLICT ({KEY}, id) DO NOTHING',
+        [after, ids[-1]])
+    return len(ids), ids[-1]
+
+
+def missing_rows(cursor, model):
+    """Return the number of model's rows not in its copy yet."""
+    table = model._meta.db_table
+    cursor.execute(
+        f'SELECT count(*) FROM {table} t WHERE NOT EXISTS ('
+        f'SELECT 1 FROM {shadow(table)} s '
+        f'WHERE s.{KEY} = t.{KEY} AND s.id = t.id)')
+    return cursor.fetchone()[0]
+
+
+def unvalidated_foreign_keys(cursor):
+    """Return the names of the copies' foreign keys not validated yet."""
+    return [
+        name
+        for model in MODELS
+        for (_, name), validated in foreign_key_state(cursor, model).items()
+        if not validated
+    ]
+
+
+def swap(cursor):
+    """Put every partitioned copy in place of its table.
+
+    Raises ValueError if a foreign key of the copies is not validated.
+    """
+    missing = unvalidated_foreign_keys(cursor)
+    if missing:
+        raise ValueError(
+            f'{len(missing)} foreign keys are not validated; run '
+            f'constrain first.')
+    tables = [model._meta.db_table for model in MODELS]
+    cursor.execute(
+        f'LOCK TABLE {", ".join(tables)} IN ACCESS EXCLUSIVE MODE')
+    for model, table in zip(MODELS, tables):
+        indexes = list(table_indexes(cursor, table))
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+        for statement in swap_sql(model, indexes, sequence):
+            cursor.execute(statement)
+
+
+def scanned_partitions(plan, table):
+    """Return the partitions of table an EXPLAIN (FORMAT JSON) plan reads."""
+    pattern = re.compile(rf'^{re.escape(table)}_p\d+$')
+    found = set()
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, list):
+            nodes.extend(node)
+        elif isinstance(node, dict):
+            if pattern.match(node.get('Relation Name', '')):
+                found.add(node['Relation Name'])
+            nodes.extend(
+                value for value in node.values()
+                if isinstance(value, (list, dict)))
+    return found
+
+
+def reads_partitioned_tables(sql):
+    """Return whether a statement reads one of the partitioned tables."""
+    if sql.lstrip().upper().startswith('INSERT'):
+        # Inserted rows are routed to their partition by value.
+        return False
+    return any(
+        f'"{model._meta.db_table}"' in sql for model in MODELS)
+
+
+def view_statements(user):
+    """Return the database alias and SQL of each query the views run.
+
+    Each recipe endpoint is called once for user, in a transaction on
+    their shard that is rolled back.
+    """
+    from recipe import views
+
+    factory = APIRequestFactory()
+    payload = {
+        'title': 'Partition check', 'time_minutes': 1, 'price': '1.00',
+        'tags': [{'name': 'Partition check'}],
+        'ingredients': [{'name': 'Partition check'}],
+    }
+    calls = [
+        (views.RecipeViewSet, {'post': 'create'}, 'post', {}, payload),
+        (views.RecipeViewSet, {'get': 'list'}, 'get', {}, None),
+        (views.RecipeViewSet, {'get': 'retrieve'}, 'get', None, None),
+        (views.RecipeViewSet, {'patch': 'partial_update'}, 'patch', None,
+         {'title': 'Checked', 'tags': [{'name': 'Checked'}]}),
+        (views.RecipeViewSet, {'delete': 'destroy'}, 'delete', None, None),
+        (views.TagViewSet, {'get': 'list'}, 'get', {}, None),
+        (views.IngredientViewSet, {'get': 'list'}, 'get', {}, None),
+    ]
+
+    class Rollback(Exception):
+        pass
+
+    with ExitStack() as stack:
+        captured = {
+            alias: stack.enter_context(
+                CaptureQueriesContext(connections[alias]))
+            for alias in connections
+        }
+        try:
+            with sharding.use_shard(user.pk), sharding.atomic(Recipe):
+                recipe_id = None
+                for viewset, actions, method, kwargs, data in calls:
+                    if kwargs is None:
+                        kwargs = {'pk': recipe_id}
+                    request = getattr(factory, method)(
+                        '/', data, format='json')
+                    force_authenticate(request, user=user)
+                    response = viewset.as_view(actions)(request, **kwargs)
+                    if response.status_code >= 400:
+                        raise RuntimeError(
+                            f'{viewset.__name__}.{actions[method]} failed: '
+                            f'{response.status_code} {response.data}')
+                    if method == 'post':
+                        recipe_id = response.data['id']
+                raise Rollback
+        except Rollback:
+            pass
+    return [
+        (alias, query['sql'])
+        for alias, context in captured.items()
+        for query in context.captured_queries
+    ]
+
+
+def check_pruning(user):
+    """Return the view statements that read more than one partition.
+
+    Each is returned with the partitions it reads, by table.
+    """
+    failures = []
+    for alias, sql in view_statements(user):
+        if not reads_partitioned_tables(sql):
+            continue
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        scanned = {
+            model._meta.db_table: scanned_partitions(
+                plan, model._meta.db_table)
+            for model in MODELS
+        }
+        if any(len(found) > 1 for found in scanned.values()):
+            failures.append((sql, scanned))
+    return failures
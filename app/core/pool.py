@@ -0,0 +1,172 @@
+"""
+In-process database connection pool.
+
+Used by the core.backends.postgresql engine so threaded and ASGI workers
+reuse a bounded set of connections instead of opening one per request.
+Connections are checked when they are handed out: ones older than
+max_age are replaced, and ones idle for longer than check_interval are
+only reused if check() passes, so a connection the server dropped never
+reaches a request.
+"""
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available in time."""
+
+
+class ConnectionPool:
+    """A bounded pool of connections created by `connect`."""
+
+    def __init__(self, connect, max_size=10, timeout=5.0, check=None,
+                 check_interval=30.0, max_age=None):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check = check
+        self.check_interval = check_interval
+        self.max_age = max_age
+        # Idle connections, with when they were released.
+        self._idle = []
+        # When each open connection was created, by id().
+        self._opened = {}
+        self._size = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self.created = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.recycled = 0
+
+    def acquire(self):
+        """Return a working idle connection or open a new one."""
+        while True:
+            connection, released_at = self._checkout()
+            if released_at is None or self._usable(connection, released_at):
+                return connection
+            self.release(connection, discard=True)
+            with self._cond:
+                self.recycled += 1
+
+    def _usable(self, connection, released_at):
+        """Return whether an idle connection may be handed out again."""
+        if getattr(connection, 'closed', False):
+            return False
+        now = time.monotonic()
+        if self.max_age is not None and (
+                now - self._opened.get(id(connection), now) > self.max_age):
+            return False
+        if self.check is not None and (
+                now - released_at > self.check_interval):
+            return self.check(connection)
+        return True
+
+    def _checkout(self):
+        """Take an idle connection, with when it was released, or open one.
+
+        A new connection comes with None as its release time.
+        """
+        deadline = None
+        with self._cond:
+            while not self._idle and self._size >= self.max_size:
+                if deadline is None:
+                    self.waits += 1
+                    deadline = time.monotonic() + self.timeout
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f'No connection available after {self.timeout}s '
+                        f'({self.max_size} in use)'
+                    )
+                self._cond.wait(remaining)
+
+            if self._idle:
+                self._in_use += 1
+                return self._idle.pop()
+            # Reserve the slot so the connect happens outside the lock.
+            self._size += 1
+            self._in_use += 1
+
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.created += 1
+            self._opened[id(connection)] = time.monotonic()
+        return connection, None
+
+    def release(self, connection, discard=False):
+        """Return a connection to the pool, or close it if `discard`."""
+        if discard:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._size -= 1
+                self._opened.pop(id(connection), None)
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def close(self):
+        """Close every idle connection."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            for connection, _ in idle:
+                self._opened.pop(id(connection), None)
+        for connection, _ in idle:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        """Return the pool metrics."""
+        with self._cond:
+            return {
+                'size': self._size,
+                'max_size': self.max_size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'created': self.created,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'recycled': self.recycled,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, connect, **options):
+    """Return the pool for a database, creating it on first use."""
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(connect, **options)
+    return pool
+
+
+def stats():
+    """Return the metrics of every pool."""
+    return {key: pool.stats() for key, pool in list(_pools.items())}
+
+
+def close_all():
+    """Close the idle connections of every pool."""
+    for pool in list(_pools.values()):
+        pool.close()
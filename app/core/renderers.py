@@ -0,0 +1,83 @@
+"""
+Fast JSON renderer and parser for the API.
+
+Uses orjson when it is installed and falls back to the standard library
+json module otherwise.
+"""
+import json
+
+from rest_framework import renderers, parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+_encoder = encoders.JSONEncoder()
+
+
+def _default(obj):
+    """Encode the types orjson does not handle the same way DRF does."""
+    return _encoder.default(obj)
+
+
+def dumps(data):
+    """Serialize data to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(
+            data,
+            default=_default,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(
+        data,
+        cls=encoders.JSONEncoder,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(',', ':'),
+    ).encode('utf-8')
+
+
+def loads(content):
+    """Deserialize JSON bytes or text."""
+    if orjson is not None:
+        return orjson.loads(content)
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    return json.loads(content)
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """JSON renderer backed by orjson."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render data into compact JSON."""
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            # Pretty printed output is for humans, keep DRF's behaviour.
+            return super().render(
+                data, accepted_media_type, renderer_context)
+
+        try:
+            return dumps(data)
+        except TypeError:
+            return super().render(
+                data, accepted_media_type, renderer_context)
+
+
+class FastJSONParser(parsers.JSONParser):
+    """JSON parser backed by orjson."""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Parse the incoming bytestream as JSON."""
+        try:
+            return loads(stream.read())
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
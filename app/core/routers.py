@@ -0,0 +1,179 @@
+"""
+Database routers.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_shard = ContextVar('shard', default=None)
+
+# Models whose rows live on the shard of the user they belong to.
+SHARDED_MODELS = {
+    'core.recipe', 'core.tag', 'core.ingredient', 'core.recipetag',
+    'core.recipeingredient', 'core.archivedrecipe',
+}
+
+# Database holding the users and every model that is not sharded.
+DIRECTORY = 'default'
+
+
+def reading_from_replica():
+    """Return True if reads in this context may go to a replica."""
+    return _replica_reads.get()
+
+
+def read_from_replicas():
+    """Let the reads of this context go to a replica.
+
+    Returns a token for reset_replica_reads().
+    """
+    return _replica_reads.set(True)
+
+
+def reset_replica_reads(token):
+    """Undo the read_from_replicas() call that returned token."""
+    _replica_reads.reset(token)
+
+
+def current_shard():
+    """Return the shard queries of sharded models go to, if one is set."""
+    return _shard.get()
+
+
+def _pin_key(user):
+    return f'primary-pin:{user.pk}'
+
+
+def pin_to_primary(user):
+    """Send the user's reads to the primary for REPLICA_PIN_SECONDS."""
+    caches[settings.REPLICA_PIN_CACHE].set(
+        _pin_key(user), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    """Return True if the user wrote recently."""
+    return bool(caches[settings.REPLICA_PIN_CACHE].get(_pin_key(user)))
+
+
+class ShardRouter:
+    """Send the queries of sharded models to the current user's shard.
+
+    Related objects are looked up on the shard their instance came from,
+    except users, which are always read from the directory: a shard only
+    holds a copy of their row for its foreign keys. Queries on the
+    directory are left to the routers after this one, so they can still
+    read from a replica.
+    """
+
+    def _db(self, model, **hints):
+        # The stand-in model of the cache table has no label_lower.
+        opts = model._meta
+        sharded = f'{opts.app_label}.{opts.model_name}' in SHARDED_MODELS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db is not None:
+            db = instance._state.db
+            on_shard = db in settings.DATABASE_SHARDS[1:]
+            if instance._meta.label_lower in SHARDED_MODELS:
+                # The user of a sharded row is read from the directory.
+                return db if sharded and on_shard else None
+            if on_shard:
+                return db
+        if not sharded:
+            return None
+        shard = _shard.get()
+        return shard if shard != DIRECTORY else None
+
+    db_for_read = _db
+    db_for_write = _db
+
+    def allow_relation(self, obj1, obj2, **hints):
+        labels = {obj1._meta.label_lower, obj2._meta.label_lower}
+        if not labels & SHARDED_MODELS:
+            return None
+        # Every shard holds a copy of the rows of the users it serves.
+        if (obj1._state.db == obj2._state.db
+                or settings.AUTH_USER_MODEL.lower() in labels):
+            return True
+        return False
+
+
+class ReplicaRouter:
+    """Send reads to a replica when the current request allows it.
+
+    Everything else, including all writes, goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        # Cache entries, such as the pins, are read where they were just
+        # written.
+        if model._meta.app_label == 'django_cache':
+            return 'default'
+        if replicas and _replica_reads.get():
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        # Rows related to an instance of another database, such as the
+        # permissions migrate creates for its content types, stay there.
+        instance = hints.get('instance')
+        db = instance._state.db if instance is not None else None
+        if db and db not in settings.DATABASE_REPLICAS:
+            return db
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """Serve safe reads of a view from the read replicas.
+
+    Authentication still reads from the primary. After a successful write
+    the user is pinned to the primary for a short window so they read
+    their own writes.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def use_replica(self, request):
+        """Return True if this request may read from a replica."""
+        if request.method not in SAFE_METHODS:
+            return False
+        action = getattr(self, 'action', None)
+        if action is not None and action not in self.replica_actions:
+            return False
+        user = request.user
+        return not (user.is_authenticated and is_pinned_to_primary(user))
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.use_replica(request):
+            self._replica_token = read_from_replicas()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            reset_replica_reads(token)
+            self._replica_token = None
+
+        # The user is only looked at after a write, so throttled requests
+        # are not authenticated here.
+        if (request.method not in SAFE_METHODS
+                and response.status_code < 400):
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,105 @@
+"""
+Precomputed OpenAPI schema.
+
+Generating the schema introspects every view and serializer, which is far
+too slow to repeat for every request. The build_schema command renders it
+once at build time into OPENAPI_SCHEMA_DIR. Each process then serves those
+files, or generates the schema on first use when they are missing, and
+keeps the result in memory along with its compressed variants.
+"""
+import hashlib
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+RENDERERS = {
+    'yaml': OpenApiYamlRenderer,
+    'json': OpenApiJsonRenderer,
+}
+
+
+class Schema:
+    """A rendered schema and its compressed variants."""
+
+    def __init__(self, content, content_type):
+        self.content = content
+        self.content_type = content_type
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        # Weak, as the same tag covers every content encoding.
+        self.etag = f'W/"{digest}"'
+        self._encoded = {}
+
+    def encode(self, encoder):
+        """Return the content compressed by encoder, compressing it once."""
+        content = self._encoded.get(encoder.name)
+        if content is None:
+            content = self._encoded[encoder.name] = encoder.compress(
+                self.content)
+        return content
+
+
+def generate():
+    """Return the schema of the API."""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS(
+        urlconf=spectacular_settings.SERVE_URLCONF)
+    return generator.get_schema(request=None, public=True)
+
+
+def render(document, fmt):
+    """Return the schema rendered in a format."""
+    return RENDERERS[fmt]().render(document, renderer_context={})
+
+
+def path(fmt):
+    """Return the path of the precomputed schema in a format."""
+    return Path(settings.OPENAPI_SCHEMA_DIR) / f'openapi.{fmt}'
+
+
+def write(document):
+    """Write the schema in every format; return the paths written."""
+    paths = []
+    for fmt in RENDERERS:
+        target = path(fmt)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(render(document, fmt))
+        paths.append(target)
+    return paths
+
+
+_schemas = {}
+_document = None
+_lock = threading.Lock()
+
+
+def _load(fmt):
+    global _document
+    try:
+        return path(fmt).read_bytes()
+    except FileNotFoundError:
+        if _document is None:
+            _document = generate()
+        return render(_document, fmt)
+
+
+def get_schema(fmt):
+    """Return the schema in a format, loading it once per process."""
+    schema = _schemas.get(fmt)
+    if schema is None:
+        # Concurrent first requests wait for one thread to load it.
+        with _lock:
+            schema = _schemas.get(fmt)
+            if schema is None:
+                schema = _schemas[fmt] = Schema(
+                    _load(fmt), RENDERERS[fmt].media_type)
+    return schema
+
+
+def clear():
+    """Forget the loaded schema."""
+    global _document
+    with _lock:
+        _schemas.clear()
+        _document = None
@@ -0,0 +1,42 @@
+"""
+Serializers for the core app.
+"""
+from django.conf import settings
+from django.utils.translation import gettext as _
+from rest_framework import serializers
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """Serializer for one request of a batch"""
+    method = serializers.ChoiceField(
+        choices=('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'),
+        default='GET',
+    )
+    path = serializers.RegexField(r'^/api/', max_length=2000)
+    body = serializers.JSONField(required=False, allow_null=True)
+
+
+class BatchSerializer(serializers.Serializer):
+    """Serializer for a batch of requests"""
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        """Limit the number of requests in a batch"""
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                _('A batch can hold at most %(count)d requests.')
+                % {'count': settings.BATCH_MAX_REQUESTS}
+            )
+        return value
+
+
+class SubResponseSerializer(serializers.Serializer):
+    """Serializer for the response to one request of a batch"""
+    status = serializers.IntegerField()
+    headers = serializers.DictField(child=serializers.CharField())
+    body = serializers.JSONField(allow_null=True)
+
+
+class BatchResponseSerializer(serializers.Serializer):
+    """Serializer for the responses to a batch"""
+    responses = SubResponseSerializer(many=True)
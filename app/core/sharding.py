@@ -0,0 +1,307 @@
+"""
+Sharding of user data across databases.
+
+Users live in the directory, the default database, and each has a shard:
+the database alias holding their recipes, tags and ingredients. New users
+are placed on one of SHARD_PLACEMENT by a hash of their email, and a copy
+of their row is kept on that shard so its foreign keys hold. Requests
+set the shard of the authenticated user with ShardMixin, and ShardRouter
+sends the queries of the sharded models there.
+
+Moving users to another shard marks them as moving first, so their
+requests are turned away with a 503, and their jobs put off, once every
+process has seen the mark. Their rows are then copied, the directory is
+pointed at the new shard, and the old rows are deleted. A move that
+failed can be run again: rows an earlier attempt left on the new shard
+are replaced. Ids are interleaved between shards, so copied rows keep
+theirs.
+"""
+import time
+import zlib
+from contextlib import contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connections, router, transaction
+from rest_framework import exceptions, status
+
+from core import jobs
+from core.models import (ArchivedRecipe, Ingredient, Recipe,
+                         RecipeIngredient, RecipeTag, Tag)
+from core.routers import DIRECTORY, _shard, current_shard
+
+# Sharded models, each after the models it refers to.
+MODELS = (Tag, Ingredient, Recipe, RecipeTag, RecipeIngredient,
+          ArchivedRecipe)
+
+# Ids interleaved between shards: shard n hands out ids equal to n modulo
+# this, so it caps the number of shards.
+ID_STRIDE = 1024
+
+
+class ShardMoving(exceptions.APIException, jobs.Retry):
+    """The user's data is being moved to another shard.
+
+    Requests get a 503 with a Retry-After of wait seconds, and jobs are
+    run again after them.
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Your data is being moved, try again shortly.'
+    default_code = 'shard_moving'
+
+    def __init__(self, wait):
+        exceptions.APIException.__init__(self)
+        self.wait = self.delay = wait
+
+
+def place(email):
+    """Return the shard a new user with email is placed on."""
+    shards = settings.SHARD_PLACEMENT
+    return shards[zlib.crc32(email.lower().encode()) % len(shards)]
+
+
+def _cache_key(user_id):
+    return f'shard:{user_id}'
+
+
+def lookup(user_id):
+    """Return the shard of a user and whether they are being moved."""
+    if len(settings.DATABASE_SHARDS) == 1:
+        return DIRECTORY, False
+    cache = caches[settings.SHARD_CACHE]
+    entry = cache.get(_cache_key(user_id))
+    if entry is None:
+        row = (
+            get_user_model()._base_manager.using(DIRECTORY)
+            .filter(pk=user_id).values_list('shard', 'shard_moving').first()
+        )
+        entry = (row[0] or DIRECTORY, row[1]) if row else (DIRECTORY, False)
+        cache.set(_cache_key(user_id), entry, settings.SHARD_CACHE_SECONDS)
+    return entry
+
+
+def invalidate(user_ids):
+    """Forget the cached shards of users."""
+    caches[settings.SHARD_CACHE].delete_many(
+        [_cache_key(user_id) for user_id in user_ids])
+
+
+def activate(user_id):
+    """Send the sharded queries of this context to the user's shard.
+
+    Returns a token for routers._shard.reset(); raises ShardMoving while
+    the user is moved.
+    """
+    shard, moving = lookup(user_id)
+    if moving:
+        raise ShardMoving(settings.SHARD_CACHE_SECONDS)
+    return _shard.set(shard)
+
+
+@contextmanager
+def use_database(alias):
+    """Send the sharded queries in the block to the shard alias."""
+    token = _shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _shard.reset(token)
+
+
+@contextmanager
+def use_shard(user_id):
+    """Send the sharded queries in the block to the user's shard.
+
+    Raises ShardMoving while the user is moved, like activate().
+    """
+    token = activate(user_id)
+    try:
+        yield _shard.get()
+    finally:
+        _shard.reset(token)
+
+
+def moving_users():
+    """Return the ids of the users being moved."""
+    if len(settings.DATABASE_SHARDS) == 1:
+        return []
+    return list(
+        get_user_model()._base_manager.using(DIRECTORY)
+        .filter(shard_moving=True).values_list('pk', flat=True))
+
+
+@contextmanager
+def atomic(model):
+    """Run the block in a transaction on the directory and on the shard.
+
+    The transaction on the shard the model's queries go to is committed
+    first, so rows written to the directory in the block, such as jobs
+    and outbox events, are only committed once the change they follow
+    is. Should the directory fail to commit after that, the change stays
+    without them.
+    """
+    using = router.db_for_write(model)
+    with transaction.atomic(using=DIRECTORY):
+        if using == DIRECTORY:
+            yield
+        else:
+            with transaction.atomic(using=using):
+                yield
+
+
+class ShardMixin:
+    """Route a view's queries to the authenticated user's shard."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            self._shard_token = activate(request.user.pk)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_shard_token', None)
+        if token is not None:
+            _shard.reset(token)
+            self._shard_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+def place_user(sender, instance, raw, using, **kwargs):
+    """Pick the shard of a user about to be created."""
+    if not raw and using == DIRECTORY and not instance.shard:
+        instance.shard = place(instance.email)
+
+
+def copy_user(sender, instance, created, raw, using, **kwargs):
+    """Copy a new user's row to their shard."""
+    if created and not raw and using == DIRECTORY:
+        ensure_user(instance.pk, instance.shard)
+
+
+def ensure_user(user_id, alias):
+    """Create the copy of a user's row on the shard alias if missing.
+
+    The copy only exists for the foreign keys; it has no email or
+    password of its own and is never logged in with.
+    """
+    if alias == DIRECTORY:
+        return
+    get_user_model()._base_manager.using(alias).get_or_create(
+        pk=user_id,
+        defaults={
+            'email': f'{user_id}@shard.invalid', 'password': '!',
+            'is_active': False, 'shard': alias,
+        },
+    )
+
+
+def delete_user(user_id):
+    """Delete the copy of a user's row from the current shard."""
+    alias = current_shard()
+    if alias not in (None, DIRECTORY):
+        get_user_model()._base_manager.using(alias).filter(
+            pk=user_id).delete()
+
+
+def configure_sequences(sender, using, **kwargs):
+    """Make each shard hand out ids no other shard does.
+
+    Connected to post_migrate, so it runs on every migrated database.
+    """
+    shards = settings.DATABASE_SHARDS
+    if len(shards) == 1 or using not in shards:
+        return
+    index = shards.index(using)
+    with connections[using].cursor() as cursor:
+        for model in MODELS:
+            _interleave_sequence(cursor, model._meta.db_table, index)
+
+
+def _interleave_sequence(cursor, table, index):
+    """Make table's id sequence count in ID_STRIDE steps from index."""
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    sequence = cursor.fetchone()[0]
+    cursor.execute(
+        'SELECT seqincrement FROM pg_sequence WHERE seqrelid = %s::regclass',
+        [sequence])
+    if cursor.fetchone()[0] == ID_STRIDE:
+        return
+    cursor.execute(f'SELECT last_value FROM {sequence}')
+    last = cursor.fetchone()[0]
+    start = (last // ID_STRIDE + 1) * ID_STRIDE + index
+    cursor.execute(
+        f'ALTER SEQUENCE {sequence} INCREMENT BY {ID_STRIDE} '
+        f'RESTART WITH {start}')
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def copy_rows(user_id, source, target):
+    """Copy a user's rows from the source shard to the target shard.
+
+    Rows of the user already on the target, left by a move that failed
+    after copying, are deleted first, in the same transaction.
+    """
+    size = settings.USER_PURGE_BATCH_SIZE
+    with transaction.atomic(using=target):
+        delete_rows(user_id, target)
+        ensure_user(user_id, target)
+        for model in MODELS:
+            rows = (
+                model._base_manager.using(source).filter(user_id=user_id)
+                .order_by('pk').iterator(chunk_size=size)
+            )
+            for batch in _batches(rows, size):
+                model._base_manager.using(target).bulk_create(batch)
+
+
+def delete_rows(user_id, alias):
+    """Delete a user's rows from the shard alias, in batches."""
+    size = settings.USER_PURGE_BATCH_SIZE
+    for model in reversed(MODELS):
+        queryset = model._base_manager.using(alias).filter(user_id=user_id)
+        while True:
+            with transaction.atomic(using=alias):
+                ids = list(queryset.values_list('pk', flat=True)[:size])
+                if not ids:
+                    break
+                model._base_manager.using(alias).filter(pk__in=ids).delete()
+    if alias != DIRECTORY:
+        get_user_model()._base_manager.using(alias).filter(
+            pk=user_id).delete()
+
+
+def move_users(user_ids, target, wait=None):
+    """Move the data of users to the shard target.
+
+    Their requests are refused from now on; after wait seconds, by
+    default long enough for every process to see it, their rows are
+    copied. Returns the ids of the users moved.
+    """
+    if wait is None:
+        wait = settings.SHARD_CACHE_SECONDS + settings.SERVER_TIMEOUT
+    directory = get_user_model()._base_manager.using(DIRECTORY)
+    users = list(
+        directory.filter(pk__in=user_ids).exclude(shard=target)
+        .values_list('pk', 'shard'))
+    ids = [user_id for user_id, _ in users]
+    if not ids:
+        return []
+
+    directory.filter(pk__in=ids).update(shard_moving=True)
+    invalidate(ids)
+    try:
+        time.sleep(wait)
+        for user_id, source in users:
+            copy_rows(user_id, source, target)
+            directory.filter(pk=user_id).update(shard=target)
+            delete_rows(user_id, source)
+    finally:
+        directory.filter(pk__in=ids).update(shard_moving=False)
+        invalidate(ids)
+    return ids
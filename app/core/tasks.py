@@ -0,0 +1,21 @@
+"""
+Background tasks for the core app.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from core import deletion, jobs, sharding
+
+
+@jobs.task
+def purge_user(user_id, deleted=None):
+    """Delete a deactivated user's data in batches, then the user."""
+    if get_user_model().objects.filter(pk=user_id, is_active=True).exists():
+        # The account was reactivated; keep what is left.
+        return
+    deleted = deleted or {}
+    with sharding.use_shard(user_id):
+        done = deletion.purge(
+            user_id, deleted, settings.USER_PURGE_BATCHES_PER_JOB)
+    if not done:
+        jobs.enqueue(purge_user, {'user_id': user_id, 'deleted': deleted})
@@ -0,0 +1,25 @@
+"""
+Test runner for app.test_settings.
+"""
+import gc
+
+from django.test.runner import DiscoverRunner, default_test_processes
+
+
+class ParallelTestRunner(DiscoverRunner):
+    """Run the tests in one process per core unless --parallel is given.
+
+    Each process gets its own copy of the test databases.
+    """
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.set_defaults(parallel=default_test_processes())
+
+    def teardown_databases(self, old_config, **kwargs):
+        # Connections opened by finished pool threads are only closed once
+        # collected, and an open one keeps the test database from being
+        # dropped.
+        gc.collect()
+        super().teardown_databases(old_config, **kwargs)
@@ -1,30 +1,41 @@
 """
 Test for the admin modification
 """
+from decimal import Decimal
+from unittest.mock import patch
 
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.test import Client
 
+from core import admin
+from core.models import Recipe, RecipeTag, Tag
+
 
 class AdminSiteTests(TestCase):
     """Tests for admin modifications"""
 
-    def setUp(self):
-        """Create user and client"""
-        self.client = Client()
-        self.admin_user = get_user_model().objects.create_superuser(
+    @classmethod
+    def setUpTestData(cls):
+        """Create users"""
+        cls.admin_user = get_user_model().objects.create_superuser(
             'test@example.com',
             'test123password',
         )
-        self.client.force_login(self.admin_user)
-        self.user = get_user_model().objects.create_user(
+        cls.user = get_user_model().objects.create_user(
             email='user@example.com',
             password='test123password',
             name='Test User',
         )
 
+    def setUp(self):
+        """Create client"""
+        self.client = Client()
+        self.client.force_login(self.admin_user)
+
 
     def test_user_listed(self):
         """Test that users are listed on user page"""
@@ -43,4 +54,142 @@ class AdminSiteTests(TestCase):
 
         res = self.client.get(url)
 
-        self.assertEqual(res.status_code, 200)
\ No newline at end of file
+        self.assertEqual(res.status_code, 200)
+
+
+class LargeTableAdminTests(TestCase):
+    """Tests for the recipe, tag and ingredient admin pages"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = get_user_model().objects.create_superuser(
+            'admin@example.com', 'test123password')
+        cls.recipes = [
+            Recipe.objects.create(
+                user=cls.admin_user, title=f'Recipe {i}', time_minutes=5,
+                price=Decimal('1.00'))
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin_user)
+
+    def changelist(self, params=None):
+        """Return the recipe changelist response"""
+        return self.client.get(
+            reverse('admin:core_recipe_changelist'), params or {})
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Test users are joined instead of fetched per row"""
+        with CaptureQueriesContext(connection) as few:
+            self.changelist()
+        for i in range(5, 20):
+            Recipe.objects.create(
+                user=self.admin_user, title=f'Recipe {i}', time_minutes=5,
+                price=Decimal('1.00'))
+
+        with CaptureQueriesContext(connection) as many:
+            self.changelist()
+
+        self.assertEqual(len(many), len(few))
+
+    @patch.object(admin.RecipeAdmin, 'list_per_page', 2)
+    def test_keyset_pages(self):
+        """Test pages follow the last key instead of an offset"""
+        res = self.changelist()
+
+        newest = self.recipes[::-1]
+        self.assertEqual(list(res.context['cl'].result_list), newest[:2])
+        next_url = res.context['cl'].next_url
+        self.assertIn(f'pk__lt={newest[1].pk}', next_url)
+
+        res = self.client.get(
+            reverse('admin:core_recipe_changelist') + next_url)
+
+        self.assertEqual(list(res.context['cl'].result_list), newest[2:4])
+        self.assertContains(res, 'Newest')
+
+    @patch.object(admin.RecipeAdmin, 'list_per_page', 2)
+    def test_sorted_by_column(self):
+        """Test sorting by a column falls back to numbered pages"""
+        res = self.changelist({'o': '1'})
+
+        self.assertFalse(res.context['cl'].keyset)
+        self.assertEqual(res.context['cl'].result_count, 5)
+
+    @patch('core.admin.estimate_count', return_value=5_000_000)
+    def test_estimated_count(self, patched_estimate):
+        """Test large tables show the planner estimate"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.changelist()
+
+        self.assertContains(res, 'About 5000000 recipes')
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries))
+
+    @patch('core.admin.estimate_count', return_value=3)
+    def test_small_estimate_counted(self, patched_estimate):
+        """Test small results are counted exactly"""
+        res = self.changelist()
+
+        self.assertEqual(res.context['cl'].result_count, 5)
+        self.assertNotContains(res, 'About')
+
+    def test_search_by_prefix(self):
+        """Test search matches the start of the title"""
+        Recipe.objects.create(
+            user=self.admin_user, title='Soup', time_minutes=5,
+            price=Decimal('1.00'))
+
+        res = self.changelist({'q': 'Sou'})
+        missing = self.changelist({'q': 'oup'})
+
+        self.assertEqual(res.context['cl'].result_count, 1)
+        self.assertEqual(missing.context['cl'].result_count, 0)
+
+    def test_search_by_email(self):
+        """Test search matches the whole email of the user"""
+        email = self.admin_user.email
+
+        res = self.changelist({'q': email})
+        missing = self.changelist({'q': email[:-1]})
+
+        self.assertEqual(res.context['cl'].result_count, 5)
+        self.assertEqual(missing.context['cl'].result_count, 0)
+
+    def test_recipe_tags_inline(self):
+        """Test tags added on the recipe page get the recipe's user"""
+        tag = Tag.objects.create(user=self.admin_user, name='Soup')
+        recipe = self.recipes[0]
+        prefix = 'recipetag_set'
+        data = {
+            'user': recipe.user_id, 'title': recipe.title,
+            'time_minutes': recipe.time_minutes, 'price': recipe.price,
+            'status': recipe.status, 'thumbnails': '{}',
+            f'{prefix}-TOTAL_FORMS': '1', f'{prefix}-INITIAL_FORMS': '0',
+            f'{prefix}-0-tag': tag.pk,
+            'recipeingredient_set-TOTAL_FORMS': '0',
+            'recipeingredient_set-INITIAL_FORMS': '0',
+        }
+
+        res = self.client.post(
+            reverse('admin:core_recipe_change', args=[recipe.pk]), data)
+
+        self.assertEqual(res.status_code, 302)
+        self.assertEqual(
+            list(RecipeTag.objects.values_list('tag', 'user')),
+            [(tag.pk, recipe.user_id)])
+
+    def test_tag_autocomplete(self):
+        """Test tags are picked with the autocomplete widget"""
+        Tag.objects.create(user=self.admin_user, name='Soup')
+        Tag.objects.create(user=self.admin_user, name='Dessert')
+
+        res = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'core', 'model_name': 'recipetag',
+            'field_name': 'tag', 'term': 'So',
+        })
+
+        self.assertEqual(
+            [result['text'] for result in res.json()['results']], ['Soup'])
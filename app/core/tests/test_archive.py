@@ -0,0 +1,121 @@
+"""
+Tests for archiving recipes.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import archive
+from core.models import ArchivedRecipe, Ingredient, Recipe, Tag
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class ArchiveTests(TestCase):
+    """Tests for archived recipes."""
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='test123password')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('2.50'))
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Lunch'))
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Salt'))
+
+    def archive_days_ago(self, days):
+        """Archive the recipe as if it happened days ago"""
+        archive.archive(self.recipe)
+        Recipe.all_objects.filter(pk=self.recipe.pk).update(
+            archived_at=timezone.now() - timedelta(days=days))
+
+    def test_archived_recipe_hidden(self):
+        """Test archived recipes are left out of the API."""
+        kept = Recipe.objects.create(
+            user=self.user, title='Stew', time_minutes=5,
+            price=Decimal('2.50'))
+        archive.archive(self.recipe)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(RECIPES_URL)
+
+        self.assertEqual([recipe['id'] for recipe in res.data], [kept.id])
+        self.assertEqual(Recipe.all_objects.count(), 2)
+        self.assertFalse(Tag.objects.get().recipe_set.exists())
+
+    def test_restore(self):
+        """Test a restored recipe is active again."""
+        archive.archive(self.recipe)
+
+        archive.restore(self.recipe)
+
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.status, Recipe.ACTIVE)
+        self.assertIsNone(recipe.archived_at)
+
+    def test_move_long_archived(self):
+        """Test archive_recipes moves only long-archived recipes."""
+        recent = Recipe.objects.create(
+            user=self.user, title='Stew', time_minutes=5,
+            price=Decimal('2.50'))
+        archive.archive(recent)
+        self.archive_days_ago(100)
+
+        out = StringIO()
+        call_command('archive_recipes', days=90, batch_size=1, pause=0,
+                     stdout=out)
+
+        self.assertIn('Moved 1 recipes', out.getvalue())
+        self.assertEqual(list(Recipe.all_objects.all()), [recent])
+        archived = ArchivedRecipe.objects.get()
+        self.assertEqual(archived.recipe_id, self.recipe.pk)
+        self.assertEqual(archived.user, self.user)
+        self.assertEqual(archived.data['price'], '2.50')
+        self.assertEqual(archived.data['tags'], ['Lunch'])
+        self.assertEqual(archived.data['ingredients'], ['Salt'])
+        self.assertFalse(Recipe.tags.through.objects.exists())
+
+    def test_move_in_batches(self):
+        """Test recipes are moved over several batches."""
+        for i in range(4):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Recipe {i}', time_minutes=5,
+                price=Decimal('1.00'))
+            archive.archive(recipe)
+        self.archive_days_ago(100)
+        Recipe.all_objects.update(
+            archived_at=timezone.now() - timedelta(days=100))
+
+        moved = archive.move_batch(timezone.now(), 2)
+
+        self.assertEqual(moved, 2)
+        call_command('archive_recipes', batch_size=2, pause=0,
+                     stdout=StringIO())
+        self.assertFalse(Recipe.all_objects.exists())
+        self.assertEqual(ArchivedRecipe.objects.count(), 5)
+
+    def test_admin_search_by_email(self):
+        """Test the archive admin finds a user's recipes by email."""
+        admin_user = get_user_model().objects.create_superuser(
+            'admin@example.com', 'test123password')
+        self.archive_days_ago(100)
+        archive.move_batch(timezone.now(), 10)
+        client = Client()
+        client.force_login(admin_user)
+        url = reverse('admin:core_archivedrecipe_changelist')
+
+        res = client.get(url, {'q': self.user.email})
+        missing = client.get(url, {'q': 'user@'})
+
+        self.assertEqual(res.context['cl'].result_count, 1)
+        self.assertEqual(missing.context['cl'].result_count, 0)
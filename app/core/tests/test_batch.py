@@ -0,0 +1,164 @@
+"""
+Tests for the batch API.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase, override_settings
+from django.urls import ResolverMatch, reverse
+from rest_framework import exceptions, status
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from core import batch, routers
+from core.models import Recipe, Tag
+from recipe.views import TagViewSet
+
+BATCH_URL = reverse('batch')
+ME_URL = reverse('user:me')
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class BatchApiTests(TransactionTestCase):
+    """Test the batch API"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='batch@example.com', password='test123password',
+            name='Batch')
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('2.00'))
+        Tag.objects.create(user=self.user, name='Dinner')
+
+    def tearDown(self):
+        batch.shutdown_executor()
+
+    def post(self, *specs):
+        """Post a batch of requests"""
+        return self.client.post(
+            BATCH_URL, {'requests': list(specs)}, format='json')
+
+    def test_auth_required(self):
+        """Test authentication is required"""
+        res = APIClient().post(
+            BATCH_URL, {'requests': [{'path': ME_URL}]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_home_screen(self):
+        """Test reads return the same data as separate requests"""
+        paths = [ME_URL, RECIPES_URL, TAGS_URL, INGREDIENTS_URL]
+        expected = [self.client.get(path).json() for path in paths]
+
+        with patch.object(batch, '_run_in_thread',
+                          wraps=batch._run_in_thread) as in_thread:
+            res = self.post(*({'path': path} for path in paths))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        responses = res.json()['responses']
+        self.assertEqual([r['status'] for r in responses], [200] * 4)
+        self.assertEqual([r['body'] for r in responses], expected)
+        self.assertEqual(in_thread.call_count, 4)
+
+    def test_writes_run_in_order(self):
+        """Test a batch with writes runs its requests in order"""
+        payload = {'title': 'Stew', 'time_minutes': 30, 'price': '5.00'}
+
+        res = self.post(
+            {'method': 'POST', 'path': RECIPES_URL, 'body': payload},
+            {'path': f'{RECIPES_URL}?fields=title'},
+        )
+
+        created, listed = res.json()['responses']
+        self.assertEqual(created['status'], status.HTTP_201_CREATED)
+        self.assertEqual(
+            listed['body'], [{'title': 'Stew'}, {'title': 'Soup'}])
+
+    def test_sub_request_errors(self):
+        """Test failing sub-requests do not fail the batch"""
+        res = self.post(
+            {'path': '/api/unknown/'},
+            {'path': reverse('recipe:recipe-detail', args=[0])},
+            {'method': 'POST', 'path': BATCH_URL, 'body': {}},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['status'] for r in res.json()['responses']], [404, 404, 400])
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_too_many_requests(self):
+        """Test the number of requests in a batch is limited"""
+        res = self.post(*({'path': ME_URL} for _ in range(3)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_path_outside_api(self):
+        """Test only API paths can be batched"""
+        res = self.post({'path': '/admin/'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sub_request_raises(self):
+        """Test a sub-request raising an error gets an error entry"""
+        with patch.object(
+                TagViewSet, 'list', side_effect=RuntimeError('boom')), \
+                self.assertLogs('core.batch', 'ERROR'):
+            res = self.post({'path': TAGS_URL})
+            self.assertFalse(routers.reading_from_replica())
+
+        failed, = res.json()['responses']
+        self.assertEqual(failed['status'], 500)
+        self.assertNotIn('boom', str(failed['body']))
+
+    def test_sub_request_api_exception(self):
+        """Test API errors escaping a view are handled like DRF does"""
+        def view(request):
+            raise exceptions.Throttled(wait=5)
+
+        with patch('core.batch.resolve', return_value=ResolverMatch(
+                view, (), {})):
+            res = self.post({'path': TAGS_URL})
+
+        throttled, = res.json()['responses']
+        self.assertEqual(
+            throttled['status'], status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(throttled['headers']['Retry-After'], '5')
+        self.assertIn('throttled', throttled['body']['detail'])
+
+    def test_sub_response_render_fails(self):
+        """Test a sub-response that cannot be rendered gets an error entry"""
+        with patch.object(
+                TagViewSet, 'list',
+                return_value=Response({'name': object()})), \
+                self.assertLogs('core.batch', 'ERROR'):
+            res = self.post({'path': TAGS_URL}, {'path': ME_URL})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        failed, me = res.json()['responses']
+        self.assertEqual(failed['status'], 500)
+        self.assertEqual(me['status'], status.HTTP_200_OK)
+
+    def test_idempotency_key_not_shared(self):
+        """Test the batch's idempotency key is not given to its writes"""
+        payload = {'title': 'Stew', 'time_minutes': 30, 'price': '5.00'}
+
+        res = self.client.post(
+            BATCH_URL, {'requests': [
+                {'method': 'POST', 'path': RECIPES_URL, 'body': payload},
+                {'method': 'POST', 'path': RECIPES_URL,
+                 'body': {**payload, 'title': 'Pie'}},
+            ]}, format='json', HTTP_IDEMPOTENCY_KEY='batch-1')
+
+        self.assertEqual(
+            [r['status'] for r in res.json()['responses']],
+            [status.HTTP_201_CREATED] * 2)
+        self.assertEqual(Recipe.objects.count(), 3)
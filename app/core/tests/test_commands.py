@@ -4,30 +4,99 @@ Test custom management commands.
 
 from unittest.mock import patch
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import SimpleTestCase
 from psycopg2 import OperationalError as Psycopg2Error
 
+from core.management.commands import profile_startup
 
-@patch('core.management.commands.wait_for_db.Command.check')
+
+@patch('core.management.commands.wait_for_db.Command.probe')
 class CommandTests(SimpleTestCase):
     """Tests for 'wait_for_db' command."""
 
-    def test_wait_for_db_ready(self, patched_check):
+    def test_wait_for_db_ready(self, patched_probe):
         """Test waiting for database if database is available."""
-        patched_check.return_value = True
+        patched_probe.return_value = True
 
         call_command('wait_for_db')
 
-        patched_check.assert_called_once_with(databases=['default'])
+        patched_probe.assert_called_once_with('default', False)
 
     @patch('time.sleep')
-    def test_wait_for_db_delay(self, patched_sleep, patched_check):
+    def test_wait_for_db_delay(self, patched_sleep, patched_probe):
         """Test waiting for database when getting OperationalError."""
 
-        patched_check.side_effect = [Psycopg2Error] * 2 + \
+        patched_probe.side_effect = [Psycopg2Error] * 2 + \
                                     [OperationalError] * 3 + [True]
 
         call_command('wait_for_db')
-        self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=['default'])
+        self.assertEqual(patched_probe.call_count, 6)
+        self.assertEqual(patched_sleep.call_count, 5)
+
+    @patch('time.sleep')
+    def test_wait_for_db_backoff(self, patched_sleep, patched_probe):
+        """Test the delay between attempts grows up to --max-delay."""
+        patched_probe.side_effect = [OperationalError] * 8 + [True]
+
+        with patch('random.uniform', side_effect=lambda low, high: high):
+            call_command('wait_for_db', max_delay=2)
+
+        delays = [call.args[0] for call in patched_sleep.call_args_list]
+        self.assertEqual(delays, [0.1, 0.2, 0.4, 0.8, 1.6, 2, 2, 2])
+
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_probe):
+        """Test the command fails once the timeout is reached."""
+        patched_probe.side_effect = OperationalError
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', timeout=0)
+
+        patched_sleep.assert_not_called()
+
+    @patch('time.sleep')
+    def test_wait_for_migrations(self, patched_sleep, patched_probe):
+        """Test --migrations waits until the probe reports them applied."""
+        patched_probe.side_effect = [False, True]
+
+        call_command('wait_for_db', migrations=True)
+
+        patched_probe.assert_called_with('default', True)
+        self.assertEqual(patched_sleep.call_count, 1)
+
+
+class ProfileStartupTests(SimpleTestCase):
+    """Tests for the 'profile_startup' command."""
+
+    OUTPUT = (
+        'import time: self [us] | cumulative | imported package\n'
+        'import time:       100 |        100 |     yaml\n'
+        'import time:        10 |        110 |   rest_framework.compat\n'
+        'import time:         5 |        115 | rest_framework\n'
+        'import time:        20 |         20 |   PIL\n'
+        'import time:         3 |         23 | recipe.images\n'
+        'import time:        50 |         50 | django.db\n'
+    )
+
+    def test_parse_import_times(self):
+        """Test -X importtime output is parsed."""
+        imports = profile_startup.parse_import_times(self.OUTPUT)
+
+        self.assertEqual(len(imports), 6)
+        self.assertEqual(imports[0], ('yaml', 100, 100, 2))
+        self.assertEqual(imports[2], ('rest_framework', 5, 115, 0))
+
+    def test_charge_to_apps(self):
+        """Test apps are charged for the modules they import."""
+        imports = profile_startup.parse_import_times(self.OUTPUT)
+
+        totals = profile_startup.charge_to_apps(
+            imports, ['rest_framework', 'recipe'])
+
+        self.assertEqual(totals, {
+            'rest_framework': 115,
+            'recipe': 23,
+            '(django startup)': 50,
+        })
@@ -0,0 +1,143 @@
+"""
+Tests for deleting user accounts in the background.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import archive, deletion, jobs, tokens
+from core.models import ArchivedRecipe, Ingredient, Job, Recipe, Tag
+
+ME_URL = reverse('user:me')
+
+
+def create_data(user, recipes=3):
+    """Create recipes with tags and ingredients for user"""
+    tag = Tag.objects.create(user=user, name='Vegan')
+    ingredient = Ingredient.objects.create(user=user, name='Salt')
+    for i in range(recipes):
+        recipe = Recipe.objects.create(
+            user=user, title=f'Recipe {i}', time_minutes=5,
+            price=Decimal('1.00'))
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+
+
+def run_jobs():
+    """Run every queued job and return how many ran"""
+    ran = 0
+    while True:
+        claimed = jobs.claim('test')
+        if not claimed:
+            return ran
+        for job in claimed:
+            jobs.run(job)
+            ran += 1
+
+
+@override_settings(USER_PURGE_BATCH_SIZE=2, USER_PURGE_BATCHES_PER_JOB=3,
+                   USER_PURGE_PAUSE=0)
+class DeletionTests(TestCase):
+    """Tests for scheduling and purging deleted accounts."""
+
+    def setUp(self):
+        tokens.revocations.clear()
+        self.addCleanup(tokens.revocations.clear)
+        self.user = get_user_model().objects.create_user(
+            email='heavy@example.com', password='test123password')
+        self.other = get_user_model().objects.create_user(
+            email='other@example.com', password='test123password')
+        create_data(self.user)
+        create_data(self.other, recipes=1)
+
+    def test_schedule(self):
+        """Test the account is disabled at once and a purge queued."""
+        token, _ = tokens.issue(self.user)
+        Token.objects.create(user=self.user)
+
+        job = deletion.schedule(self.user)
+
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify(token)
+        self.assertEqual(job.task, 'core.tasks.purge_user')
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+
+    def test_purge_in_batches(self):
+        """Test rows are deleted over several jobs that report progress."""
+        deletion.schedule(self.user)
+
+        ran = run_jobs()
+
+        self.assertGreater(ran, 1)
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists())
+        for model in (Recipe, Tag, Ingredient):
+            self.assertFalse(model.objects.filter(user=self.user).exists())
+            self.assertTrue(model.objects.filter(user=self.other).exists())
+        last = Job.objects.filter(
+            task='core.tasks.purge_user').order_by('-id').first()
+        self.assertEqual(last.status, Job.DONE)
+        # Progress is carried over from the jobs before it.
+        self.assertEqual(last.payload['deleted'], {
+            'recipe_tags': 3, 'recipe_ingredients': 3, 'recipes': 3})
+
+    def test_purge_archived_recipes(self):
+        """Test archived recipes are purged along with the active ones."""
+        archive.archive(Recipe.objects.filter(user=self.user).first())
+        archive.move_batch(timezone.now(), 1)
+        archive.archive(Recipe.objects.filter(user=self.user).first())
+
+        deletion.schedule(self.user)
+        run_jobs()
+
+        self.assertFalse(
+            Recipe.all_objects.filter(user_id=self.user.pk).exists())
+        self.assertFalse(
+            ArchivedRecipe.objects.filter(user_id=self.user.pk).exists())
+
+    def test_reactivated_user_kept(self):
+        """Test the purge stops if the account is reactivated."""
+        deletion.schedule(self.user)
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_active=True)
+
+        run_jobs()
+
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+
+    def test_delete_account(self):
+        """Test users can delete their own account."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertTrue(Job.objects.filter(
+            task='core.tasks.purge_user',
+            payload__user_id=self.user.pk).exists())
+
+    def test_admin_delete(self):
+        """Test deleting a user in the admin only schedules the purge."""
+        admin_user = get_user_model().objects.create_superuser(
+            'admin@example.com', 'test123password')
+        self.client.force_login(admin_user)
+        url = reverse('admin:core_user_delete', args=[self.user.pk])
+
+        res = self.client.post(url, {'post': 'yes'})
+
+        self.assertEqual(res.status_code, 302)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
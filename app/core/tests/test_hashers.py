@@ -0,0 +1,181 @@
+"""
+Tests for password hashing.
+"""
+import multiprocessing
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import hashers
+
+PBKDF2_FIRST = [
+    'core.hashers.PBKDF2PasswordHasher',
+    'core.hashers.Argon2PasswordHasher',
+]
+ARGON2_FIRST = PBKDF2_FIRST[::-1]
+
+
+@override_settings(PASSWORD_HASHERS=PBKDF2_FIRST,
+                   PASSWORD_HASH_ITERATIONS=1000)
+class VerifyPasswordTests(SimpleTestCase):
+    """Tests for verify_password."""
+
+    def setUp(self):
+        self.encoded = make_password('secret')
+
+    def test_iterations_from_settings(self):
+        """Test new hashes use PASSWORD_HASH_ITERATIONS."""
+        self.assertTrue(self.encoded.startswith('pbkdf2_sha256$1000$'))
+
+    def test_correct_password(self):
+        """Test a current hash needs no update."""
+        self.assertEqual(
+            hashers.verify_password('secret', self.encoded), (True, False))
+
+    def test_wrong_password(self):
+        """Test a wrong password is rejected and not upgraded."""
+        with self.settings(PASSWORD_HASH_ITERATIONS=2000):
+            result = hashers.verify_password('wrong', self.encoded)
+
+        self.assertEqual(result, (False, False))
+
+    def test_raised_cost_needs_update(self):
+        """Test raising the cost marks old hashes for an upgrade."""
+        with self.settings(PASSWORD_HASH_ITERATIONS=2000):
+            result = hashers.verify_password('secret', self.encoded)
+
+        self.assertEqual(result, (True, True))
+
+    def test_unusable_password(self):
+        """Test unusable passwords never verify."""
+        self.assertEqual(
+            hashers.verify_password('secret', make_password(None)),
+            (False, False))
+
+
+def hold_slot(started, seconds):
+    """Hash in this process, holding a slot for seconds"""
+    def hash_password():
+        started.set()
+        time.sleep(seconds)
+
+    hashers.run(hash_password)
+
+
+class HashingLimitTests(SimpleTestCase):
+    """Tests for the limit on concurrent hashing."""
+
+    def setUp(self):
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        settings = override_settings(PASSWORD_HASH_LOCK_DIR=lock_dir.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def run_concurrently(self, count):
+        """Run count hashes at once; return how many overlapped at most"""
+        lock = threading.Lock()
+        running = [0]
+        overlap = []
+
+        def hash_password():
+            with lock:
+                running[0] += 1
+                overlap.append(running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+
+        threads = [
+            threading.Thread(target=hashers.run, args=(hash_password,))
+            for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return max(overlap)
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=2)
+    def test_concurrency_limited(self):
+        """Test no more than PASSWORD_HASH_CONCURRENCY hashes run at once."""
+        self.assertEqual(self.run_concurrently(4), 2)
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=0)
+    def test_unlimited(self):
+        """Test hashes are not limited when the limit is 0."""
+        self.assertEqual(self.run_concurrently(3), 3)
+
+    @override_settings(PASSWORD_HASH_CONCURRENCY=1)
+    def test_limit_shared_between_processes(self):
+        """Test a hash waits for one running in another worker process."""
+        if multiprocessing.current_process().daemon:
+            self.skipTest('parallel test processes cannot start workers')
+        context = multiprocessing.get_context('fork')
+        started = context.Event()
+        worker = context.Process(target=hold_slot, args=(started, 0.3))
+        worker.start()
+        self.addCleanup(worker.join)
+        self.assertTrue(started.wait(5))
+
+        waited = time.monotonic()
+        hashers.run(time.sleep, 0)
+        waited = time.monotonic() - waited
+
+        self.assertGreater(waited, 0.1)
+
+
+@override_settings(PASSWORD_HASHERS=PBKDF2_FIRST,
+                   PASSWORD_HASH_ITERATIONS=1000)
+class PasswordPoolBackendTests(TestCase):
+    """Tests for PasswordPoolBackend."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='test123password')
+
+    def login(self, password='test123password'):
+        """Authenticate the test user"""
+        return authenticate(username='user@example.com', password=password)
+
+    def test_login(self):
+        """Test the right password logs in."""
+        self.assertEqual(self.login(), self.user)
+
+    def test_wrong_password(self):
+        """Test a wrong password does not log in."""
+        self.assertIsNone(self.login('wrong'))
+
+    def test_unknown_user(self):
+        """Test an unknown user does not log in."""
+        self.assertIsNone(
+            authenticate(username='nobody@example.com', password='x'))
+
+    def test_inactive_user(self):
+        """Test an inactive user does not log in."""
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(self.login())
+
+    def test_rehash_on_login(self):
+        """Test a raised cost upgrades the hash on login."""
+        with self.settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.login()
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertTrue(self.user.check_password('test123password'))
+
+    @override_settings(PASSWORD_HASHERS=ARGON2_FIRST, ARGON2_MEMORY_COST=1024,
+                       ARGON2_PARALLELISM=1)
+    def test_upgrade_to_argon2(self):
+        """Test existing hashes move to the preferred hasher on login."""
+        self.login()
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('argon2$'))
+        self.assertEqual(self.login(), self.user)
@@ -0,0 +1,226 @@
+"""
+Tests for idempotency keys.
+"""
+import io
+import tempfile
+import threading
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import idempotency
+from core.models import Job, OutboxEvent, Recipe
+from recipe.tasks import make_thumbnails
+from recipe.views import RecipeViewSet
+
+RECIPES_URL = reverse('recipe:recipe-list')
+PAYLOAD = {
+    'title': 'Soup', 'time_minutes': 5, 'price': '2.50',
+    'tags': [{'name': 'Lunch'}],
+}
+
+
+class IdempotencyTests(TestCase):
+    """Tests for replaying writes sent with an Idempotency-Key."""
+
+    def setUp(self):
+        self.cache = caches[settings.IDEMPOTENCY_CACHE]
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='test123password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, payload=PAYLOAD, key='abc'):
+        """Create a recipe with an idempotency key"""
+        return self.client.post(
+            RECIPES_URL, payload, format='json',
+            HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_repeat_replayed(self):
+        """Test a repeated create returns the first response."""
+        first = self.post()
+        second = self.post()
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second[idempotency.REPLAYED_HEADER], 'true')
+        self.assertFalse(first.has_header(idempotency.REPLAYED_HEADER))
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+    def test_without_key(self):
+        """Test requests without a key all run."""
+        self.client.post(RECIPES_URL, PAYLOAD, format='json')
+        self.client.post(RECIPES_URL, PAYLOAD, format='json')
+
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_key_per_user(self):
+        """Test users do not share keys."""
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='test123password')
+        self.post()
+        self.client.force_authenticate(other)
+
+        res = self.post()
+
+        self.assertFalse(res.has_header(idempotency.REPLAYED_HEADER))
+        self.assertEqual(Recipe.objects.filter(user=other).count(), 1)
+
+    def test_key_reused(self):
+        """Test a key reused for another request is refused."""
+        self.post()
+
+        res = self.post({**PAYLOAD, 'title': 'Stew'})
+
+        self.assertEqual(
+            res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_in_progress(self):
+        """Test a repeat of a request still running is refused."""
+        self.client.post(RECIPES_URL, PAYLOAD, format='json')
+        lock_key = f'{idempotency.cache_key(self.user.pk, "abc")}:lock'
+        self.cache.add(lock_key, True)
+
+        res = self.post()
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_rejected_not_stored(self):
+        """Test a corrected retry of a rejected request runs."""
+        first = self.post({'title': 'Soup'})
+        second = self.post()
+
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+
+    def test_update_replayed(self):
+        """Test a repeated update returns the first response."""
+        recipe_id = self.post().json()['id']
+        url = reverse('recipe:recipe-detail', args=[recipe_id])
+
+        first = self.client.patch(
+            url, {'title': 'Stew'}, format='json', HTTP_IDEMPOTENCY_KEY='u')
+        Recipe.objects.filter(pk=recipe_id).update(title='Changed')
+        second = self.client.patch(
+            url, {'title': 'Stew'}, format='json', HTTP_IDEMPOTENCY_KEY='u')
+
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(Recipe.objects.get().title, 'Changed')
+
+    def test_key_too_long(self):
+        """Test an overlong key is rejected."""
+        res = self.post(key='k' * (idempotency.MAX_KEY_LENGTH + 1))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_multipart_replayed(self):
+        """Test a repeated create sent with files is replayed."""
+        def post():
+            payload = {
+                'title': 'Soup', 'time_minutes': 5, 'price': '2.50',
+                'note': SimpleUploadedFile('note.txt', b'Serve hot'),
+            }
+            return self.client.post(
+                RECIPES_URL, payload, format='multipart',
+                HTTP_IDEMPOTENCY_KEY='form')
+
+        first, second = post(), post()
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second[idempotency.REPLAYED_HEADER], 'true')
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_image_upload_replayed(self):
+        """Test a retried image upload is replayed, not stored again."""
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        recipe_id = self.post().json()['id']
+        url = reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+        def upload(color):
+            image = io.BytesIO()
+            Image.new('RGB', (20, 20), color).save(image, 'PNG')
+            return self.client.post(
+                url, {'image': SimpleUploadedFile('a.png', image.getvalue())},
+                format='multipart', HTTP_IDEMPOTENCY_KEY='image')
+
+        with override_settings(MEDIA_ROOT=media_root.name):
+            first, second = upload('red'), upload('red')
+            other = upload('blue')
+
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second[idempotency.REPLAYED_HEADER], 'true')
+        self.assertEqual(
+            other.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(
+            Job.objects.filter(task=make_thumbnails.task_name).count(), 1)
+
+
+class ConcurrentRepeatTests(TransactionTestCase):
+    """Tests for repeats sent while the first request still runs."""
+
+    def setUp(self):
+        self.cache = caches[settings.IDEMPOTENCY_CACHE]
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='test123password')
+
+    def post(self):
+        """Create a recipe with an idempotency key"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.post(
+            RECIPES_URL, PAYLOAD, format='json', HTTP_IDEMPOTENCY_KEY='abc')
+
+    def test_repeat_locked_out(self):
+        """Test the shared cache locks a repeat out on another thread."""
+        self.assertIsInstance(self.cache, DatabaseCache)
+        started, release = threading.Event(), threading.Event()
+        perform_create = RecipeViewSet.perform_create
+        responses = []
+
+        def slow_create(view, serializer):
+            started.set()
+            release.wait(5)
+            perform_create(view, serializer)
+
+        def first():
+            try:
+                responses.append(self.post())
+            finally:
+                connection.close()
+
+        with patch.object(RecipeViewSet, 'perform_create', slow_create):
+            thread = threading.Thread(target=first)
+            thread.start()
+            try:
+                self.assertTrue(started.wait(5))
+                repeat = self.post()
+            finally:
+                release.set()
+                thread.join()
+        replayed = self.post()
+
+        self.assertEqual(repeat.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(responses[0].status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replayed.json(), responses[0].json())
+        self.assertEqual(Recipe.objects.count(), 1)
@@ -0,0 +1,186 @@
+"""
+Tests for the background job queue.
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import Job
+
+JOB_METRICS_URL = reverse('job-metrics')
+
+calls = []
+
+
+@jobs.task
+def record(value):
+    """Task recording its argument"""
+    calls.append(value)
+
+
+@jobs.task
+def fail():
+    """Task that always fails"""
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+    """Tests for queueing and running jobs."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_unknown_task(self):
+        """Test only registered tasks can be queued."""
+        with self.assertRaises(jobs.UnknownTask):
+            jobs.enqueue(print)
+
+    def test_claim(self):
+        """Test due jobs are claimed in priority order."""
+        low = jobs.enqueue(record, {'value': 1})
+        high = jobs.enqueue(record, {'value': 2}, priority=5)
+        jobs.enqueue(record, {'value': 3}, delay=60)
+
+        claimed = jobs.claim('worker-1', limit=5)
+
+        self.assertEqual([job.id for job in claimed], [high.id, low.id])
+        self.assertEqual(claimed[0].status, Job.RUNNING)
+        self.assertEqual(claimed[0].locked_by, 'worker-1')
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertEqual(jobs.claim('worker-2', limit=5), [])
+
+    def test_run(self):
+        """Test a successful job is marked done."""
+        jobs.enqueue(record, {'value': 'x'})
+        job, = jobs.claim('worker')
+
+        self.assertTrue(jobs.run(job))
+
+        job.refresh_from_db()
+        self.assertEqual(calls, ['x'])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_retry_with_backoff(self):
+        """Test a failed job is retried later."""
+        jobs.enqueue(fail)
+        job, = jobs.claim('worker')
+
+        self.assertFalse(jobs.run(job))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+
+    def test_fail_after_max_attempts(self):
+        """Test a job fails once it has used all its attempts."""
+        jobs.enqueue(fail, max_attempts=1)
+        job, = jobs.claim('worker')
+
+        jobs.run(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_backoff_grows(self):
+        """Test the retry delay doubles and is capped."""
+        with patch('core.jobs.random.uniform', return_value=1):
+            delays = [jobs.backoff(attempt) for attempt in (1, 2, 3, 20)]
+
+        self.assertEqual(delays, [10, 20, 40, 3600])
+
+    def test_requeue_stale(self):
+        """Test jobs of a worker that went away are queued again."""
+        jobs.enqueue(record, {'value': 1})
+        job, = jobs.claim('worker')
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.claim('other')[0].id, job.id)
+
+    def test_heartbeat_keeps_lease(self):
+        """Test a job whose lease is renewed is not handed out again."""
+        jobs.enqueue(record, {'value': 1})
+        job, = jobs.claim('worker')
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.heartbeat('worker', [job.pk]), 1)
+        self.assertEqual(jobs.heartbeat('other', [job.pk]), 0)
+        self.assertEqual(jobs.requeue_stale(), 0)
+
+    def test_stale_job_uses_attempt(self):
+        """Test a stale job that used all its attempts fails."""
+        jobs.enqueue(record, {'value': 1}, max_attempts=1)
+        job, = jobs.claim('worker')
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(jobs.requeue_stale(), 0)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.locked_by, '')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_lease_lost(self):
+        """Test a worker that lost its lease cannot finish the job."""
+        jobs.enqueue(record, {'value': 1})
+        stale, = jobs.claim('worker')
+        Job.objects.filter(pk=stale.pk).update(
+            locked_at=timezone.now() - timedelta(hours=1))
+        jobs.requeue_stale()
+        job, = jobs.claim('other')
+
+        with self.assertRaises(jobs.LeaseLost):
+            jobs.run(stale)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertEqual(job.locked_by, 'other')
+        self.assertTrue(jobs.run(job))
+
+    def test_metrics(self):
+        """Test the queue metrics are reported to staff."""
+        jobs.enqueue(record, {'value': 1})
+        admin = get_user_model().objects.create_superuser(
+            'admin@example.com', 'test123password')
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        res = client.get(JOB_METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['counts']['queued'], 1)
+
+
+class RunWorkerTests(TransactionTestCase):
+    """Tests for the run_worker command."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_queued_jobs(self):
+        """Test the worker runs every due job and exits with --once."""
+        for value in range(5):
+            jobs.enqueue(record, {'value': value})
+        jobs.enqueue(fail, max_attempts=1)
+
+        out = StringIO()
+        call_command('run_worker', concurrency=1, once=True, stdout=out)
+
+        self.assertEqual(sorted(calls), list(range(5)))
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 5)
+        self.assertEqual(Job.objects.filter(status=Job.FAILED).count(), 1)
+        self.assertIn('5 done, 1 failed', out.getvalue())
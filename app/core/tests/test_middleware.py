@@ -0,0 +1,242 @@
+"""
+Tests for the application middleware.
+"""
+import asyncio
+import gzip
+import time
+from unittest import skipIf
+
+from unittest.mock import patch
+
+from django.db.utils import OperationalError
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (AsyncClient, RequestFactory, SimpleTestCase,
+                         TestCase, override_settings)
+from django.urls import path
+
+from core import middleware
+
+CONTENT = b'{"title": "Sample recipe", "description": "Tasty"}' * 100
+SLOW_VIEW_SECONDS = 0.3
+
+
+def get_response(request):
+    """Return a large response"""
+    return HttpResponse(CONTENT, content_type='application/json')
+
+
+def get_streaming_response(request):
+    """Return a streaming response"""
+    return StreamingHttpResponse(
+        (CONTENT for _ in range(3)), content_type='application/json')
+
+
+async def slow_view(request):
+    """Answer after a pause that does not hold a thread"""
+    await asyncio.sleep(SLOW_VIEW_SECONDS)
+    return HttpResponse('ok')
+
+
+urlpatterns = [path('api/slow/', slow_view)]
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Tests for CompressionMiddleware."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def request(self, accept_encoding, view=get_response):
+        """Run a request through the middleware."""
+        request = self.factory.get(
+            '/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return middleware.CompressionMiddleware(view)(request)
+
+    def test_gzip(self):
+        """Test gzip is used when it is the only accepted encoding."""
+        res = self.request('gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), CONTENT)
+        self.assertEqual(res['Content-Length'], str(len(res.content)))
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_no_accepted_encoding(self):
+        """Test the response is untouched without Accept-Encoding."""
+        res = self.request('')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, CONTENT)
+
+    def test_refused_encoding(self):
+        """Test an encoding with q=0 is not used."""
+        res = self.request('gzip;q=0, identity')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    @override_settings(COMPRESSION_MIN_SIZE=len(CONTENT) + 1)
+    def test_small_response_not_compressed(self):
+        """Test responses below the minimum size are not compressed."""
+        res = self.request('gzip')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, CONTENT)
+
+    def test_images_not_compressed(self):
+        """Test media that is compressed already is left alone."""
+        res = self.request(
+            'gzip', lambda request: HttpResponse(
+                CONTENT, content_type='image/jpeg'))
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_streaming_gzip(self):
+        """Test streaming responses are compressed incrementally."""
+        res = self.request('gzip', get_streaming_response)
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertFalse(res.has_header('Content-Length'))
+        self.assertEqual(
+            gzip.decompress(b''.join(res.streaming_content)), CONTENT * 3)
+
+    @skipIf(middleware.brotli is None, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        """Test brotli is preferred over gzip."""
+        res = self.request('gzip, deflate, br')
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(middleware.brotli.decompress(res.content), CONTENT)
+
+    @skipIf(middleware.brotli is None, 'brotli is not installed')
+    def test_streaming_brotli(self):
+        """Test streaming responses with brotli."""
+        res = self.request('br', get_streaming_response)
+
+        self.assertEqual(
+            middleware.brotli.decompress(b''.join(res.streaming_content)),
+            CONTENT * 3,
+        )
+
+    @skipIf(middleware.zstandard is None, 'zstandard is not installed')
+    def test_streaming_zstd(self):
+        """Test streaming responses with zstd."""
+        res = self.request('zstd', get_streaming_response)
+
+        self.assertEqual(res['Content-Encoding'], 'zstd')
+        decompressor = middleware.zstandard.ZstdDecompressor()
+        reader = decompressor.stream_reader(b''.join(res.streaming_content))
+        self.assertEqual(reader.read(), CONTENT * 3)
+
+
+class HealthCheckMiddlewareTests(TestCase):
+    """Tests for the health check probes."""
+
+    def test_healthz(self):
+        """Test the liveness probe answers for any host."""
+        res = self.client.get('/healthz', HTTP_HOST='10.0.0.7')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {'status': 'ok'})
+        self.assertFalse(res.cookies)
+
+    def test_readyz(self):
+        """Test the readiness probe checks the database."""
+        res = self.client.get('/readyz/')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {'database': 'ok', 'migrations': 'ok'})
+
+    def test_readyz_database_down(self):
+        """Test the readiness probe fails when the database is down."""
+        with patch('core.db.ping', side_effect=OperationalError):
+            res = self.client.get('/readyz')
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()['database'], 'unavailable')
+
+    def test_readyz_migrations_pending(self):
+        """Test the readiness probe fails until migrations are applied."""
+        with patch('core.db.pending_migrations', return_value=['0001']):
+            res = self.client.get('/readyz')
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()['migrations'], 'pending')
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncMiddlewareTests(SimpleTestCase):
+    """Tests for serving requests through the middleware under ASGI."""
+
+    async def test_requests_run_concurrently(self):
+        """Test the middleware chain does not serialize async requests."""
+        client = AsyncClient()
+        started = time.monotonic()
+
+        responses = await asyncio.gather(
+            *(client.get('/api/slow/') for _ in range(4)))
+
+        elapsed = time.monotonic() - started
+        self.assertEqual([res.status_code for res in responses], [200] * 4)
+        self.assertLess(elapsed, 2 * SLOW_VIEW_SECONDS)
+
+    async def test_probe(self):
+        """Test the probes answer under ASGI."""
+        res = await AsyncClient().get('/healthz')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json(), {'status': 'ok'})
+
+
+class BrowserOnlyMiddlewareTests(TestCase):
+    """Tests for skipping browser middleware on token routes."""
+
+    def test_api_skips_sessions(self):
+        """Test API requests run without sessions, CSRF or messages."""
+        seen = {}
+
+        def view(request):
+            seen.update(vars(request))
+            return HttpResponse()
+
+        handler = view
+        for cls in (middleware.MessageMiddleware,
+                    middleware.AuthenticationMiddleware,
+                    middleware.CsrfViewMiddleware,
+                    middleware.SessionMiddleware):
+            handler = cls(handler)
+        request = RequestFactory().get('/api/recipe/recipes/')
+
+        handler(request)
+
+        for attribute in ('session', 'user', '_messages',
+                          'csrf_processing_done'):
+            self.assertNotIn(attribute, seen)
+
+    def test_admin_keeps_sessions(self):
+        """Test browser routes still get sessions and CSRF cookies."""
+        res = self.client.get('/admin/login/')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('csrftoken', res.cookies)
+        self.assertTrue(hasattr(res.wsgi_request, 'session'))
+
+    def test_api_request(self):
+        """Test an API request sets no cookies and has no session."""
+        res = self.client.get('/api/recipe/recipes/')
+
+        self.assertEqual(res.status_code, 401)
+        self.assertFalse(res.cookies)
+        self.assertFalse(hasattr(res.wsgi_request, 'session'))
+
+    def test_csrf_view_check_skipped(self):
+        """Test CSRF checks are skipped for token routes only."""
+        csrf = middleware.CsrfViewMiddleware(get_response)
+        factory = RequestFactory()
+
+        api = csrf.process_view(
+            factory.post('/api/user/create/'), get_response, (), {})
+        admin = csrf.process_view(
+            factory.post('/admin/login/'), get_response, (), {})
+
+        self.assertIsNone(api)
+        self.assertEqual(admin.status_code, 403)
@@ -91,3 +91,32 @@ class ModelTest(TestCase):
         )
 
         self.assertEqual(str(ingredient), ingredient.name)
+
+    def test_recipe_relations_have_user(self):
+        """Test tags and ingredients added to a recipe copy its user"""
+        user = create_user()
+        recipe = models.Recipe.objects.create(
+            user=user, title='Soup', time_minutes=5, price=Decimal('2.50'))
+
+        recipe.tags.add(models.Tag.objects.create(user=user, name='Lunch'))
+        recipe.ingredients.create(user=user, name='Salt')
+
+        self.assertEqual(models.RecipeTag.objects.get().user, user)
+        self.assertEqual(models.RecipeIngredient.objects.get().user, user)
+
+    def test_recipe_user_changed(self):
+        """Test the join rows follow a recipe to its new user"""
+        user = create_user()
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'test123password')
+        recipe = models.Recipe.objects.create(
+            user=user, title='Soup', time_minutes=5, price=Decimal('2.50'))
+        recipe.tags.add(models.Tag.objects.create(user=user, name='Lunch'))
+        recipe = models.Recipe.objects.get(pk=recipe.pk)
+
+        recipe.user = other
+        recipe.save()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.user, other)
+        self.assertEqual(models.RecipeTag.objects.get().user, other)
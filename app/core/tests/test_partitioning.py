@@ -0,0 +1,251 @@
+"""
+Tests for partitioning the recipe tables.
+"""
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import skipIf, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from core import partitioning
+from core.models import Ingredient, Recipe, RecipeTag, Tag
+
+
+def create_recipe(user, title='Soup'):
+    """Create and return a recipe"""
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=5, price=Decimal('2.50'))
+
+
+class SQLTests(SimpleTestCase):
+    """Tests for the statements converting the tables."""
+
+    def test_create_sql(self):
+        """Test the copy is hash partitioned with its indexes."""
+        statements = partitioning.create_sql(
+            RecipeTag, 4, 'core_recipe_tag_pkey', {
+                'core_recipe_tag_recipe_id_tag_id_uniq':
+                    'CREATE UNIQUE INDEX core_recipe_tag_recipe_id_tag_id_uniq'
+                    ' ON public.core_recipe_tags USING btree '
+                    '(recipe_id, tag_id)',
+            })
+
+        self.assertIn(
+            'PARTITION BY HASH (user_id)', statements[0])
+        self.assertIn(
+            'CONSTRAINT core_recipe_tag_pkey_new PRIMARY KEY (user_id, id)',
+            statements[1])
+        self.assertIn(
+            'CREATE TABLE core_recipe_tags_p3 PARTITION OF '
+            'core_recipe_tags_partitioned FOR VALUES WITH '
+            '(MODULUS 4, REMAINDER 3)', statements)
+        self.assertIn(
+            'CREATE UNIQUE INDEX core_recipe_tag_recipe_id_tag_id_uniq_new '
+            'ON core_recipe_tags_partitioned USING btree '
+            '(user_id, recipe_id, tag_id)', statements)
+        self.assertFalse(
+            [sql for sql in statements if 'FOREIGN KEY' in sql])
+
+    def test_foreign_key_sql(self):
+        """Test foreign keys are added NOT VALID to each partition."""
+        keys = partitioning.foreign_key_sql(RecipeTag, 2)
+
+        self.assertEqual(len(keys), 6)
+        self.assertIn((
+            'core_recipe_tags_p1', 'core_recipe_tags_p1_recipe_id_fk',
+            'ALTER TABLE core_recipe_tags_p1 ADD CONSTRAINT '
+            'core_recipe_tags_p1_recipe_id_fk FOREIGN KEY '
+            '(user_id, recipe_id) REFERENCES core_recipe_partitioned '
+            '(user_id, id) ON UPDATE CASCADE DEFERRABLE INITIALLY DEFERRED '
+            'NOT VALID'), keys)
+
+    def test_rewrite_partial_index(self):
+        """Test a partial index keeps its condition."""
+        name, definition = partitioning.rewrite_index(
+            'CREATE INDEX core_recipe_active_idx ON public.core_recipe '
+            "USING btree (user_id, id DESC) WHERE ((status)::text = "
+            "'active'::text)", 'core_recipe')
+
+        self.assertEqual(name, 'core_recipe_active_idx_new')
+        self.assertEqual(
+            definition,
+            'CREATE INDEX core_recipe_active_idx_new ON '
+            'core_recipe_partitioned USING btree (user_id, id DESC) '
+            "WHERE ((status)::text = 'active'::text)")
+
+    def test_trigger_sql(self):
+        """Test changes are copied with an upsert keyed on the user."""
+        function, trigger = partitioning.trigger_sql(Recipe)
+
+        self.assertIn('ON CONFLICT (user_id, id) DO UPDATE SET', function)
+        self.assertIn('"title" = EXCLUDED."title"', function)
+        self.assertNotIn('"user_id" = EXCLUDED', function)
+        self.assertIn('AFTER INSERT OR UPDATE OR DELETE ON core_recipe ',
+                      trigger)
+
+    def test_swap_sql(self):
+        """Test the copy and its indexes take the original names."""
+        statements = partitioning.swap_sql(
+            Recipe, ['core_recipe_pkey'], 'public.core_recipe_id_seq')
+
+        self.assertEqual(statements[2:], [
+            'ALTER TABLE core_recipe RENAME TO core_recipe_unpartitioned',
+            'ALTER TABLE core_recipe_partitioned RENAME TO core_recipe',
+            'ALTER SEQUENCE public.core_recipe_id_seq OWNED BY '
+            'core_recipe.id',
+            'ALTER INDEX core_recipe_pkey RENAME TO core_recipe_pkey_old',
+            'ALTER INDEX core_recipe_pkey_new RENAME TO core_recipe_pkey',
+            'ALTER INDEX core_recipe_id_new RENAME TO core_recipe_id',
+        ])
+
+    def test_scanned_partitions(self):
+        """Test the partitions read are found anywhere in a plan."""
+        plan = [{'Plan': {'Node Type': 'Nested Loop', 'Plans': [
+            {'Node Type': 'Index Scan', 'Relation Name': 'core_recipe_p3'},
+            {'Node Type': 'Append', 'Plans': [
+                {'Relation Name': 'core_recipe_tags_p1'},
+                {'Relation Name': 'core_recipe_tags_p2'},
+            ]},
+        ]}}]
+
+        self.assertEqual(
+            partitioning.scanned_partitions(plan, 'core_recipe'),
+            {'core_recipe_p3'})
+        self.assertEqual(
+            partitioning.scanned_partitions(plan, 'core_recipe_tags'),
+            {'core_recipe_tags_p1', 'core_recipe_tags_p2'})
+
+
+class ViewStatementsTests(TestCase):
+    """Tests for the statements the recipe views run."""
+    databases = '__all__'
+
+    def test_filtered_by_user(self):
+        """Test every statement reading the recipe tables has the user."""
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'test123password')
+        Recipe.objects.create(
+            user=user, title='Soup', time_minutes=5, price=Decimal('2.50'))
+
+        statements = partitioning.view_statements(user)
+
+        checked = [
+            sql for _, sql in statements
+            if partitioning.reads_partitioned_tables(sql)]
+        self.assertGreater(len(checked), 5)
+        for sql in checked:
+            self.assertIn('."user_id"', sql)
+        self.assertEqual(Recipe.all_objects.count(), 1)
+
+    @skipIf(connection.vendor == 'postgresql', 'Runs on PostgreSQL.')
+    def test_requires_postgresql(self):
+        """Test the command refuses to run on other databases."""
+        with self.assertRaisesMessage(CommandError, 'PostgreSQL'):
+            call_command('partition_recipes', 'check')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Needs PostgreSQL.')
+class ConversionTests(TransactionTestCase):
+    """Tests for converting the tables while they are written to."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'test123password')
+        self.tag = Tag.objects.create(user=self.user, name='Lunch')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Salt')
+        self.recipes = []
+        for i in range(20):
+            recipe = create_recipe(self.user, f'Recipe {i}')
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(self.ingredient)
+            self.recipes.append(recipe)
+
+    def tearDown(self):
+        """Put the original tables back"""
+        with connection.cursor() as cursor:
+            swapped = partitioning.table_indexes(
+                cursor, 'core_recipe_unpartitioned')
+            tables = [model._meta.db_table for model in partitioning.MODELS]
+            for table in tables:
+                if not swapped:
+                    cursor.execute(
+                        f'DROP TABLE IF EXISTS '
+                        f'{partitioning.shadow(table)} CASCADE')
+                    cursor.execute(
+                        f'DROP FUNCTION IF EXISTS '
+                        f'{partitioning.shadow(table)}_sync() CASCADE')
+                    continue
+                cursor.execute(
+                    "SELECT pg_get_serial_sequence(%s, 'id')", [table])
+                sequence = cursor.fetchone()[0]
+                cursor.execute(
+                    f'ALTER SEQUENCE {sequence} OWNED BY '
+                    f'{table}_unpartitioned.id')
+                cursor.execute(f'DROP TABLE {table} CASCADE')
+                cursor.execute(
+                    f'ALTER TABLE {table}_unpartitioned RENAME TO {table}')
+                for name in partitioning.table_indexes(cursor, table):
+                    if name.endswith('_old'):
+                        cursor.execute(
+                            f'ALTER INDEX {name} RENAME TO {name[:-4]}')
+        super().tearDown()
+
+    def write_concurrently(self, errors):
+        """Change recipes and their tags while the backfill runs"""
+        try:
+            for i in range(40):
+                with transaction.atomic():
+                    recipe = create_recipe(self.user, f'New {i}')
+                    recipe.tags.add(self.tag)
+                    old = self.recipes[i % len(self.recipes)]
+                    # Links to recipes the backfill has not reached.
+                    tag = Tag.objects.create(user=self.user, name=f'T{i}')
+                    old.tags.add(tag)
+                    old.ingredients.remove(self.ingredient)
+                time.sleep(0.005)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    def test_convert_online(self):
+        """Test the conversion keeps every row written during it."""
+        out = StringIO()
+        call_command('partition_recipes', 'prepare', partitions=4,
+                     stdout=out)
+        errors = []
+        writer = threading.Thread(
+            target=self.write_concurrently, args=(errors,))
+        writer.start()
+        try:
+            call_command('partition_recipes', 'backfill', batch_size=3,
+                         pause=0.01, stdout=out)
+        finally:
+            writer.join()
+        self.assertEqual(errors, [])
+        call_command('partition_recipes', 'verify', stdout=out)
+        call_command('partition_recipes', 'constrain', stdout=out)
+        call_command('partition_recipes', 'swap', stdout=out)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relkind FROM pg_class WHERE relname = 'core_recipe'")
+            self.assertEqual(cursor.fetchone()[0], 'p')
+            cursor.execute('SELECT count(*) FROM core_recipe_unpartitioned')
+            recipes = cursor.fetchone()[0]
+            cursor.execute('SELECT count(*) FROM core_recipe_tags_'
+                           'unpartitioned')
+            links = cursor.fetchone()[0]
+        self.assertGreater(recipes, 20)
+        self.assertEqual(Recipe.all_objects.count(), recipes)
+        self.assertEqual(RecipeTag.objects.count(), links)
+        recipe = create_recipe(self.user)
+        recipe.tags.add(self.tag)
+        self.assertEqual(
+            list(Recipe.objects.get(pk=recipe.pk).tags.all()), [self.tag])
@@ -0,0 +1,191 @@
+"""
+Tests for database connection pooling and health checks.
+"""
+import threading
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import pool
+from core.db import check_connections
+
+POOL_URL = reverse('db-pool-metrics')
+
+
+class FakeConnection:
+    """Stand-in for a DB-API connection"""
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Tests for ConnectionPool."""
+
+    def test_reuses_released_connections(self):
+        """Test a released connection is handed out again."""
+        connection_pool = pool.ConnectionPool(FakeConnection, max_size=2)
+
+        first = connection_pool.acquire()
+        connection_pool.release(first)
+        second = connection_pool.acquire()
+
+        self.assertIs(first, second)
+        self.assertEqual(connection_pool.stats()['created'], 1)
+
+    def test_timeout_when_exhausted(self):
+        """Test acquire times out when every connection is in use."""
+        connection_pool = pool.ConnectionPool(
+            FakeConnection, max_size=1, timeout=0.01)
+        connection_pool.acquire()
+
+        with self.assertRaises(pool.PoolTimeout):
+            connection_pool.acquire()
+
+        stats = connection_pool.stats()
+        self.assertEqual(stats['in_use'], 1)
+        self.assertEqual(stats['waits'], 1)
+        self.assertEqual(stats['timeouts'], 1)
+
+    def test_waiter_gets_released_connection(self):
+        """Test a waiting thread receives a connection on release."""
+        connection_pool = pool.ConnectionPool(
+            FakeConnection, max_size=1, timeout=5)
+        held = connection_pool.acquire()
+        results = []
+        waiter = threading.Thread(
+            target=lambda: results.append(connection_pool.acquire()))
+
+        waiter.start()
+        connection_pool.release(held)
+        waiter.join()
+
+        self.assertEqual(results, [held])
+
+    def test_discard_closes_connection(self):
+        """Test a discarded connection is closed and frees its slot."""
+        connection_pool = pool.ConnectionPool(FakeConnection, max_size=1)
+        connection = connection_pool.acquire()
+
+        connection_pool.release(connection, discard=True)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(connection_pool.stats()['size'], 0)
+        self.assertIsNot(connection_pool.acquire(), connection)
+
+    def test_failed_connect_frees_slot(self):
+        """Test a failed connect does not leak a slot."""
+        connect = MagicMock(side_effect=[OSError, FakeConnection()])
+        connection_pool = pool.ConnectionPool(connect, max_size=1)
+
+        with self.assertRaises(OSError):
+            connection_pool.acquire()
+        connection_pool.acquire()
+
+        self.assertEqual(connection_pool.stats()['size'], 1)
+
+    def test_dead_connection_replaced(self):
+        """Test an idle connection failing its check is not handed out."""
+        connection_pool = pool.ConnectionPool(
+            FakeConnection, max_size=1, check=lambda conn: False,
+            check_interval=0)
+        dead = connection_pool.acquire()
+        connection_pool.release(dead)
+
+        connection = connection_pool.acquire()
+
+        self.assertIsNot(connection, dead)
+        self.assertTrue(dead.closed)
+        stats = connection_pool.stats()
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['recycled'], 1)
+
+    def test_check_interval(self):
+        """Test connections released recently are reused unchecked."""
+        check = MagicMock(return_value=False)
+        connection_pool = pool.ConnectionPool(
+            FakeConnection, check=check, check_interval=60)
+        connection = connection_pool.acquire()
+        connection_pool.release(connection)
+
+        self.assertIs(connection_pool.acquire(), connection)
+        check.assert_not_called()
+
+    def test_old_connection_replaced(self):
+        """Test a connection older than max_age is closed on checkout."""
+        connection_pool = pool.ConnectionPool(FakeConnection, max_age=0)
+        old = connection_pool.acquire()
+        connection_pool.release(old)
+
+        self.assertIsNot(connection_pool.acquire(), old)
+        self.assertTrue(old.closed)
+
+
+class HealthCheckTests(SimpleTestCase):
+    """Tests for the persistent connection health check."""
+
+    def make_connection(self, usable):
+        """Return a mocked connection wrapper"""
+        conn = MagicMock(in_atomic_block=False, health_checked_at=0)
+        conn.is_usable.return_value = usable
+        return conn
+
+    def test_unusable_connection_closed(self):
+        """Test a dead persistent connection is closed."""
+        dead = self.make_connection(usable=False)
+        alive = self.make_connection(usable=True)
+
+        with patch('core.db.connections') as patched_connections:
+            patched_connections.all.return_value = [dead, alive]
+            check_connections()
+
+        dead.close.assert_called_once()
+        alive.close.assert_not_called()
+
+    def test_check_interval(self):
+        """Test connections are not checked more than once per interval."""
+        conn = self.make_connection(usable=True)
+
+        with patch('core.db.connections') as patched_connections:
+            patched_connections.all.return_value = [conn]
+            check_connections()
+            check_connections()
+
+        conn.is_usable.assert_called_once()
+
+
+class DatabasePoolViewTests(TestCase):
+    """Tests for the pool metrics endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_requires_staff(self):
+        """Test the metrics are only available to staff users."""
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='test123password')
+        self.client.force_authenticate(user)
+
+        res = self.client.get(POOL_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics(self):
+        """Test the metrics of every pool are returned."""
+        admin = get_user_model().objects.create_superuser(
+            'admin@example.com', 'test123password')
+        self.client.force_authenticate(admin)
+        connection_pool = pool.ConnectionPool(FakeConnection, max_size=3)
+
+        with patch.dict(pool._pools, {'default:app_db': connection_pool}):
+            res = self.client.get(POOL_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['default:app_db']['max_size'], 3)
@@ -0,0 +1,87 @@
+"""
+Tests for the fast JSON renderer and parser.
+"""
+import datetime
+import io
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from core import renderers
+
+
+SAMPLE = {
+    'id': 1,
+    'title': 'Jollof rice',
+    'price': Decimal('5.50'),
+    'created': datetime.datetime(
+        2024, 5, 1, 12, 30, 15, 120, tzinfo=datetime.timezone.utc),
+    'day': datetime.date(2024, 5, 1),
+    'tags': [{'id': 2, 'name': 'Spicy ☃'}],
+}
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Tests for FastJSONRenderer."""
+
+    def test_render_matches_drf_renderer(self):
+        """Test the rendered document matches DRF's JSONRenderer."""
+        fast = renderers.FastJSONRenderer().render(SAMPLE)
+        drf = JSONRenderer().render(SAMPLE)
+
+        self.assertEqual(json.loads(fast), json.loads(drf))
+
+    def test_render_decimal_and_datetime(self):
+        """Test Decimal and datetime values are encoded."""
+        res = json.loads(renderers.FastJSONRenderer().render(SAMPLE))
+
+        self.assertEqual(res['price'], 5.5)
+        self.assertEqual(res['created'], '2024-05-01T12:30:15.000120Z')
+        self.assertEqual(res['day'], '2024-05-01')
+
+    def test_render_none(self):
+        """Test rendering None returns an empty body."""
+        self.assertEqual(renderers.FastJSONRenderer().render(None), b'')
+
+    def test_render_indent_uses_drf(self):
+        """Test an indent request falls back to the DRF renderer."""
+        res = renderers.FastJSONRenderer().render(
+            {'a': 1}, 'application/json; indent=2')
+
+        self.assertEqual(res, b'{\n  "a": 1\n}')
+
+    @patch('core.renderers.orjson', None)
+    def test_render_without_orjson(self):
+        """Test the pure Python fallback produces the same document."""
+        res = renderers.FastJSONRenderer().render(SAMPLE)
+
+        self.assertEqual(json.loads(res), json.loads(
+            JSONRenderer().render(SAMPLE)))
+
+
+class FastJSONParserTests(SimpleTestCase):
+    """Tests for FastJSONParser."""
+
+    def test_parse(self):
+        """Test parsing a JSON body."""
+        stream = io.BytesIO(b'{"title": "Soup", "tags": [{"name": "a"}]}')
+
+        res = renderers.FastJSONParser().parse(stream)
+
+        self.assertEqual(res, {'title': 'Soup', 'tags': [{'name': 'a'}]})
+
+    @patch('core.renderers.orjson', None)
+    def test_parse_without_orjson(self):
+        """Test parsing with the pure Python fallback."""
+        res = renderers.FastJSONParser().parse(io.BytesIO(b'[1, 2]'))
+
+        self.assertEqual(res, [1, 2])
+
+    def test_parse_error(self):
+        """Test invalid JSON raises a ParseError."""
+        with self.assertRaises(ParseError):
+            renderers.FastJSONParser().parse(io.BytesIO(b'{"title": '))
@@ -0,0 +1,157 @@
+"""
+Tests for the database routers.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import checks, routers
+from core.models import Recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+ME_URL = reverse('user:me')
+LOCAL_CACHE = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+
+
+def create_recipe(user, using, title):
+    """Create a recipe of user on the database using"""
+    return Recipe.objects.using(using).create(
+        user_id=user.pk, title=title, time_minutes=5, price=Decimal('1'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRouterTests(SimpleTestCase):
+    """Tests for ReplicaRouter."""
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+
+    def test_reads_go_to_primary_by_default(self):
+        """Test reads outside a replica context use the primary."""
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_reads_go_to_replica_in_context(self):
+        """Test reads in a replica context use a replica."""
+        token = routers.read_from_replicas()
+        try:
+            self.assertEqual(self.router.db_for_read(Recipe), 'replica_1')
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+        finally:
+            routers.reset_replica_reads(token)
+
+    def test_no_migrations_on_replicas(self):
+        """Test migrations are not applied to replicas."""
+        self.assertFalse(self.router.allow_migrate('replica_1', 'core'))
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaReadMixinTests(TestCase):
+    """Tests for routing of view reads to a stand-in replica database."""
+    databases = {'default', 'replica_1'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='test123password',
+            name='Primary')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        create_recipe(self.user, 'default', 'Primary soup')
+        # The replica has the user, but lags behind on their name and
+        # recipes.
+        get_user_model().objects.using('replica_1').create(
+            pk=self.user.pk, email=self.user.email, name='Replica')
+        create_recipe(self.user, 'replica_1', 'Replica soup')
+
+    def titles(self):
+        """Return the titles of the user's recipes the API lists"""
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data]
+
+    def test_list_reads_from_replica(self):
+        """Test listing recipes reads from a replica."""
+        self.assertEqual(self.titles(), ['Replica soup'])
+        self.assertFalse(routers.reading_from_replica())
+
+    def test_writes_go_to_primary(self):
+        """Test writes go to the primary database."""
+        payload = {'title': 'Stew', 'time_minutes': 5, 'price': '1.00'}
+
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(
+            Recipe.objects.using('default').filter(title='Stew').exists())
+        self.assertFalse(
+            Recipe.objects.using('replica_1').filter(title='Stew').exists())
+
+    def test_reads_stick_to_primary_after_write(self):
+        """Test the user reads from the primary right after a write."""
+        payload = {'title': 'Stew', 'time_minutes': 5, 'price': '1.00'}
+        self.client.post(RECIPES_URL, payload)
+
+        self.assertTrue(routers.is_pinned_to_primary(self.user))
+        self.assertEqual(self.titles(), ['Stew', 'Primary soup'])
+
+    def test_pin_expires(self):
+        """Test replica reads resume once the pin expires."""
+        routers.pin_to_primary(self.user)
+        cache.delete(routers._pin_key(self.user))
+
+        self.assertEqual(self.titles(), ['Replica soup'])
+
+    def test_failed_write_does_not_pin(self):
+        """Test a rejected write does not pin the user."""
+        self.client.post(RECIPES_URL, {'title': 'Missing fields'})
+
+        self.assertFalse(routers.is_pinned_to_primary(self.user))
+        self.assertEqual(self.titles(), ['Replica soup'])
+
+    def test_me_reads_from_replica(self):
+        """Test the manage user view uses the replica for GET."""
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Replica')
+
+    def test_me_after_update(self):
+        """Test the user reads their own update back."""
+        self.client.patch(ME_URL, {'name': 'Updated'})
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Updated')
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """Tests for the check that workers share their caches."""
+
+    @override_settings(
+        DATABASE_REPLICAS=['replica_1'], REPLICA_PIN_CACHE='local',
+        CACHES={**settings.CACHES, 'local': LOCAL_CACHE})
+    def test_local_pin_cache_refused(self):
+        """Test replicas need a pin cache shared between workers."""
+        errors = checks.check_shared_caches(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+    @override_settings(DATABASE_REPLICAS=['replica_1'])
+    def test_shared_pin_cache(self):
+        """Test the default cache is shared."""
+        self.assertEqual(checks.check_shared_caches(None), [])
+
+    @override_settings(
+        IDEMPOTENCY_CACHE='local',
+        CACHES={**settings.CACHES, 'local': LOCAL_CACHE})
+    def test_local_idempotency_cache_refused(self):
+        """Test idempotency keys need a cache shared between workers."""
+        errors = checks.check_shared_caches(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E002'])
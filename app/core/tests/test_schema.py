@@ -0,0 +1,100 @@
+"""
+Tests for serving the OpenAPI schema.
+"""
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from core import schema
+
+SCHEMA_URL = reverse('api-schema')
+
+
+class SchemaViewTests(SimpleTestCase):
+    """Tests for the schema endpoint."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings = override_settings(OPENAPI_SCHEMA_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        schema.clear()
+        self.addCleanup(schema.clear)
+
+    def test_generated_once(self):
+        """Test a missing schema is generated once per process."""
+        with patch('core.schema.generate', wraps=schema.generate) as mock:
+            first = self.client.get(SCHEMA_URL)
+            second = self.client.get(SCHEMA_URL, {'format': 'json'})
+
+        self.assertEqual(mock.call_count, 1)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Content-Type'], 'application/vnd.oai.openapi')
+        self.assertIn(b'/api/recipe/recipes/', first.content)
+        self.assertIn('/api/recipe/recipes/',
+                      json.loads(second.content)['paths'])
+
+    def test_precomputed(self):
+        """Test the schema written at build time is served."""
+        (self.directory / 'openapi.yaml').write_bytes(b'openapi: 3.0.3\n')
+
+        with patch('core.schema.generate') as mock:
+            res = self.client.get(SCHEMA_URL)
+
+        mock.assert_not_called()
+        self.assertEqual(res.content, b'openapi: 3.0.3\n')
+
+    def test_not_modified(self):
+        """Test a client holding the schema gets a 304."""
+        (self.directory / 'openapi.yaml').write_bytes(b'openapi: 3.0.3\n')
+        etag = self.client.get(SCHEMA_URL)['ETag']
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res['ETag'], etag)
+        self.assertEqual(res.content, b'')
+
+    def test_compressed(self):
+        """Test the schema is compressed once for clients accepting it."""
+        (self.directory / 'openapi.yaml').write_bytes(b'openapi: 3.0.3\n')
+
+        with patch('core.middleware.GzipEncoder.compress',
+                   return_value=b'gzipped') as mock:
+            for _ in range(2):
+                res = self.client.get(
+                    SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        mock.assert_called_once_with(b'openapi: 3.0.3\n')
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(res.content, b'gzipped')
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_json_from_accept_header(self):
+        """Test JSON is served when the client asks for it."""
+        (self.directory / 'openapi.json').write_bytes(b'{}')
+
+        res = self.client.get(
+            SCHEMA_URL, HTTP_ACCEPT='application/vnd.oai.openapi+json')
+
+        self.assertEqual(res['Content-Type'],
+                         'application/vnd.oai.openapi+json')
+        self.assertEqual(res.content, b'{}')
+
+    def test_build_schema(self):
+        """Test the command writes the schema in every format."""
+        out = StringIO()
+        call_command('build_schema', fail_on_warn=True, stdout=out)
+
+        document = json.loads((self.directory / 'openapi.json').read_bytes())
+        self.assertIn('/api/recipe/recipes/', document['paths'])
+        self.assertTrue((self.directory / 'openapi.yaml').exists())
+        self.assertIn('Wrote', out.getvalue())
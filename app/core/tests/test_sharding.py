@@ -0,0 +1,229 @@
+"""
+Tests for sharding user data across databases.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import archive, jobs, routers, sharding
+from core.models import Job, OutboxEvent, Recipe, RecipeTag, Tag
+from core.tasks import purge_user
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, **params):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@skipUnless(len(settings.DATABASE_SHARDS) > 1, 'Needs a second shard.')
+class ShardingTests(TestCase):
+    """Tests for routing user data to shards."""
+    databases = '__all__'
+
+    def setUp(self):
+        caches[settings.SHARD_CACHE].clear()
+        self.addCleanup(caches[settings.SHARD_CACHE].clear)
+
+    def create_user(self, email='user@example.com', shard=None):
+        """Create a user, on shard if given"""
+        with override_settings(
+                SHARD_PLACEMENT=[shard] if shard else ['default']):
+            return get_user_model().objects.create_user(
+                email=email, password='test123password')
+
+    def test_router(self):
+        """Test only sharded models follow the current shard."""
+        router = routers.ShardRouter()
+        with sharding.use_database('shard_1'):
+            self.assertEqual(router.db_for_write(Recipe), 'shard_1')
+            self.assertEqual(router.db_for_read(Tag), 'shard_1')
+            self.assertIsNone(router.db_for_read(get_user_model()))
+            self.assertIsNone(router.db_for_write(OutboxEvent))
+        with sharding.use_database('default'):
+            self.assertIsNone(router.db_for_read(Recipe))
+
+    def test_new_user_placed(self):
+        """Test a new user is placed and copied to their shard."""
+        user = self.create_user(shard='shard_1')
+
+        self.assertEqual(user.shard, 'shard_1')
+        copy = get_user_model().objects.using('shard_1').get(pk=user.pk)
+        self.assertEqual(copy.email, f'{user.pk}@shard.invalid')
+        self.assertFalse(copy.is_active)
+        self.assertEqual(sharding.lookup(user.pk), ('shard_1', False))
+
+    def test_recipe_written_to_shard(self):
+        """Test a user's recipes are written to and read from their shard."""
+        user = self.create_user(shard='shard_1')
+        client = APIClient()
+        client.force_authenticate(user)
+        payload = {
+            'title': 'Soup', 'time_minutes': 5, 'price': '2.50',
+            'tags': [{'name': 'Lunch'}],
+        }
+
+        res = client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(Recipe.objects.using('default').exists())
+        recipe = Recipe.objects.using('shard_1').get()
+        self.assertEqual(recipe.pk, res.data['id'])
+        self.assertEqual(recipe.user.email, user.email)
+        self.assertEqual(
+            RecipeTag.objects.using('shard_1').get().tag.name, 'Lunch')
+        self.assertEqual(OutboxEvent.objects.get().object_id, recipe.pk)
+        res = client.get(RECIPES_URL)
+        self.assertEqual([r['title'] for r in res.data], ['Soup'])
+
+    def test_ids_differ_across_shards(self):
+        """Test shards hand out different ids."""
+        first = create_recipe(self.create_user())
+        with sharding.use_database('shard_1'):
+            second = create_recipe(self.create_user(
+                'other@example.com', shard='shard_1'))
+
+        self.assertEqual(first._state.db, 'default')
+        self.assertEqual(second._state.db, 'shard_1')
+        self.assertEqual(first.pk % sharding.ID_STRIDE, 0)
+        self.assertEqual(second.pk % sharding.ID_STRIDE, 1)
+
+    def test_move_users(self):
+        """Test moving a user copies their rows and keeps their ids."""
+        user = self.create_user()
+        other = self.create_user('other@example.com')
+        recipe = create_recipe(user)
+        tag = Tag.objects.create(user=user, name='Vegan')
+        recipe.tags.add(tag)
+        create_recipe(other)
+
+        moved = sharding.move_users([user.pk], 'shard_1', wait=0)
+
+        self.assertEqual(moved, [user.pk])
+        user.refresh_from_db()
+        self.assertEqual(user.shard, 'shard_1')
+        self.assertFalse(user.shard_moving)
+        self.assertEqual(sharding.lookup(user.pk), ('shard_1', False))
+        with sharding.use_shard(user.pk):
+            copy = Recipe.objects.get()
+            self.assertEqual(copy.pk, recipe.pk)
+            self.assertEqual(list(copy.tags.all()), [tag])
+        self.assertEqual(
+            list(Recipe.objects.using('default').values_list(
+                'user_id', flat=True)),
+            [other.pk])
+        self.assertFalse(Tag.objects.using('default').exists())
+
+    def test_move_resumed(self):
+        """Test a move is run again over rows a failed one copied."""
+        user = self.create_user()
+        recipe = create_recipe(user)
+        recipe.tags.add(Tag.objects.create(user=user, name='Vegan'))
+        sharding.copy_rows(user.pk, 'default', 'shard_1')
+
+        moved = sharding.move_users([user.pk], 'shard_1', wait=0)
+
+        self.assertEqual(moved, [user.pk])
+        self.assertEqual(Recipe.objects.using('shard_1').count(), 1)
+        self.assertEqual(RecipeTag.objects.using('shard_1').count(), 1)
+        self.assertFalse(Recipe.objects.using('default').exists())
+
+    def test_moving_user_job_put_off(self):
+        """Test jobs of a user being moved run again without failing."""
+        user = self.create_user()
+        get_user_model().objects.filter(pk=user.pk).update(
+            is_active=False, shard_moving=True)
+        create_recipe(user)
+        job = jobs.enqueue(purge_user, {'user_id': user.pk})
+
+        for claimed in jobs.claim('test'):
+            self.assertFalse(jobs.run(claimed))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 0)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertTrue(Recipe.all_objects.exists())
+
+    def test_moving_user_not_archived(self):
+        """Test recipes of a user being moved stay where they are."""
+        user = self.create_user()
+        other = self.create_user('other@example.com')
+        long_ago = timezone.now() - timedelta(days=1)
+        for owner in (user, other):
+            create_recipe(
+                owner, status=Recipe.ARCHIVED, archived_at=long_ago)
+        get_user_model().objects.filter(pk=user.pk).update(
+            shard_moving=True)
+
+        moved = archive.move_batch(timezone.now(), 10)
+
+        self.assertEqual(moved, 1)
+        self.assertEqual(Recipe.all_objects.get().user, user)
+
+    def test_moving_user_refused(self):
+        """Test requests of a user being moved get a 503."""
+        user = self.create_user()
+        get_user_model().objects.filter(pk=user.pk).update(
+            shard_moving=True)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(
+            res['Retry-After'], str(settings.SHARD_CACHE_SECONDS))
+
+    def test_purge_on_shard(self):
+        """Test purging a sharded user deletes their copy too."""
+        user = self.create_user(shard='shard_1')
+        with sharding.use_shard(user.pk):
+            create_recipe(user)
+        get_user_model().objects.filter(pk=user.pk).update(is_active=False)
+
+        jobs.enqueue(purge_user, {'user_id': user.pk})
+        for job in jobs.claim('test'):
+            jobs.run(job)
+
+        self.assertFalse(Recipe.all_objects.using('shard_1').exists())
+        self.assertFalse(get_user_model().objects.filter(pk=user.pk).exists())
+        self.assertFalse(
+            get_user_model().objects.using('shard_1').exists())
+
+    def test_rebalance_command(self):
+        """Test rebalance_shards moves users and reports the counts."""
+        users = [
+            self.create_user(f'user{i}@example.com') for i in range(3)]
+        out = StringIO()
+
+        call_command(
+            'rebalance_shards', to='shard_1', source='default', count=2,
+            wait=0, stdout=out)
+        call_command('rebalance_shards', stdout=out)
+
+        self.assertIn('Moved 2 users to shard_1.', out.getvalue())
+        self.assertIn('default: 1 users', out.getvalue())
+        self.assertIn('shard_1: 2 users', out.getvalue())
+        self.assertEqual(
+            list(get_user_model().objects.filter(
+                shard='shard_1').order_by('pk')),
+            users[:2])
@@ -0,0 +1,191 @@
+"""
+Tests for API throttling.
+"""
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import checks, throttling, tokens
+from core.authentication import SignedTokenAuthentication
+
+TOKEN_URL = reverse('user:token')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+# A cache with an atomic incr, like the memcached THROTTLE_CACHE is.
+CACHES = {
+    'throttle': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+RATES = {
+    'DEFAULT_THROTTLE_RATES': {
+        'login': '2/minute',
+        'signup': '2/minute',
+        'user': '2/minute',
+        'recipe': '2/minute',
+    },
+}
+
+
+class CounterStoreTests(SimpleTestCase):
+    """Tests for the sliding window counter stores."""
+
+    def test_local_store_limit(self):
+        """Test hits over the limit are rejected until the window slides."""
+        store = throttling.LocalCounterStore()
+
+        self.assertTrue(store.hit('k', 60, 2, now=600)[0])
+        self.assertTrue(store.hit('k', 60, 2, now=610)[0])
+        allowed, wait = store.hit('k', 60, 2, now=620)
+
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 40)
+
+    def test_local_store_sliding_window(self):
+        """Test the previous window is weighted by its overlap."""
+        store = throttling.LocalCounterStore()
+        store.hit('k', 60, 2, now=600)
+        store.hit('k', 60, 2, now=610)
+
+        # Two thirds of the previous window overlap: 2 * 2/3 + 1 > 2
+        self.assertFalse(store.hit('k', 60, 2, now=680)[0])
+        # A quarter overlaps: 2 * 0.25 + 1 <= 2
+        self.assertTrue(store.hit('k', 60, 2, now=705)[0])
+
+    def test_local_store_keys_are_independent(self):
+        """Test each key has its own counter."""
+        store = throttling.LocalCounterStore()
+        store.hit('a', 60, 1, now=600)
+
+        self.assertFalse(store.hit('a', 60, 1, now=601)[0])
+        self.assertTrue(store.hit('b', 60, 1, now=601)[0])
+
+    def test_local_store_prunes_stale_keys(self):
+        """Test stale counters are dropped once the store is full."""
+        store = throttling.LocalCounterStore(max_keys=3)
+        store.hit('a', 60, 1, now=0)
+        store.hit('b', 60, 1, now=0)
+        store.hit('hour', 3600, 1, now=0)
+
+        store.hit('c', 60, 1, now=600)
+
+        # The hour-long window of 'hour' has not passed yet.
+        self.assertEqual(set(store._counters), {'hour', 'c'})
+
+    def test_local_store_bounded(self):
+        """Test the oldest live counters make room for new ones."""
+        store = throttling.LocalCounterStore(max_keys=2)
+        for key in 'abc':
+            store.hit(key, 60, 1, now=0)
+
+        self.assertEqual(set(store._counters), {'b', 'c'})
+
+    @override_settings(CACHES=CACHES)
+    def test_cache_store_limit(self):
+        """Test the shared cache store enforces the limit."""
+        store = throttling.CacheCounterStore('throttle')
+        store.cache.clear()
+
+        self.assertTrue(store.hit('k', 60, 2, now=600)[0])
+        self.assertTrue(store.hit('k', 60, 2, now=610)[0])
+        allowed, wait = store.hit('k', 60, 2, now=620)
+
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 40)
+        # The rejected hit is not counted.
+        self.assertEqual(store.cache.get('throttle:k:60:10'), 2)
+
+    @override_settings(CACHES=CACHES)
+    def test_cache_store_concurrent_hits(self):
+        """Test concurrent hits never let more than the limit through."""
+        store = throttling.CacheCounterStore('throttle')
+        store.cache.clear()
+        results = []
+
+        def hit():
+            results.append(store.hit('k', 60, 5, now=600)[0])
+
+        threads = [threading.Thread(target=hit) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 5)
+
+    @override_settings(THROTTLE_CACHE='default')
+    def test_non_atomic_cache_warned(self):
+        """Test a shared cache without an atomic incr is warned about."""
+        errors = checks.check_shared_caches(None)
+
+        self.assertEqual([error.id for error in errors], ['core.W001'])
+
+
+@override_settings(REST_FRAMEWORK=RATES)
+class ThrottledEndpointTests(TestCase):
+    """Tests for throttled endpoints."""
+
+    def setUp(self):
+        throttling.local_store.clear()
+        self.client = APIClient()
+
+    def tearDown(self):
+        throttling.local_store.clear()
+
+    @patch('user.serializers.authenticate')
+    def test_login_throttled_before_authentication(self, patched_auth):
+        """Test login attempts over the rate never reach the hasher."""
+        patched_auth.return_value = None
+        payload = {'email': 'test@example.com', 'password': 'wrong-pass'}
+
+        for _ in range(2):
+            res = self.client.post(TOKEN_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(patched_auth.call_count, 2)
+        self.assertIn('Retry-After', res)
+
+    def authenticate(self, user):
+        """Send a signed token of user with the requests"""
+        token, _ = tokens.issue(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+
+    def test_recipes_throttled_per_user(self):
+        """Test recipe requests are limited per user."""
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='test123password')
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='test123password')
+        self.authenticate(user)
+
+        for _ in range(2):
+            self.client.get(RECIPES_URL)
+        res = self.client.get(RECIPES_URL)
+        self.authenticate(other)
+        res_other = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res_other.status_code, status.HTTP_200_OK)
+
+    def test_user_throttled_before_authentication(self):
+        """Test requests over the user's rate are not authenticated."""
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='test123password')
+        self.authenticate(user)
+        authenticate = SignedTokenAuthentication.authenticate_credentials
+
+        with patch.object(
+                SignedTokenAuthentication, 'authenticate_credentials',
+                autospec=True, side_effect=authenticate) as patched_auth:
+            for _ in range(2):
+                self.client.get(RECIPES_URL)
+            with self.assertNumQueries(0):
+                res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(patched_auth.call_count, 2)
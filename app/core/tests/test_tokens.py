@@ -0,0 +1,214 @@
+"""
+Tests for signed auth tokens.
+"""
+import time
+from io import StringIO
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+
+from core import tokens
+from core.authentication import SignedTokenAuthentication
+from core.models import RevokedToken
+
+
+class TokenTests(TestCase):
+    """Tests for issuing, verifying and revoking tokens."""
+
+    def setUp(self):
+        tokens.revocations.clear()
+        self.addCleanup(tokens.revocations.clear)
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='test123password')
+        self.token, self.expires = tokens.issue(self.user)
+
+    def test_verify(self):
+        """Test a token carries the user id and expiry."""
+        parsed = tokens.verify(self.token)
+
+        self.assertEqual(parsed.user_id, self.user.id)
+        self.assertEqual(parsed.expires, self.expires.timestamp())
+
+    def test_tampered_token(self):
+        """Test a token with a changed user id is rejected."""
+        _, rest = self.token.split(':', 1)
+
+        with self.assertRaisesMessage(tokens.InvalidToken, 'Invalid'):
+            tokens.verify(f'{self.user.id + 1}:{rest}')
+
+    def test_expired_token(self):
+        """Test an expired token is rejected."""
+        later = time.time() + 8 * 24 * 3600
+
+        with patch('core.tokens.time.time', return_value=later):
+            with self.assertRaisesMessage(tokens.InvalidToken, 'expired'):
+                tokens.verify(self.token)
+
+    def test_revoke(self):
+        """Test a revoked token is rejected and stored until it expires."""
+        tokens.revoke(self.token)
+
+        with self.assertRaisesMessage(tokens.InvalidToken, 'revoked'):
+            tokens.verify(self.token)
+        revoked = RevokedToken.objects.get()
+        self.assertEqual(revoked.expires_at, self.expires)
+
+    def test_revoke_user(self):
+        """Test revoking a user revokes all their tokens."""
+        other, _ = tokens.issue(self.user)
+
+        tokens.revoke_user(self.user)
+
+        for token in (self.token, other):
+            with self.assertRaises(tokens.InvalidToken):
+                tokens.verify(token)
+
+    def test_token_after_revoke_user(self):
+        """Test tokens issued after a user's revocation are valid."""
+        now = time.time()
+        with patch('core.tokens.time.time', return_value=now):
+            tokens.revoke_user(self.user)
+        with patch('core.tokens.time.time', return_value=now + 1):
+            token, _ = tokens.issue(self.user)
+        tokens.revocations.clear()
+
+        self.assertEqual(tokens.verify(token).user_id, self.user.id)
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify(self.token)
+
+    def test_password_change_revokes(self):
+        """Test changing the password revokes the user's tokens."""
+        self.user.set_password('new123password')
+        self.user.save()
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify(self.token)
+
+    def test_deactivation_revokes(self):
+        """Test deactivating the user revokes their tokens."""
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+
+        with self.assertRaises(tokens.InvalidToken):
+            tokens.verify(self.token)
+
+    def test_other_changes_keep_tokens(self):
+        """Test saving other fields of the user keeps their tokens."""
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.name = 'Renamed'
+        user.save()
+
+        self.assertEqual(tokens.verify(self.token).user_id, self.user.id)
+
+    def test_token_without_issue_time(self):
+        """Test tokens missing a field are rejected."""
+        expires = int(time.time()) + 60
+        token = tokens._signer().sign(f'{self.user.pk}:{expires}:abc')
+
+        with self.assertRaisesMessage(tokens.InvalidToken, 'Invalid'):
+            tokens.verify(token)
+
+    def test_revocations_synced(self):
+        """Test revocations made by other processes are picked up."""
+        tokens.verify(self.token)
+        RevokedToken.objects.create(
+            key=tokens.verify(self.token).jti, expires_at=self.expires)
+
+        with override_settings(TOKEN_REVOCATION_SYNC_SECONDS=0):
+            with self.assertRaises(tokens.InvalidToken):
+                tokens.verify(self.token)
+
+    def test_verify_without_queries(self):
+        """Test a synced process verifies tokens without queries."""
+        tokens.verify(self.token)
+
+        with self.assertNumQueries(0):
+            tokens.verify(self.token)
+
+
+class SignedTokenAuthenticationTests(TestCase):
+    """Tests for SignedTokenAuthentication."""
+
+    def setUp(self):
+        tokens.revocations.clear()
+        self.addCleanup(tokens.revocations.clear)
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='test123password',
+            name='Test')
+        self.authentication = SignedTokenAuthentication()
+
+    def test_user_not_loaded(self):
+        """Test the user is only loaded once a field is read."""
+        token, _ = tokens.issue(self.user)
+        tokens.revocations.sync()
+
+        with self.assertNumQueries(0):
+            user, auth = self.authentication.authenticate_credentials(token)
+
+        self.assertEqual(auth, token)
+        self.assertEqual(user.pk, self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.name, 'Test')
+
+    def test_inactive_user(self):
+        """Test tokens of deactivated users fail authentication."""
+        token, _ = tokens.issue(self.user)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaisesMessage(
+                exceptions.AuthenticationFailed, 'revoked'):
+            self.authentication.authenticate_credentials(token)
+
+    def test_deleted_user(self):
+        """Test tokens of deleted users fail authentication."""
+        token, _ = tokens.issue(self.user)
+        self.user.delete()
+
+        with self.assertRaisesMessage(
+                exceptions.AuthenticationFailed, 'revoked'):
+            self.authentication.authenticate_credentials(token)
+
+    def test_invalid_token(self):
+        """Test invalid signed tokens fail authentication."""
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authentication.authenticate_credentials('1:2:3:bad')
+
+    def test_drf_token(self):
+        """Test DRF tokens are still accepted."""
+        token = Token.objects.create(user=self.user)
+
+        user, auth = self.authentication.authenticate_credentials(token.key)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(auth, token)
+
+
+class PurgeTokensTests(TestCase):
+    """Tests for the purge_tokens command."""
+
+    def test_purge(self):
+        """Test expired revocations and old DRF tokens are deleted."""
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='test123password')
+        token = Token.objects.create(user=user)
+        Token.objects.filter(pk=token.pk).update(
+            created=timezone.now() - timedelta(days=30))
+        now = timezone.now()
+        RevokedToken.objects.create(key='old', expires_at=now)
+        RevokedToken.objects.create(
+            key='new', expires_at=now + timedelta(days=1))
+
+        call_command('purge_tokens', stdout=StringIO())
+
+        self.assertFalse(Token.objects.exists())
+        self.assertEqual(
+            list(RevokedToken.objects.values_list('key', flat=True)),
+            ['new'])
@@ -0,0 +1,66 @@
+"""
+Tests for warming up the application and the serve command.
+"""
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django.urls import get_resolver
+
+from core import warmup
+from recipe.readers import get_reader
+from recipe.views import RecipeViewSet
+
+
+class WarmupTests(SimpleTestCase):
+    """Tests for the warmup steps."""
+    databases = '__all__'
+
+    def test_warm_up(self):
+        """Test every step runs and is timed."""
+        get_reader.cache_clear()
+
+        timings = warmup.warm_up()
+
+        self.assertEqual(list(timings), [name for name, _ in warmup.STEPS])
+        self.assertEqual(get_reader.cache_info().currsize, 2)
+
+    def test_iter_views(self):
+        """Test the views of included URLconfs are found."""
+        views = set(warmup.iter_views(get_resolver().url_patterns))
+
+        self.assertIn(RecipeViewSet, views)
+
+    @patch('core.pool.close_all')
+    @patch('core.warmup.connections.close_all')
+    def test_connections_closed(self, patched_close, patched_pool_close):
+        """Test no connection is left open to be shared with workers."""
+        warmup.check_databases()
+
+        patched_close.assert_called_once()
+        patched_pool_close.assert_called_once()
+
+
+@patch('core.management.commands.serve.gc.freeze')
+@patch('core.management.commands.serve.Server.run', autospec=True)
+class ServeCommandTests(SimpleTestCase):
+    """Tests for the serve command."""
+    databases = '__all__'
+
+    def test_serve(self, patched_run, patched_freeze):
+        """Test the workers are forked from a warmed-up master."""
+        out = StringIO()
+
+        call_command('serve', workers=3, threads=4, max_requests=50,
+                     stdout=out)
+
+        server, = patched_run.call_args[0]
+        self.assertTrue(server.cfg.preload_app)
+        self.assertEqual(server.cfg.workers, 3)
+        self.assertEqual(server.cfg.threads, 4)
+        self.assertEqual(server.cfg.worker_class_str, 'gthread')
+        self.assertEqual(server.cfg.max_requests, 50)
+        patched_freeze.assert_called_once()
+        self.assertIn('Warmed up in', out.getvalue())
+        self.assertIn('serializers', out.getvalue())
@@ -0,0 +1,279 @@
+"""
+Tests for the outbox and webhook delivery.
+"""
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import outbox, webhooks
+from core.models import OutboxEvent, Tag, WebhookEndpoint
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Partner endpoint recording the requests it receives"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.received.append({
+            'headers': dict(self.headers),
+            'body': json.loads(body),
+            'client': self.client_address,
+        })
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServerMixin:
+    """Run a local HTTP stand-in for a partner endpoint"""
+
+    def start_server(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        server.received = []
+        server.status = 200
+        thread = threading.Thread(
+            target=server.serve_forever, kwargs={'poll_interval': 0.01},
+            daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.addCleanup(webhooks.close_connections)
+        return server
+
+    def create_endpoint(self, server):
+        host, port = server.server_address
+        return WebhookEndpoint.objects.create(
+            url=f'http://{host}:{port}/hooks', secret='s3cret')
+
+
+class OutboxTests(TestCase):
+    """Tests for recording change events."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='test123password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_recipe_created(self):
+        """Test creating a recipe records an event."""
+        payload = {'title': 'Soup', 'time_minutes': 5, 'price': '2.50'}
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.event, 'recipe.created')
+        self.assertEqual(event.user_id, self.user.id)
+        self.assertEqual(event.object_id, res.data['id'])
+        self.assertEqual(event.data['title'], 'Soup')
+
+    def test_rejected_change_not_recorded(self):
+        """Test an invalid request records no event."""
+        res = self.client.post(RECIPES_URL, {'title': 'Soup'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_tag_updated_and_deleted(self):
+        """Test tag changes are recorded."""
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        url = reverse('recipe:tag-detail', args=[tag.id])
+
+        self.client.patch(url, {'name': 'Dinner'})
+        self.client.delete(url)
+
+        self.assertEqual(
+            list(OutboxEvent.objects.order_by('id').values_list(
+                'event', 'object_id')),
+            [('tag.updated', tag.id), ('tag.deleted', tag.id)],
+        )
+
+
+class DeliveryTests(StandInServerMixin, TransactionTestCase):
+    """Tests for delivering events to an endpoint.
+
+    Events are only delivered once the transaction writing them has
+    ended, so the tests commit them.
+    """
+
+    def setUp(self):
+        self.server = self.start_server()
+        self.endpoint = self.create_endpoint(self.server)
+
+    def start_transaction(self):
+        """Record an event in a transaction left open on another thread"""
+        written, commit = threading.Event(), threading.Event()
+        events = []
+
+        def write():
+            try:
+                with transaction.atomic():
+                    events.append(outbox.record('recipe.updated', 1, 0))
+                    written.set()
+                    commit.wait(5)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(commit.set)
+        self.assertTrue(written.wait(5))
+
+        def finish():
+            commit.set()
+            thread.join()
+            return events[0]
+        return finish
+
+    def record(self, count):
+        """Record count events"""
+        return [
+            outbox.record('recipe.updated', 1, i, {'id': i})
+            for i in range(count)
+        ]
+
+    def test_deliver_batch(self):
+        """Test events are sent in one signed batch."""
+        events = self.record(2)
+
+        sent = webhooks.deliver(self.endpoint.id)
+
+        self.assertEqual(sent, 2)
+        request, = self.server.received
+        self.assertEqual(
+            [event['id'] for event in request['body']['events']],
+            [event.id for event in events])
+        body = webhooks.dumps(request['body'])
+        self.assertEqual(request['headers'][webhooks.SIGNATURE_HEADER],
+                         webhooks.sign('s3cret', body))
+        self.endpoint.refresh_from_db()
+        self.assertEqual(self.endpoint.last_event_id, events[-1].id)
+        self.assertEqual(webhooks.deliver(self.endpoint.id), 0)
+
+    @override_settings(WEBHOOK_BATCH_SIZE=2)
+    def test_connection_reused(self):
+        """Test consecutive batches reuse the connection."""
+        self.record(3)
+
+        webhooks.deliver(self.endpoint.id)
+        webhooks.deliver(self.endpoint.id)
+
+        first, second = self.server.received
+        self.assertEqual(len(second['body']['events']), 1)
+        self.assertEqual(first['client'], second['client'])
+
+    def test_failure_backs_off(self):
+        """Test a failed batch is retried later from the same cursor."""
+        self.record(1)
+        self.server.status = 500
+
+        sent = webhooks.deliver(self.endpoint.id)
+
+        self.endpoint.refresh_from_db()
+        self.assertEqual(sent, 0)
+        self.assertEqual(self.endpoint.last_event_id, 0)
+        self.assertEqual(self.endpoint.failures, 1)
+        self.assertEqual(self.endpoint.last_error, 'HTTP 500')
+        self.assertGreater(self.endpoint.next_attempt_at, timezone.now())
+        self.assertEqual(webhooks.due_endpoints(), [])
+
+    def test_open_transaction_holds_back_events(self):
+        """Test events wait for an older transaction still running."""
+        finish = self.start_transaction()
+        later, = self.record(1)
+
+        self.assertEqual(webhooks.deliver(self.endpoint.id), 0)
+        earlier = finish()
+
+        self.assertEqual(webhooks.deliver(self.endpoint.id), 2)
+        request, = self.server.received
+        self.assertEqual(
+            [event['id'] for event in request['body']['events']],
+            [earlier.id, later.id])
+
+    def test_late_commit_delivered(self):
+        """Test an event committed after a higher id was sent is not lost."""
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                # Takes a transaction id before the other transaction.
+                cursor.execute('SELECT pg_current_xact_id()')
+            finish = self.start_transaction()
+            later, = self.record(1)
+
+        self.assertEqual(webhooks.deliver(self.endpoint.id), 1)
+        earlier = finish()
+        self.assertEqual(webhooks.deliver(self.endpoint.id), 1)
+
+        self.assertGreater(later.id, earlier.id)
+        self.assertEqual(
+            [request['body']['events'][0]['id']
+             for request in self.server.received],
+            [later.id, earlier.id])
+
+    def test_single_lease(self):
+        """Test an endpoint is only leased to one thread at a time."""
+        self.assertTrue(webhooks.lease(self.endpoint.id))
+        self.assertFalse(webhooks.lease(self.endpoint.id))
+        self.assertEqual(webhooks.due_endpoints(), [])
+
+    def test_new_endpoint_skips_old_events(self):
+        """Test a new endpoint only gets events recorded after it."""
+        event, = self.record(1)
+
+        endpoint = self.create_endpoint(self.server)
+
+        event.refresh_from_db()
+        self.assertEqual(endpoint.last_event_id, event.id)
+        self.assertEqual(endpoint.last_xact_id, event.xact_id)
+        self.assertEqual(webhooks.deliver(endpoint.id), 0)
+
+    def test_purge_delivered_events(self):
+        """Test old events are deleted once every endpoint has them."""
+        old, new = self.record(2)
+        OutboxEvent.objects.update(
+            created_at=timezone.now() - timedelta(days=30))
+
+        old.refresh_from_db()
+        WebhookEndpoint.objects.update(
+            last_xact_id=old.xact_id, last_event_id=old.id)
+        self.assertEqual(webhooks.purge_events(), 1)
+        self.assertEqual(list(OutboxEvent.objects.all()), [new])
+
+
+class DispatchWebhooksTests(StandInServerMixin, TransactionTestCase):
+    """Tests for the dispatch_webhooks command."""
+
+    @override_settings(WEBHOOK_BATCH_SIZE=2)
+    def test_dispatch(self):
+        """Test every event is delivered to every endpoint."""
+        server = self.start_server()
+        endpoints = [self.create_endpoint(server) for _ in range(2)]
+        events = [outbox.record('tag.deleted', 1, i) for i in range(3)]
+
+        out = StringIO()
+        call_command('dispatch_webhooks', once=True, stdout=out)
+
+        self.assertIn('Delivered 6 events', out.getvalue())
+        self.assertEqual(len(server.received), 4)
+        for endpoint in endpoints:
+            endpoint.refresh_from_db()
+            self.assertEqual(endpoint.last_event_id, events[-1].id)
@@ -0,0 +1,258 @@
+"""
+Throttling for the API.
+
+Rates use a sliding window counter: the count of the current fixed window
+plus the previous window's count weighted by how much of it still overlaps
+the sliding window. Counters live in a per-process store by default, or in
+the Django cache named by the THROTTLE_CACHE setting when limits must be
+shared between workers.
+
+Throttles are checked before authentication by views with
+EarlyThrottleMixin; UserRateThrottle reads the user from the signature
+of their token, so a rejected request costs no database work.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.authentication import get_authorization_header
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from core import tokens
+from core.authentication import SignedTokenAuthentication
+
+
+class LocalCounterStore:
+    """Per-process sliding window counters.
+
+    Each key maps to a small list that is only mutated in place, so no
+    lock is taken; concurrent threads can at worst lose a hit, which only
+    makes the limit slightly more lenient. Once max_keys counters are
+    kept, those past their window are dropped, and then the oldest.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._counters = {}
+
+    def hit(self, key, duration, limit, now=None):
+        """Record a hit and return (allowed, seconds to wait)."""
+        now = time.time() if now is None else now
+        window = int(now // duration)
+        counter = self._counters.get(key)
+        if counter is None:
+            if len(self._counters) >= self.max_keys:
+                self.prune(now)
+            counter = self._counters.setdefault(
+                key, [window, 0, 0, duration])
+
+        if counter[0] != window:
+            previous = counter[2] if counter[0] == window - 1 else 0
+            counter[0], counter[1], counter[2] = window, previous, 0
+
+        return _record(counter, now, duration, limit)
+
+    def prune(self, now):
+        """Drop counters that no longer affect their own window.
+
+        If every counter is still live, the oldest are dropped to make
+        room, which only lets their keys make a few requests more.
+        """
+        for key, (window, _, _, duration) in list(self._counters.items()):
+            if (window + 2) * duration <= now:
+                self._counters.pop(key, None)
+        excess = len(self._counters) - self.max_keys + 1
+        if excess > 0:
+            for key in list(self._counters)[:excess]:
+                self._counters.pop(key, None)
+
+    def clear(self):
+        """Forget every counter."""
+        self._counters.clear()
+
+
+class CacheCounterStore:
+    """Sliding window counters kept in a shared Django cache.
+
+    Hits are counted with the cache's incr, so the cache should make it
+    atomic, as memcached does; see core.checks.
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def hit(self, key, duration, limit, now=None):
+        """Record a hit and return (allowed, seconds to wait)."""
+        now = time.time() if now is None else now
+        window = int(now // duration)
+        prefix = f'throttle:{key}:{duration}'
+        current_key = f'{prefix}:{window}'
+        # Counted first, so concurrent hits each see the ones before.
+        current = self._incr(current_key, duration * 2)
+        previous = self.cache.get(f'{prefix}:{window - 1}', 0)
+
+        allowed, wait = _record(
+            [window, previous, current - 1], now, duration, limit)
+        if not allowed:
+            # Rejected hits do not count against the limit.
+            try:
+                self.cache.decr(current_key)
+            except ValueError:
+                pass
+        return allowed, wait
+
+    def _incr(self, key, timeout):
+        """Increment the counter at key, creating it, and return it."""
+        while True:
+            if self.cache.add(key, 1, timeout=timeout):
+                return 1
+            try:
+                return self.cache.incr(key)
+            except ValueError:
+                # Expired between add() and incr().
+                continue
+
+
+def _record(counter, now, duration, limit):
+    """Apply a hit to a [window, previous, current, ...] counter."""
+    window, previous, current = counter[:3]
+    elapsed = now / duration - window
+    estimate = previous * (1 - elapsed) + current
+    if estimate + 1 > limit:
+        if current + 1 > limit or not previous:
+            wait = (1 - elapsed) * duration
+        else:
+            # Time until enough of the previous window slides out.
+            needed = (estimate + 1 - limit) / previous
+            wait = needed * duration
+        return False, wait
+    counter[2] = current + 1
+    return True, None
+
+
+local_store = LocalCounterStore()
+
+
+def get_store():
+    """Return the configured counter store."""
+    alias = getattr(settings, 'THROTTLE_CACHE', None)
+    if alias:
+        return CacheCounterStore(alias)
+    return local_store
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """Base class for sliding window throttles scoped by the view.
+
+    The view's `throttle_scope` names the rate in DEFAULT_THROTTLE_RATES.
+    """
+    pre_auth = False
+
+    def __init__(self):
+        # The rate depends on the view, it is set in allow_request().
+        self.wait_seconds = None
+
+    def get_rate(self):
+        """Return the configured rate for the scope."""
+        try:
+            return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        except KeyError:
+            msg = f'No default throttle rate set for {self.scope!r} scope'
+            raise ImproperlyConfigured(msg)
+
+    def allow_request(self, request, view):
+        """Return True if the request is within the rate limit."""
+        self.scope = getattr(view, 'throttle_scope', None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        allowed, self.wait_seconds = get_store().hit(
+            self.key, self.duration, self.num_requests)
+        return allowed
+
+    def wait(self):
+        """Return the number of seconds until the next request is allowed."""
+        return self.wait_seconds
+
+
+class AddressRateThrottle(SlidingWindowThrottle):
+    """Limit requests per client address.
+
+    Only looks at the request headers, so it runs before authentication.
+    """
+    pre_auth = True
+
+    def get_cache_key(self, request, view):
+        return f'{self.scope}:addr:{self.get_ident(request)}'
+
+
+class UserRateThrottle(SlidingWindowThrottle):
+    """Limit requests per user.
+
+    The user is read from the signature of their token, without a
+    database lookup, so it runs before authentication. Requests without
+    a signed token are limited per client address.
+    """
+    pre_auth = True
+
+    def get_cache_key(self, request, view):
+        user_id = token_user_id(request)
+        if user_id is not None:
+            return f'{self.scope}:user:{user_id}'
+        return f'{self.scope}:addr:{self.get_ident(request)}'
+
+
+def token_user_id(request):
+    """Return the user id of the request's signed token, or None."""
+    auth = get_authorization_header(request).split()
+    keyword = SignedTokenAuthentication.keyword.lower().encode()
+    if len(auth) != 2 or auth[0].lower() != keyword:
+        return None
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        return None
+    return tokens.signed_user_id(key) if tokens.is_signed(key) else None
+
+
+class EarlyThrottleMixin:
+    """Check throttles that do not need the user before authentication.
+
+    DRF checks throttles after authentication and permissions, so an
+    abusive client still costs a token lookup per request. Throttles with
+    `pre_auth` set run first instead.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        self._check_throttles(
+            request,
+            [t for t in self.get_throttles()
+             if getattr(t, 'pre_auth', False)],
+        )
+        super().initial(request, *args, **kwargs)
+
+    def check_throttles(self, request):
+        self._check_throttles(
+            request,
+            [t for t in self.get_throttles()
+             if not getattr(t, 'pre_auth', False)],
+        )
+
+    def _check_throttles(self, request, throttles):
+        durations = [
+            throttle.wait() for throttle in throttles
+            if not throttle.allow_request(request, self)
+        ]
+        if durations:
+            durations = [d for d in durations if d is not None]
+            self.throttled(request, max(durations, default=None))
@@ -0,0 +1,194 @@
+"""
+Expiring auth tokens signed with HMAC.
+
+A token carries the user id, when it was issued, its expiry and a random
+id, signed with SECRET_KEY, so it is validated without a database lookup.
+Revoked tokens are kept in a small table until they expire, and every
+process holds a copy of it in memory that it reloads every
+TOKEN_REVOCATION_SYNC_SECONDS. Revoking a user revokes the tokens issued
+to them before; their password changing, their deactivation and their
+deletion all do, so the user need not be loaded to authenticate them.
+"""
+import secrets
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+
+from core.models import RevokedToken
+from core.routers import DIRECTORY
+
+SALT = 'core.tokens'
+
+SignedToken = namedtuple(
+    'SignedToken', ['user_id', 'issued', 'expires', 'jti'])
+
+
+class InvalidToken(Exception):
+    """The token is malformed, tampered with, expired or revoked."""
+
+
+def is_signed(key):
+    """Return True if key looks like a signed token."""
+    return ':' in key
+
+
+def _signer():
+    return signing.Signer(salt=SALT)
+
+
+def _milliseconds(now):
+    return int(now * 1000)
+
+
+def issue(user):
+    """Return a new token for user and its expiry datetime."""
+    now = time.time()
+    expires = int(now) + settings.TOKEN_LIFETIME
+    token = _signer().sign(
+        f'{user.pk}:{_milliseconds(now)}:{expires}:{secrets.token_hex(8)}')
+    return token, datetime.fromtimestamp(expires, timezone.utc)
+
+
+def _parse(value):
+    user_id, issued, expires, jti = value.split(':')
+    return SignedToken(int(user_id), int(issued), int(expires), jti)
+
+
+def signed_user_id(token):
+    """Return the user id a signed token was issued to, or None.
+
+    Only the signature is checked, not expiry or revocation, so no
+    lookup is made; enough to rate limit by before authenticating.
+    """
+    try:
+        return _parse(_signer().unsign(token)).user_id
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def verify(token):
+    """Return the SignedToken for a valid token, or raise InvalidToken."""
+    try:
+        parsed = _parse(_signer().unsign(token))
+    except (signing.BadSignature, ValueError):
+        raise InvalidToken('Invalid token.')
+    if parsed.expires <= time.time():
+        raise InvalidToken('Token has expired.')
+    if revocations.is_revoked(parsed):
+        raise InvalidToken('Token has been revoked.')
+    return parsed
+
+
+def _user_key(user_id):
+    return f'user:{user_id}'
+
+
+def _revoke(key, expires, revoked_at):
+    RevokedToken.objects.update_or_create(
+        key=key,
+        defaults={
+            'expires_at': datetime.fromtimestamp(expires, timezone.utc),
+            'revoked_at': datetime.fromtimestamp(revoked_at, timezone.utc),
+        },
+    )
+    revocations.add(key, expires, revoked_at)
+
+
+def revoke(token):
+    """Revoke a single token until it expires."""
+    parsed = verify(token)
+    _revoke(parsed.jti, parsed.expires, time.time())
+
+
+def revoke_user(user):
+    """Revoke every token issued to user so far.
+
+    The revocation is kept until the last of those tokens expires; tokens
+    issued afterwards are valid.
+    """
+    now = time.time()
+    _revoke(_user_key(user.pk), int(now) + settings.TOKEN_LIFETIME, now)
+
+
+def revoke_on_change(sender, instance, created, raw, using, **kwargs):
+    """Revoke a user's tokens on a password change or deactivation.
+
+    Connected to post_save of the user model.
+    """
+    if created or raw or using != DIRECTORY:
+        return
+    deactivated = (
+        getattr(instance, '_saved_is_active', True)
+        and not instance.is_active)
+    # AbstractBaseUser.set_password() keeps the password in _password
+    # until the user is saved.
+    if deactivated or instance._password is not None:
+        revoke_user(instance)
+    instance._saved_is_active = instance.is_active
+
+
+def revoke_on_delete(sender, instance, using, **kwargs):
+    """Revoke a deleted user's tokens. Connected to post_delete."""
+    if using == DIRECTORY:
+        revoke_user(instance)
+
+
+def deferred_user(user_id):
+    """Return the user with every field deferred until it is accessed."""
+    return get_user_model().from_db(DIRECTORY, ['id'], [user_id])
+
+
+class RevocationSet:
+    """In-memory copy of the unexpired rows of RevokedToken."""
+
+    def __init__(self):
+        self._keys = {}
+        self._synced_at = None
+        self._lock = threading.Lock()
+
+    def add(self, key, expires, revoked_at):
+        self._keys[key] = (expires, _milliseconds(revoked_at))
+
+    def clear(self):
+        self._keys = {}
+        self._synced_at = None
+
+    def sync(self):
+        """Reload the revoked keys from the database."""
+        now = datetime.now(timezone.utc)
+        rows = RevokedToken.objects.filter(
+            expires_at__gt=now).values_list('key', 'expires_at', 'revoked_at')
+        self._keys = {
+            key: (expires.timestamp(), _milliseconds(revoked.timestamp()))
+            for key, expires, revoked in rows
+        }
+        self._synced_at = time.monotonic()
+
+    def _sync_if_due(self):
+        interval = settings.TOKEN_REVOCATION_SYNC_SECONDS
+        if (self._synced_at is not None
+                and time.monotonic() - self._synced_at < interval):
+            return
+        # One thread reloads; the others keep using the current copy.
+        if self._lock.acquire(blocking=self._synced_at is None):
+            try:
+                self.sync()
+            finally:
+                self._lock.release()
+
+    def is_revoked(self, token):
+        """Return True if the token or its user has been revoked."""
+        self._sync_if_due()
+        keys = self._keys
+        if token.jti in keys:
+            return True
+        user = keys.get(_user_key(token.user_id))
+        return user is not None and token.issued <= user[1]
+
+
+revocations = RevocationSet()
@@ -0,0 +1,100 @@
+"""
+Views for the core app.
+"""
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views import View
+from django.views.static import serve
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import batch, jobs, pool, schema
+from core.authentication import SignedTokenAuthentication
+from core.middleware import available_encoders, select_encoder
+from core.serializers import BatchSerializer, BatchResponseSerializer
+
+
+class DatabasePoolView(APIView):
+    """Report the database connection pool metrics"""
+    authentication_classes = (SignedTokenAuthentication,)
+    permission_classes = (permissions.IsAdminUser,)
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request):
+        """Return the metrics of every pool in this process"""
+        return Response(pool.stats())
+
+
+class JobQueueView(APIView):
+    """Report the background job queue metrics"""
+    authentication_classes = (SignedTokenAuthentication,)
+    permission_classes = (permissions.IsAdminUser,)
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request):
+        """Return the job counts and queue lag"""
+        return Response(jobs.stats())
+
+
+class BatchView(APIView):
+    """Run several API requests in one round trip"""
+    authentication_classes = (SignedTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+    batchable = False
+
+    @extend_schema(request=BatchSerializer, responses=BatchResponseSerializer)
+    def post(self, request):
+        """Run the requests and return their responses in order"""
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        specs = serializer.validated_data['requests']
+        return Response({'responses': batch.run_batch(request, specs)})
+
+
+def serve_media(request, path):
+    """Serve an uploaded file with far-future cache headers"""
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+class SchemaView(View):
+    """Serve the precomputed OpenAPI schema
+
+    YAML is served by default and JSON with ?format=json or an Accept
+    header asking for JSON.
+    """
+    batchable = False
+    encoders = available_encoders()
+
+    def get(self, request):
+        """Return the schema, compressed, or 304 if the client has it"""
+        document = schema.get_schema(self.get_format(request))
+        response = get_conditional_response(request, etag=document.etag)
+        if response is None:
+            encoder = select_encoder(request, self.encoders)
+            if encoder is None:
+                response = HttpResponse(
+                    document.content, content_type=document.content_type)
+            else:
+                response = HttpResponse(
+                    document.encode(encoder),
+                    content_type=document.content_type)
+                response['Content-Encoding'] = encoder.name
+        response['ETag'] = document.etag
+        response['Cache-Control'] = 'public, no-cache'
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
+
+    def get_format(self, request):
+        """Return the schema format requested by the client"""
+        fmt = request.GET.get('format')
+        if fmt in schema.RENDERERS:
+            return fmt
+        if 'json' in request.META.get('HTTP_ACCEPT', ''):
+            return 'json'
+        return 'yaml'
@@ -0,0 +1,96 @@
+"""
+Warm up the application before it serves requests.
+
+Does the one-off work of the first requests ahead of time: importing
+views and their dependencies, populating the URL resolvers, building
+serializer fields and model metadata caches, loading the OpenAPI schema
+and checking the database connections. The serve command runs it once
+in the master process so every forked worker starts warm.
+
+Apps can add their own steps with a warm_up() method on their AppConfig.
+"""
+import time
+
+from django.apps import apps
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from core import db, pool, schema
+
+
+def iter_views(patterns):
+    """Yield the view classes of the URL patterns, recursively."""
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_views(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            view_class = (getattr(pattern.callback, 'cls', None)
+                          or getattr(pattern.callback, 'view_class', None))
+            if view_class is not None:
+                yield view_class
+
+
+def warm_urls():
+    """Import every view and populate the resolvers."""
+    resolver = get_resolver()
+    # Populates the reverse lookups of every included URLconf.
+    resolver.reverse_dict
+
+
+def warm_models():
+    """Fill the model metadata caches."""
+    for model in apps.get_models():
+        model._meta.get_fields()
+
+
+def warm_serializers():
+    """Build the fields of every view's serializer once."""
+    for view_class in set(iter_views(get_resolver().url_patterns)):
+        serializer_class = getattr(view_class, 'serializer_class', None)
+        if serializer_class is not None:
+            serializer_class().fields
+
+
+def warm_schema():
+    """Load the OpenAPI schema, generating it if it was not precomputed."""
+    for fmt in schema.RENDERERS:
+        schema.get_schema(fmt)
+
+
+def warm_apps():
+    """Run the warm_up() step of every app that has one."""
+    for config in apps.get_app_configs():
+        if hasattr(config, 'warm_up'):
+            config.warm_up()
+
+
+def check_databases():
+    """Connect to every database once, then close the connections.
+
+    Connections must not be shared with forked processes, so they are
+    closed again; this only fails fast on a bad configuration.
+    """
+    for alias in connections:
+        db.ping(alias)
+    connections.close_all()
+    pool.close_all()
+
+
+STEPS = [
+    ('urls', warm_urls),
+    ('models', warm_models),
+    ('serializers', warm_serializers),
+    ('schema', warm_schema),
+    ('apps', warm_apps),
+    ('databases', check_databases),
+]
+
+
+def warm_up():
+    """Run every warmup step; return the seconds each one took."""
+    timings = {}
+    for name, step in STEPS:
+        started = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - started
+    return timings
@@ -0,0 +1,198 @@
+"""
+Delivery of outbox events to webhook endpoints.
+
+Each endpoint has a cursor, the transaction and id of the last event it
+acknowledged, and receives the events after it in (xact_id, id) order in
+batches of WEBHOOK_BATCH_SIZE. Ids are taken when events are written but
+become visible when their transaction commits, which can be out of order,
+so a cursor on ids alone would pass events committed late. Instead only
+events written by transactions older than the oldest one still running
+are delivered: those have all committed or rolled back, and any event
+written from now on has a higher transaction id, so none can appear
+behind the cursor. An endpoint
+is leased to one dispatcher thread at a time, so it never has more than
+one batch in flight and gets its events in order; a slow or failing
+endpoint only delays itself. Connections are kept alive per thread and
+reused for the next batch to the same host.
+"""
+import hashlib
+import hmac
+import http.client
+import random
+import threading
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import OutboxEvent, WebhookEndpoint
+from core.renderers import dumps
+
+SIGNATURE_HEADER = 'X-Webhook-Signature'
+
+_local = threading.local()
+
+
+def sign(secret, body):
+    """Return the signature header value for a request body."""
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return f'sha256={digest}'
+
+
+def _connection(url):
+    """Return a kept-alive connection to the host of url."""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    key = (url.scheme, url.netloc)
+    if key not in connections:
+        cls = (http.client.HTTPSConnection if url.scheme == 'https'
+               else http.client.HTTPConnection)
+        connections[key] = cls(url.netloc, timeout=settings.WEBHOOK_TIMEOUT)
+    return connections[key]
+
+
+def close_connections():
+    """Close the connections of the current thread."""
+    for connection in getattr(_local, 'connections', {}).values():
+        connection.close()
+    _local.connections = {}
+
+
+def post(url, body, headers):
+    """POST body to url and return the response status."""
+    url = urlsplit(url)
+    path = url.path or '/'
+    if url.query:
+        path = f'{path}?{url.query}'
+    connection = _connection(url)
+    for retry in (True, False):
+        try:
+            connection.request('POST', path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (http.client.RemoteDisconnected, BrokenPipeError,
+                ConnectionResetError):
+            # The server closed the kept-alive connection; reconnect once.
+            connection.close()
+            if not retry:
+                raise
+        except Exception:
+            connection.close()
+            raise
+
+
+def backoff(failures):
+    """Return the seconds to wait before retrying after failures."""
+    delay = settings.WEBHOOK_RETRY_BACKOFF * 2 ** (failures - 1)
+    return min(delay, settings.WEBHOOK_RETRY_BACKOFF_MAX) * random.uniform(
+        0.5, 1)
+
+
+def due_endpoints():
+    """Return the ids of the endpoints that can be delivered to now."""
+    now = timezone.now()
+    return list(
+        WebhookEndpoint.objects.filter(
+            is_active=True, next_attempt_at__lte=now, leased_until__lte=now,
+        ).values_list('id', flat=True)
+    )
+
+
+def lease(endpoint_id):
+    """Take the endpoint for this thread; return False if already taken."""
+    now = timezone.now()
+    return bool(WebhookEndpoint.objects.filter(
+        pk=endpoint_id, leased_until__lte=now,
+    ).update(
+        leased_until=now + timedelta(seconds=settings.WEBHOOK_TIMEOUT * 3)))
+
+
+def serialize(event):
+    return {
+        'id': event.id,
+        'event': event.event,
+        'user_id': event.user_id,
+        'object_id': event.object_id,
+        'data': event.data,
+        'created_at': event.created_at,
+    }
+
+
+def finished_horizon():
+    """Return the oldest transaction id still running, or the next one.
+
+    Every transaction with a lower id has committed or rolled back.
+    """
+    with connections[OutboxEvent.objects.db].cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint')
+        return cursor.fetchone()[0]
+
+
+def after_cursor(endpoint):
+    """Return the condition for the events after an endpoint's cursor."""
+    return Q(xact_id__gt=endpoint.last_xact_id) | Q(
+        xact_id=endpoint.last_xact_id, id__gt=endpoint.last_event_id)
+
+
+def deliver(endpoint_id):
+    """Send the next batch to a leased endpoint; return the events sent."""
+    endpoint = WebhookEndpoint.objects.get(pk=endpoint_id)
+    now = timezone.now()
+    events = list(
+        OutboxEvent.objects.filter(
+            after_cursor(endpoint), xact_id__lt=finished_horizon())
+        .order_by('xact_id', 'id')[:settings.WEBHOOK_BATCH_SIZE]
+    )
+    if not events:
+        endpoint.leased_until = now
+        endpoint.save(update_fields=['leased_until'])
+        return 0
+
+    body = dumps({'events': [serialize(event) for event in events]})
+    headers = {
+        'Content-Type': 'application/json',
+        SIGNATURE_HEADER: sign(endpoint.secret, body),
+    }
+    try:
+        status = post(endpoint.url, body, headers)
+        error = '' if 200 <= status < 300 else f'HTTP {status}'
+    except (OSError, http.client.HTTPException) as exc:
+        error = repr(exc)
+
+    now = timezone.now()
+    if error:
+        endpoint.failures += 1
+        endpoint.next_attempt_at = now + timedelta(
+            seconds=backoff(endpoint.failures))
+        sent = 0
+    else:
+        endpoint.failures = 0
+        endpoint.last_xact_id = events[-1].xact_id
+        endpoint.last_event_id = events[-1].id
+        endpoint.next_attempt_at = now
+        sent = len(events)
+    endpoint.last_error = error
+    endpoint.leased_until = now
+    endpoint.save(update_fields=[
+        'failures', 'last_xact_id', 'last_event_id', 'next_attempt_at',
+        'last_error', 'leased_until',
+    ])
+    return sent
+
+
+def purge_events():
+    """Delete old events that every active endpoint has received."""
+    cutoff = timezone.now() - timedelta(days=settings.WEBHOOK_RETENTION_DAYS)
+    condition = Q(created_at__lt=cutoff)
+    behind = WebhookEndpoint.objects.filter(is_active=True).order_by(
+        'last_xact_id', 'last_event_id').first()
+    if behind is not None:
+        condition &= ~after_cursor(behind)
+    deleted, _ = OutboxEvent.objects.filter(condition).delete()
+    return deleted
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def warm_up(self):
+        """Build the readers of the recipe endpoints."""
+        from recipe import serializers
+        from recipe.readers import get_reader
+        get_reader(serializers.RecipeSerializer)
+        get_reader(serializers.RecipeDetailSerializer)
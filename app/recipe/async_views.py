@@ -0,0 +1,195 @@
+"""
+ASGI-native read endpoints for recipes, tags and ingredients.
+
+Django 3.2 has no async ORM, so token lookups and queries run on a bounded
+thread pool (ASYNC_DB_THREADS) while the event loop keeps serving other
+connections. A slow client then holds an open socket, not a thread.
+"""
+import asyncio
+import contextvars
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.authentication import get_authorization_header
+
+from core import routers, sharding
+from core.authentication import SignedTokenAuthentication
+from core.models import Recipe, Tag, Ingredient
+from core.renderers import dumps
+from core.throttling import UserRateThrottle
+from recipe.readers import get_reader
+from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+
+
+_executor = None
+
+
+def get_executor():
+    """Return the thread pool used for database work."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_DB_THREADS,
+            thread_name_prefix='async-db',
+        )
+    return _executor
+
+
+def shutdown_executor():
+    """Stop the database thread pool."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def _call(context, func, args):
+    """Run func in a pool thread with the caller's context."""
+    close_old_connections()
+    try:
+        return context.run(func, *args)
+    finally:
+        close_old_connections()
+
+
+async def run_in_db_thread(func, *args):
+    """Run blocking database work without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(), _call, contextvars.copy_context(), func, args)
+
+
+def json_response(data, status=200, headers=None):
+    """Return a JSON response rendered with the fast renderer."""
+    response = HttpResponse(
+        dumps(data), status=status, content_type='application/json')
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+class AsyncReadView(View):
+    """Base class for token authenticated async read endpoints."""
+    http_method_names = ['get']
+    throttle_scope = 'recipe'
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Django 3.2 only detects async function views; mark the class
+        # based view so the handler awaits it instead of wrapping it.
+        view._is_coroutine = asyncio.coroutines._is_coroutine
+        return view
+
+    def authenticate(self, request):
+        """Return the user for the request's token."""
+        auth = get_authorization_header(request).split()
+        keyword = SignedTokenAuthentication.keyword.lower().encode()
+        if not auth or auth[0].lower() != keyword or len(auth) != 2:
+            raise exceptions.NotAuthenticated()
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        authentication = SignedTokenAuthentication()
+        user, _ = authentication.authenticate_credentials(key)
+        return user
+
+    def read(self, request, user, **kwargs):
+        """Return the data for the response."""
+        raise NotImplementedError
+
+    def handle(self, request, kwargs):
+        """Throttle, authenticate and read, in a database thread."""
+        throttle = UserRateThrottle()
+        if not throttle.allow_request(request, self):
+            raise exceptions.Throttled(throttle.wait())
+        request.user = self.authenticate(request)
+
+        # The thread runs in a copy of the context; no need to reset.
+        sharding.activate(request.user.pk)
+        if not routers.is_pinned_to_primary(request.user):
+            routers.read_from_replicas()
+        return self.read(request, request.user, **kwargs)
+
+    async def get(self, request, **kwargs):
+        try:
+            data = await run_in_db_thread(self.handle, request, kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+        return json_response(data)
+
+    def handle_exception(self, exc):
+        """Return the error response DRF would send for exc."""
+        headers = {}
+        if exc.status_code == 401:
+            headers['WWW-Authenticate'] = SignedTokenAuthentication.keyword
+        if getattr(exc, 'wait', None):
+            headers['Retry-After'] = str(math.ceil(exc.wait))
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {'detail': exc.detail}
+        return json_response(data, status=exc.status_code, headers=headers)
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        return super().http_method_not_allowed(request, *args, **kwargs)
+
+    async def options(self, request, *args, **kwargs):
+        return super().options(request, *args, **kwargs)
+
+
+class RecipeListView(AsyncReadView):
+    """List the authenticated user's recipes."""
+
+    def read(self, request, user):
+        reader = get_reader(RecipeSerializer)
+        fields = _select(reader, request)
+        queryset = Recipe.objects.filter(user=user).order_by('-id')
+        return reader.read(queryset, fields)
+
+
+class RecipeDetailView(AsyncReadView):
+    """Retrieve one of the authenticated user's recipes."""
+
+    def read(self, request, user, pk):
+        reader = get_reader(RecipeDetailSerializer)
+        fields = _select(reader, request)
+        results = reader.read(
+            Recipe.objects.filter(user=user, pk=pk), fields)
+        if not results:
+            raise exceptions.NotFound()
+        return results[0]
+
+
+class TagListView(AsyncReadView):
+    """List the authenticated user's tags."""
+
+    def read(self, request, user):
+        return list(
+            Tag.objects.filter(user=user).order_by('-name')
+            .values('id', 'name')
+        )
+
+
+class IngredientListView(AsyncReadView):
+    """List the authenticated user's ingredients."""
+
+    def read(self, request, user):
+        return list(
+            Ingredient.objects.filter(user=user).order_by('-name')
+            .values('id', 'name')
+        )
+
+
+def _select(reader, request):
+    """Return the fieldset requested by the query parameters."""
+    try:
+        return reader.select_from_params(request.GET)
+    except ValueError as exc:
+        raise exceptions.ValidationError({'fields': str(exc)})
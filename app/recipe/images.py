@@ -0,0 +1,105 @@
+"""
+Storage of recipe images under content-hashed names.
+
+Uploads are streamed to a temporary file in chunks and hashed on the way,
+so memory use does not grow with the image size. The file is then moved,
+not copied, to a name derived from its SHA-256. Names never change once
+written, so their URLs can be cached forever.
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import (SkipFile,
+                                             TemporaryFileUploadHandler)
+
+FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """Stream uploads to a temporary file, hashing them on the way."""
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.too_large = False
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.too_large = True
+            self.file.close()
+            raise SkipFile()
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.sha256.hexdigest()
+        return uploaded
+
+
+def image_name(digest, suffix, size=None):
+    """Return the storage name for an image or one of its thumbnails."""
+    size = f'-{size}' if size else ''
+    return f'recipes/{digest[:2]}/{digest}{size}{suffix}'
+
+
+def save_upload(uploaded):
+    """Store an uploaded image and return its name.
+
+    Raises ValueError if the file is not an image in a supported format.
+    """
+    # Pillow is imported on first use to keep it out of worker startup.
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        # Only the header is read here; pixels are decoded off-thread.
+        with Image.open(uploaded.temporary_file_path()) as image:
+            image_format = image.format
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise ValueError('Upload a valid image.')
+    if image_format not in FORMATS:
+        raise ValueError(f'{image_format} images are not supported.')
+
+    name = image_name(uploaded.sha256, FORMATS[image_format])
+    if not default_storage.exists(name):
+        name = default_storage.save(name, uploaded)
+    return name
+
+
+def make_thumbnails(name):
+    """Create the RECIPE_THUMBNAIL_SIZES thumbnails of a stored image.
+
+    Returns the names of the thumbnails keyed by size.
+    """
+    from PIL import Image, ImageOps
+
+    digest, suffix = os.path.splitext(os.path.basename(name))
+    sizes = sorted(settings.RECIPE_THUMBNAIL_SIZES, reverse=True)
+    thumbnails = {}
+    with default_storage.open(name) as source:
+        with Image.open(source) as image:
+            image_format = image.format
+            # Lets JPEG decode at a reduced scale, which is much faster.
+            image.draft('RGB', (sizes[0], sizes[0]))
+            picture = ImageOps.exif_transpose(image)
+    if image_format == 'GIF':
+        image_format, suffix = 'PNG', '.png'
+    for size in sizes:
+        # Each size is scaled down from the previous, larger one.
+        picture.thumbnail((size, size))
+        thumbnail = image_name(digest, suffix, size)
+        if not default_storage.exists(thumbnail):
+            buffer = BytesIO()
+            picture.save(buffer, image_format)
+            default_storage.save(thumbnail, ContentFile(buffer.getvalue()))
+        thumbnails[str(size)] = thumbnail
+    return thumbnails
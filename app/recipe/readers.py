@@ -0,0 +1,124 @@
+"""
+Read-optimized representations of recipes.
+
+Builds the same output as the recipe serializers from values() rows and
+one query per nested relation, instead of model instances and per-field
+serializer calls.
+"""
+from functools import lru_cache
+
+from rest_framework import serializers
+
+from core.models import Recipe
+from recipe.serializers import MediaURLField
+
+
+NESTED_FIELDS = ('tags', 'ingredients')
+
+
+def _split_param(value):
+    """Split a comma separated query parameter."""
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class RecipeReader:
+    """Build recipe representations for a serializer class."""
+
+    def __init__(self, serializer_class):
+        fields = serializer_class().fields
+        self.fields = list(serializer_class.Meta.fields)
+        self.converters = {
+            name: field.to_representation
+            for name, field in fields.items()
+            if isinstance(field, (serializers.DecimalField, MediaURLField))
+        }
+
+    def related_map(self, name, recipe_ids, user_ids):
+        """Return the nested items of an m2m field keyed by recipe id.
+
+        The rows are also filtered by the recipes' users, so only their
+        partitions of the join table are read.
+        """
+        field = Recipe._meta.get_field(name)
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        rows = (
+            field.remote_field.through.objects
+            .filter(**{f'{source}_id__in': recipe_ids})
+            .filter(user_id__in=user_ids)
+            .order_by('pk')
+            .values_list(f'{source}_id', f'{target}_id', f'{target}__name')
+        )
+        related = {recipe_id: [] for recipe_id in recipe_ids}
+        for recipe_id, item_id, item_name in rows:
+            related[recipe_id].append({'id': item_id, 'name': item_name})
+        return related
+
+    def select(self, fields=None, expand=None):
+        """Return the fields to include for the requested fieldset.
+
+        Without a fieldset every field is included. `fields` narrows the
+        output to the named fields and `expand` adds nested relations to
+        it; `expand` on its own selects all scalar fields plus the named
+        relations.
+        """
+        if fields is None and expand is None:
+            return self.fields
+
+        requested = set(fields or []) | set(expand or [])
+        unknown = requested - set(self.fields)
+        if unknown:
+            raise ValueError(
+                f'Unknown fields: {", ".join(sorted(unknown))}')
+        not_nested = set(expand or []) - set(NESTED_FIELDS)
+        if not_nested:
+            raise ValueError(
+                f'Cannot expand: {", ".join(sorted(not_nested))}')
+
+        if fields is None:
+            requested |= {
+                name for name in self.fields if name not in NESTED_FIELDS}
+        return [name for name in self.fields if name in requested]
+
+    def select_from_params(self, params):
+        """Return the fields requested by ?fields= and ?expand=."""
+        return self.select(
+            fields=_split_param(params.get('fields')),
+            expand=_split_param(params.get('expand')),
+        )
+
+    def read(self, queryset, fields=None):
+        """Return the representation of every recipe in the queryset."""
+        fields = self.fields if fields is None else fields
+        scalars = [name for name in fields if name not in NESTED_FIELDS]
+        nested = [name for name in fields if name in NESTED_FIELDS]
+        rows = list(queryset.values(
+            *dict.fromkeys(['id', 'user_id', *scalars])))
+        if not rows:
+            return []
+
+        ids = [row['id'] for row in rows]
+        user_ids = {row['user_id'] for row in rows}
+        related = {
+            name: self.related_map(name, ids, user_ids) for name in nested}
+        converters = self.converters
+        results = []
+        for row in rows:
+            item = {}
+            for name in fields:
+                if name in related:
+                    item[name] = related[name][row['id']]
+                elif name in converters and row[name] is not None:
+                    item[name] = converters[name](row[name])
+                else:
+                    item[name] = row[name]
+            results.append(item)
+        return results
+
+
+@lru_cache(maxsize=None)
+def get_reader(serializer_class):
+    """Return the shared reader for a serializer class."""
+    return RecipeReader(serializer_class)
@@ -1,9 +1,21 @@
 """
 Serializer definitions for the recipe app.
 """
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 
-from core.models import Recipe,Tag,Ingredient
+from core.models import (Recipe, RecipeIngredient, RecipeTag, Tag,
+                         Ingredient)
+
+
+class MediaURLField(serializers.ReadOnlyField):
+    """URL of a stored file, or of each file in a dict of names"""
+
+    def to_representation(self, value):
+        if isinstance(value, dict):
+            return {key: default_storage.url(name)
+                    for key, name in value.items()}
+        return default_storage.url(str(value)) if value else None
 
 class IngredientSerializer(serializers.ModelSerializer):
     """Ingredient serializer"""
@@ -36,22 +48,30 @@ class RecipeSerializer(serializers.ModelSerializer):
     def _get_or_create_tags(self, tags, recipe):
         """Handle getting or creating tags as needed"""
         auth_user = self.context['request'].user
+        rows = []
         for tag in tags:
             tag_obj, created = Tag.objects.get_or_create(
                 user=auth_user,
                 **tag,
             )
-            recipe.tags.add(tag_obj)
+            rows.append(RecipeTag(
+                recipe=recipe, tag=tag_obj, user_id=recipe.user_id))
+        # Inserted with the recipe's user, the join table's partition key.
+        RecipeTag.objects.bulk_create(rows, ignore_conflicts=True)
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """Handle getting or creating ingredientas needed"""
         auth_user = self.context['request'].user
+        rows = []
         for ingredient in ingredients:
             ingredient_obj, created = Ingredient.objects.get_or_create(
                 user=auth_user,
                 **ingredient,
             )
-            recipe.ingredients.add(ingredient_obj)
+            rows.append(RecipeIngredient(
+                recipe=recipe, ingredient=ingredient_obj,
+                user_id=recipe.user_id))
+        RecipeIngredient.objects.bulk_create(rows, ignore_conflicts=True)
 
 
 
@@ -71,11 +91,13 @@ class RecipeSerializer(serializers.ModelSerializer):
         ingredients = validated_data.pop('ingredients', None)
 
         if tags is not None:
-            instance.tags.clear()
+            RecipeTag.objects.filter(
+                user_id=instance.user_id, recipe=instance).delete()
             self._get_or_create_tags(tags, instance)
 
         if ingredients is not None:
-            instance.ingredients.clear()
+            RecipeIngredient.objects.filter(
+                user_id=instance.user_id, recipe=instance).delete()
             self._get_or_create_ingredients(ingredients, instance)
 
         for attr, value, in validated_data.items():
@@ -84,14 +106,44 @@ class RecipeSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
+    def to_representation(self, instance):
+        """Represent the recipe, reading its relations with its user.
+
+        Only the user's partition of the join tables is then scanned.
+        """
+        if isinstance(instance, Recipe) and instance.pk is not None:
+            instance._prefetched_objects_cache = {
+                'tags': Tag.objects.filter(
+                    recipetag__user_id=instance.user_id,
+                    recipetag__recipe_id=instance.pk),
+                'ingredients': Ingredient.objects.filter(
+                    recipeingredient__user_id=instance.user_id,
+                    recipeingredient__recipe_id=instance.pk),
+            }
+        return super().to_representation(instance)
+
 
 
 
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for Recipe detail view."""
+    image = MediaURLField()
+    thumbnails = MediaURLField()
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description']
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'thumbnails']
+
+
+class RecipeImageSerializer(serializers.ModelSerializer):
+    """Serializer for uploading images to recipes."""
+    image = serializers.ImageField()
+    thumbnails = MediaURLField()
+
+    class Meta:
+        model = Recipe
+        fields = ['id', 'image', 'thumbnails']
+        read_only_fields = ['id']
 
 
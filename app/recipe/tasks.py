@@ -0,0 +1,22 @@
+"""
+Background tasks for the recipe app.
+"""
+from core import jobs, sharding
+from core.models import Recipe
+from recipe import images
+
+
+@jobs.task
+def make_thumbnails(recipe_id, image, user_id=None):
+    """Create the thumbnails of a recipe image."""
+    thumbnails = images.make_thumbnails(image)
+    # The image may have been replaced while the thumbnails were made.
+    # Jobs queued before sharding carry no user_id; they are on default.
+    if user_id is None:
+        Recipe.objects.filter(pk=recipe_id, image=image).update(
+            thumbnails=thumbnails)
+        return
+    with sharding.use_shard(user_id):
+        Recipe.objects.filter(
+            user_id=user_id, pk=recipe_id, image=image).update(
+                thumbnails=thumbnails)
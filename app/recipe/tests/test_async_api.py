@@ -0,0 +1,130 @@
+"""
+Tests for the async read endpoints.
+"""
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe, Tag, Ingredient
+from core.renderers import FastJSONRenderer
+from recipe import async_views
+from recipe.serializers import (RecipeSerializer,
+                                RecipeDetailSerializer,
+                                TagSerializer)
+
+RECIPES_URL = reverse('recipe:async-recipe-list')
+TAGS_URL = reverse('recipe:async-tag-list')
+INGREDIENTS_URL = reverse('recipe:async-ingredient-list')
+
+
+def detail_url(recipe_id):
+    """Create and return an async recipe detail url"""
+    return reverse('recipe:async-recipe-detail', args=[recipe_id])
+
+
+class AsyncReadApiTests(TransactionTestCase):
+    """Test the async read endpoints"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='async@example.com', password='test123password')
+        self.token = Token.objects.create(user=self.user)
+        self.client = AsyncClient()
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Red red',
+            time_minutes=45,
+            price=Decimal('7.25'),
+            description='Beans and plantain',
+        )
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        Ingredient.objects.create(user=self.user, name='Plantain')
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='test123password')
+        self.other_recipe = Recipe.objects.create(
+            user=other, title='Other', time_minutes=1, price=Decimal('1'))
+        self.expected_list = FastJSONRenderer().render(RecipeSerializer(
+            Recipe.objects.filter(user=self.user), many=True).data)
+        self.expected_detail = FastJSONRenderer().render(
+            RecipeDetailSerializer(self.recipe).data)
+        self.expected_tags = TagSerializer(
+            Tag.objects.filter(user=self.user), many=True).data
+
+    def tearDown(self):
+        async_views.shutdown_executor()
+
+    def get(self, url, data=None, token=None):
+        """Make an authenticated GET request"""
+        token = token or self.token.key
+        if data:
+            # The 3.2 AsyncClient sends data as a header, not a query string
+            url = f'{url}?{urlencode(data)}'
+        return self.client.get(url, authorization=f'Token {token}')
+
+    async def test_auth_required(self):
+        """Test authentication is required"""
+        res = await self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+    async def test_invalid_token(self):
+        """Test an unknown token is rejected"""
+        res = await self.get(RECIPES_URL, token='invalid')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_list_recipes(self):
+        """Test the list matches the sync endpoint"""
+        res = await self.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, self.expected_list)
+
+    async def test_recipe_detail(self):
+        """Test retrieving a recipe"""
+        res = await self.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, self.expected_detail)
+
+    async def test_recipe_detail_other_user(self):
+        """Test another user's recipe is not found"""
+        res = await self.get(detail_url(self.other_recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_recipe_fields(self):
+        """Test sparse fieldsets are supported"""
+        res = await self.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.json(), [
+            {'id': self.recipe.id, 'title': 'Red red'}])
+
+    async def test_recipe_unknown_field(self):
+        """Test an unknown field returns an error"""
+        res = await self.get(RECIPES_URL, {'fields': 'nope'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_list_tags_and_ingredients(self):
+        """Test tags and ingredients are listed"""
+        res_tags = await self.get(TAGS_URL)
+        res_ingredients = await self.get(INGREDIENTS_URL)
+
+        self.assertEqual(res_tags.json(), self.expected_tags)
+        self.assertEqual(res_ingredients.json()[0]['name'], 'Plantain')
+
+    async def test_post_not_allowed(self):
+        """Test the async endpoints are read only"""
+        res = await self.client.post(
+            RECIPES_URL, {'title': 'New'},
+            authorization=f'Token {self.token.key}',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -0,0 +1,138 @@
+"""
+Tests for recipe image uploads.
+"""
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Job, Recipe
+from recipe import tasks
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def make_image(size=(1200, 800), image_format='JPEG'):
+    """Return a temporary image file"""
+    image_file = tempfile.NamedTemporaryFile(suffix='.img')
+    Image.new('RGB', size, (200, 80, 40)).save(image_file, image_format)
+    image_file.seek(0)
+    return image_file
+
+
+class ImageUploadTests(TestCase):
+    """Tests for the image upload API."""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='test123password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('2.00'))
+
+    def upload(self, image_file):
+        """Upload an image to the test recipe"""
+        return self.client.post(
+            image_upload_url(self.recipe.id), {'image': image_file},
+            format='multipart')
+
+    def test_upload_image(self):
+        """Test uploading stores the image and queues its thumbnails."""
+        with make_image() as image_file:
+            res = self.upload(image_file)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recipe.refresh_from_db()
+        self.assertTrue(default_storage.exists(self.recipe.image.name))
+        self.assertRegex(
+            res.data['image'], r'^/media/recipes/[0-9a-f]{2}/[0-9a-f]{64}'
+                               r'\.jpg$')
+        self.assertEqual(res.data['thumbnails'], {})
+        job = Job.objects.get()
+        self.assertEqual(job.task, tasks.make_thumbnails.task_name)
+
+    def test_same_image_same_url(self):
+        """Test identical uploads share one content-hashed file."""
+        with make_image() as image_file:
+            first = self.upload(image_file)
+        with make_image() as image_file:
+            second = self.upload(image_file)
+
+        self.assertEqual(first.data['image'], second.data['image'])
+
+    def test_make_thumbnails(self):
+        """Test a thumbnail is made for every configured size."""
+        with make_image() as image_file:
+            self.upload(image_file)
+        job = Job.objects.get()
+
+        tasks.make_thumbnails(**job.payload)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            sorted(self.recipe.thumbnails, key=int), ['160', '480', '960'])
+        with default_storage.open(self.recipe.thumbnails['160']) as thumb:
+            self.assertEqual(Image.open(thumb).size, (160, 107))
+        res = self.client.get(
+            reverse('recipe:recipe-detail', args=[self.recipe.id]))
+        self.assertEqual(
+            res.data['thumbnails']['960'],
+            default_storage.url(self.recipe.thumbnails['960']))
+
+    def test_stale_thumbnails_discarded(self):
+        """Test thumbnails of a replaced image are not saved."""
+        with make_image() as image_file:
+            self.upload(image_file)
+        payload = Job.objects.get().payload
+        Recipe.objects.filter(pk=self.recipe.pk).update(image='other.jpg')
+
+        tasks.make_thumbnails(**payload)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.thumbnails, {})
+
+    def test_upload_image_bad_request(self):
+        """Test uploading an invalid image."""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as bad_file:
+            bad_file.write(b'notanimage')
+            bad_file.seek(0)
+            res = self.upload(bad_file)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=100)
+    def test_upload_too_large(self):
+        """Test images over the size limit are rejected."""
+        with make_image() as image_file:
+            res = self.upload(image_file)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('limited', res.data['image'][0])
+
+    def test_media_cache_headers(self):
+        """Test uploaded images are served with long cache lifetimes."""
+        with make_image() as image_file:
+            url = self.upload(image_file).data['image']
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('immutable', res['Cache-Control'])
@@ -39,9 +39,12 @@ class PublicIngredientAPITest(TestCase):
 class PrivateIngredientApiTest(TestCase):
     """Test authenticated api request"""
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
     def setUp(self):
-        self.user = create_user()
-        self.client =APIClient()
+        self.client = APIClient()
         self.client.force_authenticate(self.user )
 
     def test_retrieve_ingredients(self):
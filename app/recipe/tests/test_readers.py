@@ -0,0 +1,189 @@
+"""
+Tests for the read-optimized recipe representations.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from core.renderers import FastJSONRenderer
+from recipe.readers import get_reader
+from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def render(data):
+    """Render data the way the API does"""
+    return FastJSONRenderer().render(data)
+
+
+class RecipeReaderTests(TestCase):
+    """Test the reader output matches the serializers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='reader@example.com', password='test123password')
+        tags = [Tag.objects.create(user=cls.user, name=name)
+                for name in ('Vegan', 'Dinner', 'Quick')]
+        ingredients = [Ingredient.objects.create(user=cls.user, name=name)
+                       for name in ('Salt', 'Pepper')]
+        for i in range(4):
+            recipe = Recipe.objects.create(
+                user=cls.user,
+                title=f'Recipe {i}',
+                time_minutes=10 + i,
+                price=Decimal('4.5') + i,
+                description=f'Description {i}',
+                link='' if i % 2 else 'https://example.com/recipe.pdf',
+            )
+            recipe.tags.add(*tags[:i])
+            recipe.ingredients.add(*ingredients[:i % 3])
+
+    def setUp(self):
+        self.queryset = Recipe.objects.filter(user=self.user).order_by('-id')
+
+    def test_list_matches_serializer(self):
+        """Test the list representation is byte identical"""
+        expected = RecipeSerializer(self.queryset, many=True).data
+
+        res = get_reader(RecipeSerializer).read(self.queryset)
+
+        self.assertEqual(render(res), render(expected))
+
+    def test_detail_matches_serializer(self):
+        """Test the detail representation is byte identical"""
+        for recipe in self.queryset:
+            expected = RecipeDetailSerializer(recipe).data
+
+            res = get_reader(RecipeDetailSerializer).read(
+                self.queryset.filter(pk=recipe.pk))
+
+            self.assertEqual(render(res[0]), render(expected))
+
+    def test_empty_queryset(self):
+        """Test reading an empty queryset"""
+        res = get_reader(RecipeSerializer).read(self.queryset.none())
+
+        self.assertEqual(res, [])
+
+    def test_list_query_count(self):
+        """Test the list uses a fixed number of queries"""
+        with self.assertNumQueries(3):
+            get_reader(RecipeSerializer).read(self.queryset)
+
+    def test_api_responses_match_serializer(self):
+        """Test the endpoints return the serializer output"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        recipe = self.queryset.first()
+
+        res_list = client.get(RECIPES_URL)
+        res_detail = client.get(detail_url(recipe.id))
+
+        self.assertEqual(res_list.content, render(
+            RecipeSerializer(self.queryset, many=True).data))
+        self.assertEqual(res_detail.content, render(
+            RecipeDetailSerializer(recipe).data))
+
+    def test_detail_invalid_id(self):
+        """Test a non numeric id returns 404"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(detail_url('abc'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SparseFieldsetTests(TestCase):
+    """Test the ?fields= and ?expand= parameters"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            email='fields@example.com', password='test123password')
+        cls.recipe = Recipe.objects.create(
+            user=cls.user,
+            title='Waakye',
+            time_minutes=40,
+            price=Decimal('6.00'),
+            description='Rice and beans',
+        )
+        cls.recipe.tags.add(Tag.objects.create(user=cls.user, name='Lunch'))
+        cls.recipe.ingredients.add(
+            Ingredient.objects.create(user=cls.user, name='Beans'))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_fields_narrow_output(self):
+        """Test only the requested fields are returned"""
+        res = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), [
+            {'id': self.recipe.id, 'title': 'Waakye'},
+        ])
+
+    def test_expand_selects_nested(self):
+        """Test expand adds only the named relation"""
+        res = self.client.get(detail_url(self.recipe.id), {'expand': 'tags'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('description', res.data)
+        self.assertEqual(res.data['tags'], [
+            {'id': self.recipe.tags.get().id, 'name': 'Lunch'}])
+        self.assertNotIn('ingredients', res.data)
+
+    def test_fields_with_expand(self):
+        """Test combining fields and expand"""
+        res = self.client.get(
+            RECIPES_URL, {'fields': 'title', 'expand': 'ingredients'})
+
+        self.assertEqual(list(res.data[0]), ['title', 'ingredients'])
+
+    def test_fields_narrow_queries(self):
+        """Test unrequested relations are not queried"""
+        reader = get_reader(RecipeSerializer)
+        queryset = Recipe.objects.filter(user=self.user)
+
+        with self.assertNumQueries(1):
+            reader.read(queryset, reader.select(fields=['id', 'title']))
+        with self.assertNumQueries(2):
+            reader.read(queryset, reader.select(expand=['tags']))
+
+    def test_fields_select_columns(self):
+        """Test only the requested columns are selected"""
+        reader = get_reader(RecipeSerializer)
+        queryset = Recipe.objects.filter(user=self.user)
+
+        with self.assertNumQueries(1) as ctx:
+            reader.read(queryset, reader.select(fields=['title']))
+
+        sql = ctx.captured_queries[0]['sql']
+        self.assertIn('"title"', sql)
+        self.assertNotIn('"price"', sql)
+
+    def test_unknown_field_error(self):
+        """Test an unknown field returns an error"""
+        res = self.client.get(RECIPES_URL, {'fields': 'id,secret'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expand_scalar_error(self):
+        """Test expanding a non nested field returns an error"""
+        res = self.client.get(RECIPES_URL, {'expand': 'title'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
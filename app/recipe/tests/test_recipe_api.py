@@ -62,10 +62,13 @@ class PublicRecipeApiTests(TestCase):
 class PrivateRecipeApiTests(TestCase):
     """Test the recipe API (private)"""
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(
+            email='test@example.com', password='test123password')
+
     def setUp(self):
         self.client = APIClient()
-        self.user = create_user(
-            email='test@example.com',password='test123password')
         self.client.force_authenticate(self.user)
 
     def test_retrieve_recipes(self):
@@ -194,6 +197,9 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(res.status_code,status.HTTP_204_NO_CONTENT)
         self.assertFalse(Recipe.objects.filter(id=recipe.id).exists())
         self.assertTrue(get_user_model().objects.filter(id=self.user.id).exists())
+        recipe = Recipe.all_objects.get(id=recipe.id)
+        self.assertEqual(recipe.status, Recipe.ARCHIVED)
+        self.assertIsNotNone(recipe.archived_at)
 
 
 
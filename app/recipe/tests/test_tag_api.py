@@ -39,8 +39,11 @@ class PublicTagApiTest(TestCase):
 class PrivateTagApiTest(TestCase):
     """Test authenticated Api request"""
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
     def setUp(self):
-        self.user = create_user()
         self.client = APIClient()
         self.client.force_authenticate(self.user)
 
@@ -4,7 +4,7 @@ URL configuration for the recipe app.
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from recipe import views
+from recipe import async_views, views
 
 router = DefaultRouter()
 router.register('recipes', views.RecipeViewSet)
@@ -15,4 +15,24 @@ app_name = 'recipe'
 
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+    path(
+        'async/recipes/',
+        async_views.RecipeListView.as_view(),
+        name='async-recipe-list',
+    ),
+    path(
+        'async/recipes/<int:pk>/',
+        async_views.RecipeDetailView.as_view(),
+        name='async-recipe-detail',
+    ),
+    path(
+        'async/tags/',
+        async_views.TagListView.as_view(),
+        name='async-tag-list',
+    ),
+    path(
+        'async/ingredients/',
+        async_views.IngredientListView.as_view(),
+        name='async-ingredient-list',
+    ),
+]
@@ -1,21 +1,80 @@
 """
 Views for managing recipes in the application.
 """
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import (extend_schema,
+                                   extend_schema_view,
+                                   OpenApiParameter,)
 from rest_framework import (viewsets,
-                            mixins,)
-from rest_framework.authentication import TokenAuthentication
+                            mixins,
+                            status,)
+from rest_framework import serializers as drf_serializers
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
+from core import archive, idempotency, jobs, sharding
+from core.authentication import SignedTokenAuthentication
 from core.models import (Recipe, Tag, Ingredient)
-from recipe import serializers
+from core.outbox import OutboxMixin
+from core.routers import ReplicaReadMixin
+from core.throttling import EarlyThrottleMixin, UserRateThrottle
+from recipe import images, serializers, tasks
+from recipe.readers import get_reader
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='Comma separated list of fields to return.',
+    ),
+    OpenApiParameter(
+        'expand',
+        OpenApiTypes.STR,
+        description='Comma separated list of nested relations to include '
+                    '(tags, ingredients).',
+    ),
+]
+
+
+IDEMPOTENCY_PARAMETERS = [
+    OpenApiParameter(
+        idempotency.HEADER,
+        OpenApiTypes.STR,
+        OpenApiParameter.HEADER,
+        description='Key of the request; repeats with the same key get '
+                    'the first response back instead of running again.',
+    ),
+]
+
+
+@extend_schema_view(
+    list=extend_schema(parameters=FIELDSET_PARAMETERS),
+    retrieve=extend_schema(parameters=FIELDSET_PARAMETERS),
+    create=extend_schema(parameters=IDEMPOTENCY_PARAMETERS),
+    update=extend_schema(parameters=IDEMPOTENCY_PARAMETERS),
+    partial_update=extend_schema(parameters=IDEMPOTENCY_PARAMETERS),
+    upload_image=extend_schema(parameters=IDEMPOTENCY_PARAMETERS),
+)
+class RecipeViewSet(EarlyThrottleMixin,
+                    idempotency.IdempotencyMixin,
+                    OutboxMixin,
+                    sharding.ShardMixin,
+                    ReplicaReadMixin,
+                    viewsets.ModelViewSet):
     """View for managing recipes API."""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication, )
+    authentication_classes = (SignedTokenAuthentication, )
     permission_classes = (IsAuthenticated,)
+    throttle_classes = (UserRateThrottle,)
+    throttle_scope = 'recipe'
+    outbox_name = 'recipe'
 
     def get_queryset(self):
         """Retrieve recipes for authenticated user."""
@@ -26,36 +85,123 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Return appropriate serializer class."""
         if self.action == 'list':
             return serializers.RecipeSerializer
+        elif self.action == 'upload_image':
+            return serializers.RecipeImageSerializer
         return self.serializer_class
 
+    def get_fieldset(self, reader):
+        """Return the fields requested with ?fields= and ?expand=."""
+        try:
+            return reader.select_from_params(self.request.query_params)
+        except ValueError as exc:
+            raise drf_serializers.ValidationError({'fields': str(exc)})
+
+    def list(self, request, *args, **kwargs):
+        """List recipes through the read-optimized path."""
+        queryset = self.filter_queryset(self.get_queryset())
+        reader = get_reader(self.get_serializer_class())
+        fields = self.get_fieldset(reader)
+        return Response(reader.read(queryset, fields))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a recipe through the read-optimized path."""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        reader = get_reader(self.get_serializer_class())
+        fields = self.get_fieldset(reader)
+        try:
+            results = reader.read(queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}), fields)
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        if not results:
+            raise Http404
+        return Response(results[0])
+
     def perform_create(self, serializer):
         """Create a new recipe."""
         serializer.save(user=self.request.user)
 
-class TagViewSet(mixins.DestroyModelMixin,
+    def perform_destroy(self, instance):
+        """Archive the recipe; archive_recipes moves it out later."""
+        archive.archive(instance)
+
+    @action(methods=['POST'], detail=True, url_path='upload-image',
+            parser_classes=[MultiPartParser])
+    def upload_image(self, request, pk=None):
+        """Upload an image; its thumbnails are made in the background."""
+        # Set before the body is read, which the idempotency key does.
+        handler = images.HashingUploadHandler(request._request)
+        request._request.upload_handlers = [handler]
+        return self._idempotent(self.store_image, request, handler)
+
+    def store_image(self, request, handler):
+        """Store the uploaded image and queue its thumbnails."""
+        recipe = self.get_object()
+        uploaded = request.FILES.get('image')
+        try:
+            if handler.too_large:
+                raise ValueError(
+                    f'Images are limited to '
+                    f'{settings.RECIPE_IMAGE_MAX_SIZE} bytes.')
+            if uploaded is None:
+                raise ValueError('No image was uploaded.')
+            name = images.save_upload(uploaded)
+        except ValueError as exc:
+            raise drf_serializers.ValidationError({'image': [str(exc)]})
+
+        with sharding.atomic(Recipe):
+            Recipe.objects.filter(user=recipe.user_id, pk=recipe.pk).update(
+                image=name, thumbnails={})
+            jobs.enqueue(
+                tasks.make_thumbnails,
+                {'recipe_id': recipe.pk, 'image': name,
+                 'user_id': recipe.user_id},
+            )
+        reader = get_reader(serializers.RecipeDetailSerializer)
+        data = reader.read(
+            Recipe.objects.filter(user=recipe.user_id, pk=recipe.pk),
+            ['id', 'image', 'thumbnails'])[0]
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+class TagViewSet(EarlyThrottleMixin,
+                 OutboxMixin,
+                 sharding.ShardMixin,
+                 ReplicaReadMixin,
+                 mixins.DestroyModelMixin,
                 mixins.UpdateModelMixin,
                  mixins.ListModelMixin,
                  viewsets.GenericViewSet):
     """Manage Tags in the DB """
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [SignedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_classes = [UserRateThrottle]
+    throttle_scope = 'recipe'
+    outbox_name = 'tag'
 
     def get_queryset(self):
         """ overide the queryset and Filter the Tags to  authenticated users"""
         return self.queryset.filter(user=self.request.user).order_by('-name')
 
 
-class IngredientViewSet(mixins.DestroyModelMixin,
+class IngredientViewSet(EarlyThrottleMixin,
+                        OutboxMixin,
+                        sharding.ShardMixin,
+                        ReplicaReadMixin,
+                        mixins.DestroyModelMixin,
                         mixins.UpdateModelMixin,
                         mixins.ListModelMixin,
                         viewsets.GenericViewSet):
     """manage ingredients in the database"""
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [SignedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_classes = [UserRateThrottle]
+    throttle_scope = 'recipe'
+    outbox_name = 'ingredient'
 
     def get_queryset(self):
         """Filter queryset to authenticated user"""
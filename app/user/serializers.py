@@ -56,3 +56,8 @@ class AuthTokenSerializer(serializers.Serializer):
         attrs['user'] = user
         return attrs
 
+
+class TokenSerializer(serializers.Serializer):
+    """Serializer for an issued token"""
+    token = serializers.CharField()
+    expires = serializers.DateTimeField()
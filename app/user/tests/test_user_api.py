@@ -5,12 +5,17 @@ Test user api endpoints
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core import tokens
+
 CREATE_USER_URL = reverse('user:create')
 TOKEN_USER_URL = reverse('user:token')
 ME_URL = reverse('user:me')
+REFRESH_TOKEN_URL = reverse('user:token-refresh')
+REVOKE_TOKEN_URL = reverse('user:token-revoke')
 
 
 def create_user(**params):
@@ -80,6 +85,7 @@ class PublicUserApiTests(TestCase):
         }
         res = self.client.post(TOKEN_USER_URL, payload)
         self.assertIn('token', res.data)
+        self.assertIn('expires', res.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
 
@@ -108,13 +114,15 @@ class PublicUserApiTests(TestCase):
 class PrivateUserApiTests(TestCase):
     """Test API requests that require authentication"""
 
-    def setUp(self):
-        self.user = create_user(
-            email= 'test@example.com',
-            password= 'test123password',
-            name= 'Test User',
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(
+            email='test@example.com',
+            password='test123password',
+            name='Test User',
         )
 
+    def setUp(self):
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
 
@@ -140,3 +148,57 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class TokenLifecycleApiTests(TestCase):
+    """Test refreshing and revoking tokens"""
+
+    def setUp(self):
+        tokens.revocations.clear()
+        self.addCleanup(tokens.revocations.clear)
+        self.user = create_user(
+            email='test@example.com',
+            password='test123password',
+            name='Test User',
+        )
+        self.token, _ = tokens.issue(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def test_signed_token_profile(self):
+        """Test a signed token authenticates the profile endpoint"""
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_refresh_token(self):
+        """Test refreshing swaps the token for a new one"""
+        res = self.client.post(REFRESH_TOKEN_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['token'], self.token)
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {res.data["token"]}')
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_200_OK)
+
+    def test_refresh_drf_token(self):
+        """Test a DRF token can be swapped for a signed token"""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        res = self.client.post(REFRESH_TOKEN_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(Token.objects.exists())
+
+    def test_revoke_token(self):
+        """Test a revoked token no longer authenticates"""
+        res = self.client.post(REVOKE_TOKEN_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
@@ -1,28 +1,104 @@
 """
 Views for user-related operations.
 """
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+from drf_spectacular.utils import extend_schema
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from core import deletion, tokens
+from core.authentication import SignedTokenAuthentication
+from core.routers import ReplicaReadMixin, reading_from_replica
+from core.throttling import (AddressRateThrottle,
+                             EarlyThrottleMixin,
+                             UserRateThrottle)
 from user.serializers import (UserSerializer,
-                              AuthTokenSerializer)
+                              AuthTokenSerializer,
+                              TokenSerializer)
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(EarlyThrottleMixin, generics.CreateAPIView):
     """View to create a new user."""
     serializer_class = UserSerializer
+    throttle_classes = (AddressRateThrottle,)
+    throttle_scope = 'signup'
 
-class CreateTokenView(ObtainAuthToken):
+class CreateTokenView(EarlyThrottleMixin, ObtainAuthToken):
     """View to create a new auth token for user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (AddressRateThrottle,)
+    throttle_scope = 'login'
+
+    @extend_schema(responses=TokenSerializer)
+    def post(self, request, *args, **kwargs):
+        """Return a new signed token for the user"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token, expires = tokens.issue(serializer.validated_data['user'])
+        return Response({'token': token, 'expires': expires})
+
+
+class RefreshTokenView(EarlyThrottleMixin, APIView):
+    """View to swap the current token for a new one"""
+    authentication_classes = (SignedTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+    throttle_classes = (UserRateThrottle,)
+    throttle_scope = 'user'
+
+    @extend_schema(request=None, responses=TokenSerializer)
+    def post(self, request):
+        """Revoke the current token and return a new one"""
+        revoke_current_token(request)
+        token, expires = tokens.issue(request.user)
+        return Response({'token': token, 'expires': expires})
+
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class RevokeTokenView(APIView):
+    """View to log out by revoking the current token"""
+    authentication_classes = (SignedTokenAuthentication,)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    @extend_schema(request=None, responses={204: None})
+    def post(self, request):
+        """Revoke the current token"""
+        revoke_current_token(request)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def revoke_current_token(request):
+    """Revoke the signed token, or delete the DRF token, of the request"""
+    if isinstance(request.auth, str):
+        tokens.revoke(request.auth)
+    else:
+        request.auth.delete()
+
+class ManageUserView(EarlyThrottleMixin,
+                     ReplicaReadMixin,
+                     generics.RetrieveUpdateDestroyAPIView):
     """View to manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (SignedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
+    throttle_classes = (UserRateThrottle,)
+    throttle_scope = 'user'
 
     def get_object(self):
         """Retrieve and return the authenticated user"""
-        return self.request.user
\ No newline at end of file
+        user = self.request.user
+        if reading_from_replica():
+            # Authentication read the user from the primary; the fields
+            # returned come from the replica, unless it lags behind.
+            return get_user_model().objects.filter(pk=user.pk).first() or user
+        if user.get_deferred_fields():
+            user.refresh_from_db()
+        return user
+
+    @extend_schema(responses={202: None})
+    def delete(self, request, *args, **kwargs):
+        """Deactivate the account; its data is deleted in the background"""
+        deletion.schedule(self.get_object())
+        return Response(status=status.HTTP_202_ACCEPTED)